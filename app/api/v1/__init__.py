@@ -7,6 +7,8 @@ from .endpoints.room127 import router as room127_router
 from .endpoints.mcp import router as mcp_router
 from .endpoints.chatbot import router as chatbot_router
 from .endpoints.ticket import router as ticket_router
+from .endpoints.transcription_jobs import router as transcription_jobs_router
+from .endpoints.audio_uploads import router as audio_uploads_router
 # from app.api.v1.endpoints import (
 #     auth, users, memory, ticket, role
 # )
@@ -32,3 +34,5 @@ router.include_router(shadow_bank_router)
 router.include_router(alam_router)
 router.include_router(room127_router)
 router.include_router(mcp_router)
+router.include_router(transcription_jobs_router)
+router.include_router(audio_uploads_router)
@@ -3,12 +3,14 @@ from uuid import UUID
 from fastapi import APIRouter, Depends, File, Form, UploadFile
 from requests import Session
 
-from app.core.utils import role_required
+from app.core.utils import get_current_user, role_required
 from app.db.dependencies import get_db
-from app.models.LanguageTest import LanguageTestAudio
+from app.models.LanguageTest import LanguageTest as LanguageTestAudio
 from app.models.audio_file import AudioFile
+from app.models.users import User
 from app.schemas.files import FileOut
 from app.services.s3 import upload_to_s3
+from app.services.transcription_jobs import transcription_jobs, validate_callback_url
 
 router = APIRouter(tags=["Learning Test"])
 
@@ -40,25 +42,52 @@ router = APIRouter(tags=["Learning Test"])
 
 
 @router.post("/language-test/upload")
-def upload_test_audio(
+async def upload_test_audio(
     section: str = Form(...),
     user_id: UUID = Form(...),
     topic: str = Form(...),
     question_type: str = Form(...),
     language_level: str = Form(...),
     rubric_score: float = Form(None),
+    language: str = Form("zh-CN"),
+    callback_url: Optional[str] = Form(None),
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
 ):
 
-    file_url = upload_to_s3(file, f"LanguageTest/{section}")
+    await validate_callback_url(callback_url)
+    file_url = await upload_to_s3(file, f"LanguageTest/{section}")
     entry = LanguageTestAudio(
         section=section, user_id=user_id, topic=topic, question_type=question_type,
         language_level=language_level, rubric_score=rubric_score, file_path=file_url
     )
-    db.add(entry)
+    # Transcriptions land on an AudioFile row, which /filter also searches
+    audio_file = AudioFile(
+        user_id=user_id, audio_type="language_test", file_url=file_url, topic=topic,
+        question_type=question_type, language_level=language_level, rubric_score=rubric_score
+    )
+    db.add_all([entry, audio_file])
     db.commit()
-    return entry
+    db.refresh(entry)
+    db.refresh(audio_file)
+
+    # The upload closed the spooled file; the worker reads the stored copy
+    job = await transcription_jobs.submit_stored(
+        file_url,
+        options={"language": language},
+        audio_file_id=audio_file.id,
+        callback_url=callback_url,
+        user_id=str(current_user.id)
+    )
+    return {
+        "id": entry.id,
+        "section": entry.section,
+        "file_path": entry.file_path,
+        "audio_file_id": audio_file.id,
+        "job_id": job["id"],
+        "status": job["status"]
+    }
 
 
 
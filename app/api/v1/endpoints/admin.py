@@ -4,14 +4,16 @@ from sqlalchemy.orm import Session
 from app.core.utils import role_required, get_current_user, verify_token
 from app.db.dependencies import get_db
 from app.models.audio_file import AudioFile
-from app.models.users import User,Role
+from app.models.role import Role
+from app.models.users import User
 from app.models.learning_module import LearningModule
 from app.models.lesson import Lesson
 from app.schemas.files import FileOut
 from app.schemas.user import UserCreate, UserUpdate, UserResponse
 from app.schemas.learning import ModuleCreate, ModuleUpdate, LessonCreate, LessonUpdate # type: ignore
 from uuid import UUID
-from app.services.redis_service import redis_service
+from app.services.event_log import event_log
+from app.services.metrics import ROLLUP_SECONDS, metrics, role_field
 from datetime import datetime, timedelta
 import logging
 
@@ -164,16 +166,18 @@ async def get_user_analytics(
     current_user: dict = Depends(role_required("ADMIN"))
 ):
     """Get user analytics"""
-    total_users = db.query(User).count()
-    active_users = db.query(User).filter(User.is_active == True).count()
-    teachers = db.query(User).join(Role).filter(Role.name == "Teacher").count()
-    students = db.query(User).join(Role).filter(Role.name == "Student").count()
+    totals = await metrics.get_totals(db)
+    # The roles table is a handful of rows; user counts per role are precomputed
+    users_by_role = {
+        name.upper(): totals.get(role_field(role_id), 0)
+        for role_id, name in db.query(Role.id, Role.name)
+    }
     
     return {
-        "total_users": total_users,
-        "active_users": active_users,
-        "teachers": teachers,
-        "students": students
+        "total_users": totals.get("users", 0),
+        "active_users": totals.get("active_users", 0),
+        "teachers": users_by_role.get("TEACHER", 0),
+        "students": users_by_role.get("STUDENT", 0)
     }
 
 @router.get("/analytics/content")
@@ -182,49 +186,53 @@ async def get_content_analytics(
     current_user: dict = Depends(role_required("ADMIN"))
 ):
     """Get content analytics"""
-    total_modules = db.query(LearningModule).count()
-    total_lessons = db.query(Lesson).count()
-    total_audio_files = db.query(AudioFile).count()
+    totals = await metrics.get_totals(db)
     
     return {
-        "total_modules": total_modules,
-        "total_lessons": total_lessons,
-        "total_audio_files": total_audio_files
+        "total_modules": totals.get("modules", 0),
+        "total_lessons": totals.get("lessons", 0),
+        "total_audio_files": totals.get("audio_files", 0)
     }
 
+async def _query_event_log(stream: str, start_date: Optional[str], end_date: Optional[str], filters: dict, limit: int, cursor: Optional[str]) -> dict:
+    """One newest-first page of an event stream, filtered by the store rather than in Python"""
+    try:
+        return await event_log.query(
+            stream,
+            start=start_date,
+            end=end_date,
+            filters=filters,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        # Malformed dates or cursor
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/admin/logs/codex")
 async def get_codex_logs(
     start_date: str = None,
     end_date: str = None,
-    limit: int = 100,
+    context: str = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str = None,
     authorization: str = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Get Codex logs with optional date filtering"""
+    """Get Codex logs with optional date filtering; pass next_cursor back as cursor for the next page"""
     verify_token(authorization)
     
     try:
-        # Get logs from Redis
-        logs = await redis_service.get_list("codex_logs", start=-limit, end=-1)
-        
-        # Filter by date if provided
-        if start_date or end_date:
-            filtered_logs = []
-            for log in logs:
-                log_date = datetime.fromisoformat(log["timestamp"])
-                if start_date and log_date < datetime.fromisoformat(start_date):
-                    continue
-                if end_date and log_date > datetime.fromisoformat(end_date):
-                    continue
-                filtered_logs.append(log)
-            logs = filtered_logs
-            
+        page = await _query_event_log("codex", start_date, end_date, {"context": context}, limit, cursor)
         return {
-            "logs": logs,
-            "total": len(logs),
+            "logs": page["events"],
+            "total": len(page["events"]),
+            "next_cursor": page["next_cursor"],
             "start_date": start_date,
             "end_date": end_date
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to get Codex logs: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get Codex logs: {str(e)}")
@@ -235,33 +243,22 @@ async def get_audit_logs(
     user_id: str = None,
     start_date: str = None,
     end_date: str = None,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str = None,
     authorization: str = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Get audit logs with optional filtering"""
+    """Get audit logs with optional filtering; pass next_cursor back as cursor for the next page"""
     verify_token(authorization)
     
     try:
-        # Get logs from Redis
-        logs = await redis_service.get_audit_logs(limit=limit)
-        
-        # Apply filters
-        filtered_logs = []
-        for log in logs:
-            if action and log["action"] != action:
-                continue
-            if user_id and log["user_id"] != user_id:
-                continue
-            if start_date and datetime.fromisoformat(log["timestamp"]) < datetime.fromisoformat(start_date):
-                continue
-            if end_date and datetime.fromisoformat(log["timestamp"]) > datetime.fromisoformat(end_date):
-                continue
-            filtered_logs.append(log)
-            
+        page = await _query_event_log(
+            "audit", start_date, end_date, {"action": action, "user_id": user_id}, limit, cursor
+        )
         return {
-            "logs": filtered_logs,
-            "total": len(filtered_logs),
+            "logs": page["events"],
+            "total": len(page["events"]),
+            "next_cursor": page["next_cursor"],
             "filters": {
                 "action": action,
                 "user_id": user_id,
@@ -269,6 +266,8 @@ async def get_audit_logs(
                 "end_date": end_date
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to get audit logs: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get audit logs: {str(e)}")
@@ -278,37 +277,28 @@ async def get_contradiction_logs(
     status: str = None,
     start_date: str = None,
     end_date: str = None,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str = None,
     authorization: str = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Get contradiction resolution logs"""
+    """Get contradiction resolution logs; pass next_cursor back as cursor for the next page"""
     verify_token(authorization)
     
     try:
-        # Get logs from Redis
-        logs = await redis_service.get_list("contradiction_logs", start=-limit, end=-1)
-        
-        # Apply filters
-        filtered_logs = []
-        for log in logs:
-            if status and log["status"] != status:
-                continue
-            if start_date and datetime.fromisoformat(log["timestamp"]) < datetime.fromisoformat(start_date):
-                continue
-            if end_date and datetime.fromisoformat(log["timestamp"]) > datetime.fromisoformat(end_date):
-                continue
-            filtered_logs.append(log)
-            
+        page = await _query_event_log("contradiction", start_date, end_date, {"status": status}, limit, cursor)
         return {
-            "logs": filtered_logs,
-            "total": len(filtered_logs),
+            "logs": page["events"],
+            "total": len(page["events"]),
+            "next_cursor": page["next_cursor"],
             "filters": {
                 "status": status,
                 "start_date": start_date,
                 "end_date": end_date
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to get contradiction logs: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get contradiction logs: {str(e)}")
@@ -318,28 +308,61 @@ async def get_dashboard_stats(
     authorization: str = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Get dashboard statistics"""
+    """Get dashboard statistics (average_response_time is in milliseconds)"""
     verify_token(authorization)
     
     try:
-        # Get stats from Redis
-        stats = await redis_service.get("dashboard_stats")
-        if not stats:
-            # Initialize stats if not exists
-            stats = {
-                "total_requests": 0,
-                "successful_requests": 0,
-                "failed_requests": 0,
-                "average_response_time": 0,
-                "active_users": 0,
-                "total_contradictions": 0,
-                "resolved_contradictions": 0,
-                "pending_contradictions": 0,
-                "last_updated": datetime.utcnow().isoformat()
-            }
-            await redis_service.set("dashboard_stats", stats)
-            
-        return stats
+        totals = await metrics.get_totals(db)
+        requests = totals.get("requests", 0)
+        contradictions = {
+            field.split(":", 1)[1]: count
+            for field, count in totals.items()
+            if field.startswith("contradictions:")
+        }
+        updated_at = totals.get("updated_at") or totals.get("seeded_at")
+        return {
+            "total_requests": requests,
+            "successful_requests": totals.get("requests_succeeded", 0),
+            "failed_requests": totals.get("requests_failed", 0),
+            "average_response_time": round(totals.get("response_time_us", 0) / requests / 1000, 2) if requests else 0,
+            "active_users": totals.get("active_users", 0),
+            "total_contradictions": sum(contradictions.values()),
+            "resolved_contradictions": contradictions.get("resolved", 0),
+            "pending_contradictions": contradictions.get("pending", 0),
+            "last_updated": datetime.utcfromtimestamp(updated_at).isoformat()
+        }
     except Exception as e:
         logger.error(f"Failed to get dashboard stats: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get dashboard stats: {str(e)}")
+
+@router.get("/admin/dashboard/timeseries")
+async def get_dashboard_timeseries(
+    granularity: str = "hour",
+    points: int = Query(24, ge=1, le=1440),
+    authorization: str = Header(None)
+):
+    """Per minute, hour or day counts of requests, signups, uploads and contradictions, oldest first"""
+    verify_token(authorization)
+    if granularity not in ROLLUP_SECONDS:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(ROLLUP_SECONDS)}")
+    
+    try:
+        return {
+            "granularity": granularity,
+            "buckets": await metrics.get_rollups(granularity, points)
+        }
+    except Exception as e:
+        logger.error(f"Failed to get dashboard timeseries: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to get dashboard timeseries: {str(e)}")
+
+@router.post("/admin/dashboard/stats/rebuild")
+async def rebuild_dashboard_stats(
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(role_required("ADMIN"))
+):
+    """Recount the running totals from the tables, correcting any drift"""
+    try:
+        return await metrics.reseed(db)
+    except Exception as e:
+        logger.error(f"Failed to rebuild dashboard stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild dashboard stats: {str(e)}")
@@ -1,8 +1,9 @@
 import os
 from fastapi import APIRouter, HTTPException, Header, Depends, UploadFile, File, BackgroundTasks, Form
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from openai import OpenAI
 from dotenv import load_dotenv
-import openai
 from app.core.utils import verify_token, stt_transcribe
 from app.schemas.user import (
     AalamInput, AalamTTSRequest, AalamSTTRequest, AalamResponse,
@@ -16,6 +17,9 @@ import logging
 from datetime import datetime
 from sqlalchemy.orm import Session
 from app.db.dependencies import get_db
+from app.db.database import SessionLocal
+from app.core.config import settings
+from app.core.scratch import temp_audio
 from app.models.learning_module import LearningModule
 from app.models.feedback_log import FeedbackLog
 from app.models.comprehension_log import ComprehensionLog
@@ -23,18 +27,21 @@ from app.models.integration import Integration
 from app.models.arbitration import Arbitration
 from app.models.chat_history import ChatHistory
 import json
+import asyncio
 import httpx
 from uuid import UUID, uuid4
 import tempfile
 import uuid
-from app.services.avatar import avatar_service
-from app.services.redis_service import redis_service
+from app.services.avatar import avatar_service, avatar_jobs
+from app.services.llm import llm_service
+from app.services.outbox import outbox
+from app.services.metrics import metrics
+from app.services.response_cache import response_cache, cache_hit_metadata
 from pydantic import BaseModel
 
 router = APIRouter(tags=["Aalam Integration"])
 
 load_dotenv(dotenv_path=".env")
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -44,8 +51,68 @@ logger = logging.getLogger(__name__)
 ROOM_127_ENDPOINT = os.getenv("ROOM_127_ENDPOINT", "https://room127.example.com/log")
 CODEX_ENDPOINT = os.getenv("CODEX_ENDPOINT", "https://codex.example.com/analyze")
 SUSPENSE_QUEUE_ENDPOINT = os.getenv("SUSPENSE_QUEUE_ENDPOINT", "https://queue.example.com/add")
-TEMP_AUDIO_DIR = "temp_audio"
-os.makedirs(TEMP_AUDIO_DIR, exist_ok=True)
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def sse_event(event: str, data: Any) -> str:
+    """Format a single server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+async def generate_speech_and_avatar(
+    message: str,
+    voice_name: str,
+    audio_format: str,
+    speaking_rate: float = 1.0,
+    pitch: float = 0.0
+) -> Dict[str, Any]:
+    """
+    Run TTS and avatar generation concurrently
+
+    TTS is required and bounded by AALAM_TTS_TIMEOUT. The avatar gets
+    AALAM_AVATAR_TIMEOUT from the start; if it is still rendering after
+    that, it keeps running in the background and a job id is returned
+    instead, so the caller can poll /aalam/avatar/{job_id}.
+    """
+    started = asyncio.get_running_loop().time()
+    avatar_task = asyncio.create_task(avatar_service.generate_avatar(
+        text=message,
+        voice_id=voice_name,
+        style="natural",
+        emotion="neutral"
+    ))
+
+    try:
+        audio_data = await asyncio.wait_for(
+            tts_generate(
+                text=message,
+                voice_name=voice_name,
+                audio_format=audio_format,
+                speaking_rate=speaking_rate,
+                pitch=pitch
+            ),
+            timeout=settings.AALAM_TTS_TIMEOUT
+        )
+    except Exception:
+        avatar_task.cancel()
+        raise
+
+    result = {"audio_data": audio_data, "avatar_url": None, "avatar_metadata": None, "avatar_job_id": None}
+    remaining = settings.AALAM_AVATAR_TIMEOUT - (asyncio.get_running_loop().time() - started)
+    try:
+        avatar_result = await asyncio.wait_for(asyncio.shield(avatar_task), timeout=max(remaining, 0))
+        result["avatar_url"] = avatar_result["video_url"]
+        result["avatar_metadata"] = avatar_result["metadata"]
+    except asyncio.TimeoutError:
+        try:
+            result["avatar_job_id"] = await avatar_jobs.track(avatar_task)
+            logger.info(f"Avatar still rendering, deferred as job {result['avatar_job_id']}")
+        except Exception as e:
+            # Nobody could poll for a render that isn't tracked, so stop it
+            logger.error(f"Could not defer avatar job: {str(e)}")
+            avatar_task.cancel()
+    except Exception as e:
+        # Audio is the primary answer; a failed avatar should not fail the request
+        logger.error(f"Avatar generation failed: {str(e)}")
+    return result
 
 def generate_system_prompt(text: str, model_source: ModelSource) -> str:
     base_prompt = {
@@ -112,70 +179,55 @@ For each code file:
     
     return base_prompt
 
-async def log_to_room_127(user_id: UUID, context: str, response: AalamResponse, db: Session):
-    """Log interactions to Room 127 for analysis"""
-    try:
-        # Log to database
-        feedback_log = FeedbackLog(
-            user_id=user_id,
-            source=response.model_source.value,
-            feedback_text=response.response,
-            related_module=context,
-            metadata={
-                **response.metadata,
-                "prompt": response.metadata.get("prompt", ""),  # Store the prompt
-                "system_prompt": response.metadata.get("system_prompt", ""),  # Store the system prompt
-                "model": response.metadata.get("model", "gpt-4"),
-                "tokens": {
-                    "prompt": response.metadata.get("prompt_tokens", 0),
-                    "completion": response.metadata.get("completion_tokens", 0),
-                    "total": response.metadata.get("total_tokens", 0)
-                }
-            }
-        )
-        db.add(feedback_log)
-        db.commit()
-
-        # Log to Redis for quick access
-        redis_log = {
+def log_to_room_127(user_id: UUID, context: str, response: AalamResponse):
+    """Queue Room 127 logging; delivery happens in the background outbox"""
+    timestamp = datetime.utcnow().isoformat()
+
+    # Log to database
+    outbox.publish("feedback_log", {
+        "user_id": str(user_id),
+        "source": response.model_source.value,
+        "feedback_text": response.response,
+        "related_module": context
+    })
+
+    # Log to Redis for quick access, kept for 30 days
+    outbox.publish("redis_list", {
+        "name": f"user:{user_id}:interactions",
+        "value": {
             "user_id": str(user_id),
             "context": context,
             "response": response.response,
             "prompt": response.metadata.get("prompt", ""),
             "system_prompt": response.metadata.get("system_prompt", ""),
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": timestamp,
             "model": response.metadata.get("model", "gpt-4"),
             "tokens": response.metadata.get("tokens", {})
-        }
-        await redis_service.add_to_list(f"user:{user_id}:interactions", redis_log)
-        
-        # Set expiration for Redis logs (30 days)
-        await redis_service.set_expiry(f"user:{user_id}:interactions", 30 * 24 * 60 * 60)
-
-        # Log to external service
-        async with httpx.AsyncClient() as client:
-            await client.post(
-                ROOM_127_ENDPOINT,
-                json={
-                    "user_id": str(user_id),
-                    "context": context,
-                    "response": response.response,
-                    "source": response.source,
-                    "model_source": response.model_source.value,
-                    "confidence": response.confidence,
-                    "timestamp": response.timestamp.isoformat(),
-                    "audio_file": response.audio_file,
-                    "transcription": response.transcription,
-                    "metadata": response.metadata,
-                    "submission_status": response.submission_status.value if response.submission_status else None,
-                    "review_notes": response.review_notes,
-                    "prompt": response.metadata.get("prompt", ""),
-                    "system_prompt": response.metadata.get("system_prompt", "")
-                }
-            )
-        logger.info(f"Logged to Room 127 - User: {user_id}, Context: {context}, Model: {response.model_source.value}")
-    except Exception as e:
-        logger.error(f"Failed to log to Room 127: {str(e)}")
+        },
+        "expire": 30 * 24 * 60 * 60
+    })
+
+    # Log to external service
+    outbox.publish("http", {
+        "url": ROOM_127_ENDPOINT,
+        "json": jsonable_encoder({
+            "user_id": str(user_id),
+            "context": context,
+            "response": response.response,
+            "source": response.source,
+            "model_source": response.model_source.value,
+            "confidence": response.confidence,
+            "timestamp": response.timestamp.isoformat(),
+            "audio_file": response.audio_file,
+            "transcription": response.transcription,
+            "metadata": response.metadata,
+            "submission_status": response.submission_status.value if response.submission_status else None,
+            "review_notes": response.review_notes,
+            "prompt": response.metadata.get("prompt", ""),
+            "system_prompt": response.metadata.get("system_prompt", "")
+        })
+    })
+    logger.info(f"Queued Room 127 log - User: {user_id}, Context: {context}, Model: {response.model_source.value}")
 
 async def check_subservient_api(authorization: str, db: Session) -> bool:
     """Check if the request is from a subservient API"""
@@ -192,42 +244,40 @@ async def check_subservient_api(authorization: str, db: Session) -> bool:
         logger.error(f"Failed to check subservient API: {str(e)}")
         return False
 
-async def log_to_codex(content: str, context: str):
-    """Log content to Codex for analysis"""
-    try:
-        # Log to Redis
-        log_entry = {
-            "content": content,
-            "context": context,
+def log_to_codex(content: str, context: str):
+    """Queue content for Codex analysis; delivery happens in the background outbox"""
+    log_entry = {
+        "content": content,
+        "context": context,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    outbox.publish("event_log", {"stream": "codex", "event": log_entry})
+    outbox.publish("http", {"url": CODEX_ENDPOINT, "json": log_entry})
+    logger.info(f"Queued Codex log - Context: {context}")
+
+def log_audit(action: str, user_id: str, details: Dict[str, Any]):
+    """Queue an audit event; it is written to the event log by the background outbox"""
+    outbox.publish("event_log", {
+        "stream": "audit",
+        "event": {
+            "action": action,
+            "user_id": str(user_id),
+            "details": details,
             "timestamp": datetime.utcnow().isoformat()
         }
-        await redis_service.add_to_list("codex_logs", log_entry)
-        
-        # Also log to external service
-        async with httpx.AsyncClient() as client:
-            await client.post(
-                CODEX_ENDPOINT,
-                json=log_entry
-            )
-        logger.info(f"Logged to Codex - Context: {context}")
-    except Exception as e:
-        logger.error(f"Failed to log to Codex: {str(e)}")
+    })
 
-async def add_to_suspense_queue(content: str, priority: int = 1):
-    """Add content to suspense queue for processing"""
-    try:
-        async with httpx.AsyncClient() as client:
-            await client.post(
-                SUSPENSE_QUEUE_ENDPOINT,
-                json={
-                    "content": content,
-                    "priority": priority,
-                    "timestamp": datetime.utcnow().isoformat()
-                }
-            )
-        logger.info(f"Added to suspense queue - Priority: {priority}")
-    except Exception as e:
-        logger.error(f"Failed to add to suspense queue: {str(e)}")
+def add_to_suspense_queue(content: str, priority: int = 1):
+    """Queue content for the suspense queue; delivery happens in the background outbox"""
+    outbox.publish("http", {
+        "url": SUSPENSE_QUEUE_ENDPOINT,
+        "json": {
+            "content": content,
+            "priority": priority,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+    })
+    logger.info(f"Queued for suspense queue - Priority: {priority}")
 
 async def process_arbitration_request(request: ArbitrationRequest, db: Session) -> ArbitrationResponse:
     """Process an arbitration request"""
@@ -249,7 +299,7 @@ async def process_arbitration_request(request: ArbitrationRequest, db: Session)
         system_prompt = generate_system_prompt("arbitrate", request.model_source)
         
         # Call OpenAI API for review
-        response = openai.chat.completions.create(
+        response = await llm_service.chat(
             model="gpt-4",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -291,7 +341,7 @@ async def arbitrate_content(
     
     try:
         # Log the arbitration request
-        await redis_service.log_audit(
+        log_audit(
             action="arbitration_request",
             user_id=request.user_id,
             details={
@@ -304,7 +354,7 @@ async def arbitrate_content(
         response = await process_arbitration_request(request, db)
         
         # Log the arbitration response
-        await redis_service.log_audit(
+        log_audit(
             action="arbitration_response",
             user_id=request.user_id,
             details={
@@ -489,7 +539,7 @@ async def aalam_tts_endpoint(
         system_prompt = generate_system_prompt(data.context, data.model_source)
         
         # Call OpenAI API to generate response
-        response = openai.chat.completions.create(
+        response = await llm_service.chat(
             model="gpt-4",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -499,27 +549,17 @@ async def aalam_tts_endpoint(
         
         message = response.choices[0].message.content
         
-        # Generate speech from the response
-        audio_data = await tts_generate(
-            text=message,
+        # Generate speech and avatar video concurrently
+        media = await generate_speech_and_avatar(
+            message,
             voice_name=data.voice_name,
             audio_format=data.audio_format,
             speaking_rate=data.speaking_rate,
             pitch=data.pitch
         )
         
-        # Generate avatar video
-        avatar_result = await avatar_service.generate_avatar(
-            text=message,
-            voice_id=data.voice_name,  # Use the same voice ID
-            style="natural",  # You can make this configurable
-            emotion="neutral"  # You can make this configurable
-        )
-        
-        # Save audio to temporary file
-        temp_audio_path = f"{TEMP_AUDIO_DIR}/{uuid.uuid4()}.{data.audio_format}"
-        with open(temp_audio_path, "wb") as f:
-            f.write(audio_data)
+        # Save audio to temporary file (reaped once unused for TEMP_AUDIO_TTL_SECONDS)
+        temp_audio_path = await temp_audio.write(media["audio_data"], suffix=f".{data.audio_format}")
         
         # Create AalamResponse object with avatar information
         aalam_response = AalamResponse(
@@ -532,16 +572,17 @@ async def aalam_tts_endpoint(
             model_source=data.model_source,
             metadata=data.metadata,
             audio_file=temp_audio_path,
-            avatar_url=avatar_result["video_url"],  # Add avatar URL
-            avatar_metadata=avatar_result["metadata"]  # Add avatar metadata
+            avatar_url=media["avatar_url"],
+            avatar_metadata=media["avatar_metadata"],
+            avatar_job_id=media["avatar_job_id"]
         )
 
         # Log interactions
-        await log_to_room_127(data.user_id, data.context, aalam_response, db)
-        await log_to_codex(message, data.context)
+        log_to_room_127(data.user_id, data.context, aalam_response)
+        log_to_codex(message, data.context)
         
         if is_subservient:
-            await add_to_suspense_queue(message)
+            add_to_suspense_queue(message)
 
         return aalam_response
 
@@ -575,7 +616,7 @@ async def aalam_stt_endpoint(
         system_prompt = generate_system_prompt(data.context, ModelSource.AALAM)
         
         # Call OpenAI API to generate response
-        response = openai.chat.completions.create(
+        response = await llm_service.chat(
             model="gpt-4",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -600,11 +641,11 @@ async def aalam_stt_endpoint(
         )
 
         # Log interactions
-        await log_to_room_127(data.user_id, data.context, aalam_response, db)
-        await log_to_codex(message, data.context)
+        log_to_room_127(data.user_id, data.context, aalam_response)
+        log_to_codex(message, data.context)
         
         if is_subservient:
-            await add_to_suspense_queue(message)
+            add_to_suspense_queue(message)
 
         return aalam_response
 
@@ -638,7 +679,7 @@ async def aalam_tts_stt_endpoint(
         system_prompt = generate_system_prompt(data.context, ModelSource.AALAM)
         
         # Call OpenAI API to generate response
-        response = openai.chat.completions.create(
+        response = await llm_service.chat(
             model="gpt-4",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -655,10 +696,8 @@ async def aalam_tts_stt_endpoint(
             audio_format="mp3"
         )
         
-        # Save audio to temporary file
-        temp_audio_path = f"{TEMP_AUDIO_DIR}/{uuid.uuid4()}.mp3"
-        with open(temp_audio_path, "wb") as f:
-            f.write(audio_data)
+        # Save audio to temporary file (reaped once unused for TEMP_AUDIO_TTL_SECONDS)
+        temp_audio_path = await temp_audio.write(audio_data, suffix=".mp3")
         
         # Create AalamResponse object
         aalam_response = AalamResponse(
@@ -676,11 +715,11 @@ async def aalam_tts_stt_endpoint(
         )
 
         # Log interactions
-        await log_to_room_127(data.user_id, data.context, aalam_response, db)
-        await log_to_codex(message, data.context)
+        log_to_room_127(data.user_id, data.context, aalam_response)
+        log_to_codex(message, data.context)
         
         if is_subservient:
-            await add_to_suspense_queue(message)
+            add_to_suspense_queue(message)
 
         return aalam_response
 
@@ -703,16 +742,32 @@ async def aalam_endpoint(
 
         # Generate and store system prompt
         system_prompt = generate_system_prompt(data.text, data.model_source)
+        use_cache = response_cache.enabled_for(data.context)
+        cache_hit = await response_cache.lookup("gpt-4", system_prompt, data.text) if use_cache else None
+
+        if cache_hit:
+            message = cache_hit["message"]
+            usage_metadata = cache_hit_metadata(cache_hit)
+        else:
+            response = await llm_service.chat(
+                model="gpt-4",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": data.text},
+                ]
+            )
 
-        response = openai.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": data.text},
-            ]
-        )
-
-        message = response.choices[0].message.content
+            message = response.choices[0].message.content
+            usage_metadata = {
+                "prompt_tokens": response.usage.prompt_tokens,
+                "completion_tokens": response.usage.completion_tokens,
+                "total_tokens": response.usage.total_tokens
+            }
+            if use_cache:
+                await response_cache.store(
+                    "gpt-4", system_prompt, data.text, message,
+                    response.usage.prompt_tokens, response.usage.completion_tokens
+                )
 
         # Create response object with prompt information
         aalam_response = AalamResponse(
@@ -727,15 +782,13 @@ async def aalam_endpoint(
                 "model": "gpt-4",
                 "prompt": data.text,  # Store the user's prompt
                 "system_prompt": system_prompt,  # Store the system prompt
-                "prompt_tokens": response.usage.prompt_tokens,
-                "completion_tokens": response.usage.completion_tokens,
-                "total_tokens": response.usage.total_tokens
+                **usage_metadata
             }
         )
 
         # Log the interaction with prompts
-        await log_to_room_127(user_id, data.context, aalam_response, db)
-        await log_to_codex(data.text, data.context)
+        log_to_room_127(user_id, data.context, aalam_response)
+        log_to_codex(data.text, data.context)
 
         return aalam_response
 
@@ -749,6 +802,82 @@ async def aalam_endpoint(
         )
     
 
+@router.post("/aalam/stream")
+async def aalam_stream_endpoint(
+    data: AalamInput,
+    authorization: str = Header(None)
+):
+    """Streaming variant of /aalam: tokens are sent as server-sent events"""
+    decoded_token = verify_token(authorization)
+    user_id = decoded_token.get("sub")
+
+    if not user_id:
+        raise HTTPException(status_code=400, detail="Token missing 'sub' field")
+
+    system_prompt = generate_system_prompt(data.text, data.model_source)
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": data.text},
+    ]
+
+    use_cache = response_cache.enabled_for(data.context)
+
+    async def event_stream():
+        try:
+            cache_hit = await response_cache.lookup("gpt-4", system_prompt, data.text) if use_cache else None
+            if cache_hit:
+                message = cache_hit["message"]
+                usage_metadata = cache_hit_metadata(cache_hit)
+                yield sse_event("token", {"delta": message})
+            else:
+                parts = []
+                usage = None
+                async for chunk in llm_service.stream_chat(messages, model="gpt-4"):
+                    if chunk.usage:
+                        usage = chunk.usage
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        delta = chunk.choices[0].delta.content
+                        parts.append(delta)
+                        yield sse_event("token", {"delta": delta})
+
+                message = "".join(parts)
+                usage_metadata = {
+                    "prompt_tokens": usage.prompt_tokens if usage else 0,
+                    "completion_tokens": usage.completion_tokens if usage else 0,
+                    "total_tokens": usage.total_tokens if usage else 0
+                }
+                if use_cache and usage:
+                    await response_cache.store(
+                        "gpt-4", system_prompt, data.text, message,
+                        usage.prompt_tokens, usage.completion_tokens
+                    )
+
+            aalam_response = AalamResponse(
+                user_id=user_id,
+                context=data.context,
+                response=message,
+                model_source=data.model_source,
+                confidence=1.0,
+                source="openai",
+                timestamp=datetime.utcnow(),
+                metadata={
+                    "model": "gpt-4",
+                    "prompt": data.text,
+                    "system_prompt": system_prompt,
+                    **usage_metadata
+                }
+            )
+            yield sse_event("done", aalam_response)
+        except Exception as e:
+            logger.error(f"Aalam stream error: {str(e)}")
+            yield sse_event("error", {"detail": f"Aalam failed to respond: {str(e)}"})
+            return
+
+        log_to_room_127(user_id, data.context, aalam_response)
+        log_to_codex(data.text, data.context)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @router.post("/aalam/vet")
 async def vet_content(
     data: AalamInput,
@@ -768,8 +897,8 @@ async def vet_content(
         db.commit()
 
         # Log the content for vetting
-        await log_to_codex(data.text, "content_vetting")
-        await add_to_suspense_queue(data.text, priority=2)
+        log_to_codex(data.text, "content_vetting")
+        add_to_suspense_queue(data.text, priority=2)
 
         # Create comprehension log entry
         comprehension_log = ComprehensionLog(
@@ -1010,7 +1139,7 @@ async def send_message(
         ]
         
         # Call OpenAI API
-        response = openai.chat.completions.create(
+        response = await llm_service.chat(
             model="gpt-4",
             messages=messages
         )
@@ -1029,7 +1158,7 @@ async def send_message(
         db.commit()
         
         # Log interaction
-        await log_to_room_127(
+        log_to_room_127(
             message.user_id,
             message.context,
             AalamResponse(
@@ -1041,8 +1170,7 @@ async def send_message(
                 timestamp=datetime.utcnow(),
                 model_source=message.model_source,
                 metadata=message.metadata
-            ),
-            db
+            )
         )
         
         return ChatMessageResponse(
@@ -1056,6 +1184,95 @@ async def send_message(
         logger.error(f"Failed to send message: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to send message: {str(e)}")
 
+@router.post("/aalam/chats/{chat_id}/message/stream")
+async def send_message_stream(
+    chat_id: str,
+    message: ChatMessageRequest,
+    authorization: str = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Streaming variant of send_message: tokens are sent as server-sent events"""
+    verify_token(authorization)
+
+    chat = db.query(ChatHistory).filter(ChatHistory.id == chat_id).first()
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    history = list(chat.messages or [])
+    user_message = Message(
+        role="user",
+        content=message.message,
+        metadata=message.metadata
+    )
+    system_prompt = generate_system_prompt(message.context, message.model_source)
+    messages = [
+        {"role": "system", "content": system_prompt},
+        *[{"role": msg["role"], "content": msg["content"]} for msg in history],
+        {"role": "user", "content": message.message}
+    ]
+
+    async def event_stream():
+        parts = []
+        try:
+            async for chunk in llm_service.stream_chat(messages, model="gpt-4"):
+                if chunk.choices and chunk.choices[0].delta.content:
+                    delta = chunk.choices[0].delta.content
+                    parts.append(delta)
+                    yield sse_event("token", {"delta": delta})
+        except Exception as e:
+            logger.error(f"Failed to stream message: {str(e)}")
+            yield sse_event("error", {"detail": f"Failed to send message: {str(e)}"})
+            return
+
+        assistant_message = Message(
+            role="assistant",
+            content="".join(parts),
+            metadata={"model": "gpt-4"}
+        )
+
+        # The request-scoped session is already closed once streaming starts
+        stream_db = SessionLocal()
+        try:
+            stored_chat = stream_db.query(ChatHistory).filter(ChatHistory.id == chat_id).first()
+            if stored_chat:
+                stored_chat.messages = [
+                    *(stored_chat.messages or []),
+                    user_message.dict(),
+                    assistant_message.dict()
+                ]
+                stored_chat.last_message_at = datetime.utcnow()
+                stream_db.commit()
+
+            yield sse_event("done", ChatMessageResponse(
+                chat_id=chat_id,
+                message=user_message,
+                response=assistant_message,
+                metadata=message.metadata,
+                timestamp=datetime.utcnow()
+            ))
+
+            log_to_room_127(
+                message.user_id,
+                message.context,
+                AalamResponse(
+                    user_id=message.user_id,
+                    context=message.context,
+                    response=assistant_message.content,
+                    source="📎 Aalam",
+                    confidence=1.0,
+                    timestamp=datetime.utcnow(),
+                    model_source=message.model_source,
+                    metadata=message.metadata
+                )
+            )
+        except Exception as e:
+            logger.error(f"Failed to save streamed message: {str(e)}")
+            yield sse_event("error", {"detail": f"Failed to save message: {str(e)}"})
+        finally:
+            stream_db.close()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @router.delete("/aalam/chats/{chat_id}")
 async def delete_chat(
     chat_id: str,
@@ -1094,15 +1311,9 @@ async def aalam_conversation(
     verify_token(authorization)
 
     try:
-        # Save uploaded audio file temporarily
-        temp_input_path = f"{TEMP_AUDIO_DIR}/{uuid.uuid4()}.wav"
-        with open(temp_input_path, "wb") as f:
-            content = await audio_file.read()
-            f.write(content)
-
-        # Step 1: Convert speech to text
+        # Step 1: Convert speech to text, decoding straight from the upload spool
         transcript_result = await stt_transcribe(
-            temp_input_path,
+            audio_file.file,
             language=language,
             punctuate=True,
             speaker_diarization=False,
@@ -1111,7 +1322,7 @@ async def aalam_conversation(
         
         # Step 2: Process with Aalam
         system_prompt = generate_system_prompt(context, model_source)
-        response = openai.chat.completions.create(
+        response = await llm_service.chat(
             model="gpt-4",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -1121,27 +1332,17 @@ async def aalam_conversation(
         
         message = response.choices[0].message.content
         
-        # Step 3: Convert response to speech
-        audio_data = await tts_generate(
-            text=message,
+        # Step 3: Convert response to speech and generate the avatar concurrently
+        media = await generate_speech_and_avatar(
+            message,
             voice_name=voice_name,
             audio_format=audio_format,
             speaking_rate=1.0,
             pitch=0.0
         )
         
-        # Save response audio
-        temp_output_path = f"{TEMP_AUDIO_DIR}/{uuid.uuid4()}.{audio_format}"
-        with open(temp_output_path, "wb") as f:
-            f.write(audio_data)
-        
-        # Generate avatar video
-        avatar_result = await avatar_service.generate_avatar(
-            text=message,
-            voice_id=voice_name,
-            style="natural",
-            emotion="neutral"
-        )
+        # Save response audio; the client fetches it after we return, so the reaper removes it
+        temp_output_path = await temp_audio.write(media["audio_data"], suffix=f".{audio_format}")
         
         # Create response object
         aalam_response = AalamResponse(
@@ -1153,7 +1354,7 @@ async def aalam_conversation(
             timestamp=datetime.utcnow(),
             model_source=model_source,
             metadata={
-                "input_audio": temp_input_path,
+                "input_audio": audio_file.filename,
                 "output_audio": temp_output_path,
                 "transcription": transcript_result["text"],
                 "voice_used": voice_name,
@@ -1161,28 +1362,33 @@ async def aalam_conversation(
             },
             audio_file=temp_output_path,
             transcription=transcript_result["text"],
-            avatar_url=avatar_result["video_url"],
-            avatar_metadata=avatar_result["metadata"]
+            avatar_url=media["avatar_url"],
+            avatar_metadata=media["avatar_metadata"],
+            avatar_job_id=media["avatar_job_id"]
         )
 
         # Log interactions
-        await log_to_room_127(user_id, context, aalam_response, db)
-        await log_to_codex(message, context)
+        log_to_room_127(user_id, context, aalam_response)
+        log_to_codex(message, context)
 
         return aalam_response
 
     except Exception as e:
         logger.error(f"Aalam conversation failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Aalam conversation failed: {str(e)}")
-    finally:
-        # Clean up temporary files
-        try:
-            if os.path.exists(temp_input_path):
-                os.remove(temp_input_path)
-            if os.path.exists(temp_output_path):
-                os.remove(temp_output_path)
-        except Exception as e:
-            logger.error(f"Failed to clean up temporary files: {str(e)}")
+
+@router.get("/aalam/avatar/{job_id}")
+async def get_avatar_job(
+    job_id: str,
+    authorization: str = Header(None)
+):
+    """Get the avatar of a response whose avatar was still rendering"""
+    verify_token(authorization)
+
+    job = await avatar_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Avatar job not found")
+    return job
 
 async def log_contradiction_resolution(
     contradiction_id: str,
@@ -1201,10 +1407,11 @@ async def log_contradiction_resolution(
             "details": details,
             "timestamp": datetime.utcnow().isoformat()
         }
-        await redis_service.add_to_list("contradiction_logs", log_entry)
+        outbox.publish("event_log", {"stream": "contradiction", "event": log_entry})
+        metrics.count(f"contradictions:{status}")
         
         # Also log as audit event
-        await redis_service.log_audit(
+        log_audit(
             action="contradiction_resolution",
             user_id=user_id,
             details={
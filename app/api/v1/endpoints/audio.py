@@ -1,24 +1,27 @@
 from typing import List, Optional, Any, Dict
 from uuid import UUID
-from fastapi import APIRouter, File, Form, Depends, Response, UploadFile, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import APIRouter, File, Form, Depends, Request, Response, UploadFile, HTTPException
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 import yaml
 from app import models
 from app.core.storage import save_audio_file
-from app.core.utils import role_required, get_current_user, speech_to_text, text_to_speech
+from app.core.utils import role_required, get_current_user, text_to_speech
 from app.db.dependencies import get_db
 from app.models import memory
 from app.models.audio_file import AudioFile
 from app.models.chatbot import ChatbotMemoryType
 from app.schemas.files import FileOut
 from app.schemas.licens import LicenseCreate
+from app.services.downloads import stored_audio_download
 from app.services.s3 import upload_to_s3
+from app.services.transcription_jobs import transcription_jobs, validate_callback_url
 # from app.services.whisper_parse import parse_audio_with_whisper
 import tempfile
 import os
 from datetime import datetime
-from sentence_transformers import SentenceTransformer
+from app.core.config import settings
+from app.core.embedding_registry import EmbeddingModelRegistry
 
 
 router = APIRouter(tags=['Audio files'])
@@ -60,7 +63,7 @@ from uuid import UUID
 router = APIRouter()
 
 @router.post("/audio/upload")
-def upload_audio_file(
+async def upload_audio_file(
     user_id: UUID = Form(...),
     audio_type: str = Form(...),
     topic: str = Form(...),
@@ -71,7 +74,7 @@ def upload_audio_file(
     db: Session = Depends(get_db),
 ):
     # Upload to S3 instead of saving locally
-    file_url =  upload_to_s3(file, audio_type)
+    file_url = await upload_to_s3(file, audio_type)
 
     new_audio = AudioFile(
         user_id=user_id,
@@ -100,11 +103,12 @@ def get_reference_audios(db:Session=Depends(get_db)):
     return db.query(AudioFile).filter(AudioFile.audio_type=="reference").all()
 
 @router.get("/download/{audio_id}")
-def download_audio(audio_id:int,db:Session=Depends(get_db)):
+async def download_audio(audio_id:int,request:Request,db:Session=Depends(get_db)):
+    """Download or stream an audio file; supports Range requests so players can seek"""
     audio=db.query(AudioFile).filter(AudioFile.id==audio_id).first()
     if not audio:
         return {"error":"Audio file not found"}
-    return FileResponse(audio.file_url,   filename=audio.file_url.split("/")[-1])
+    return await stored_audio_download(request, audio.file_url, filename=audio.file_url.split("/")[-1])
 
 
 @router.get("/filter", response_model=List[FileOut])
@@ -173,42 +177,44 @@ def get_audio_metadata(
 #         "file_url": file_url  # Returning the S3 URL for the uploaded audio
 #     }
 
-@router.post("/transcribe")
+@router.post("/transcribe", status_code=202)
 async def transcribe_audio(
     file: UploadFile = File(...),
     language: str = "zh-CN",
+    callback_url: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: dict = Depends(role_required("Student"))
 ):
-    """Transcribe audio file to text"""
-    # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
-        content = await file.read()
-        temp_file.write(content)
-        temp_file.flush()
-        
-        try:
-            # Transcribe audio
-            text = speech_to_text(temp_file.name, language)
-            
-            # Upload original audio to S3
-            file_url = upload_to_s3(file, "AudioSubmissions")
-            
-            # Save to database
-            audio_file = AudioFile(
-                user_id=current_user["id"],
-                file_url=file_url,
-                audio_type="submission"
-            )
-            db.add(audio_file)
-            db.commit()
-            
-            return {
-                "text": text,
-                "file_url": file_url
-            }
-        finally:
-            os.unlink(temp_file.name)
+    """Store an audio submission and queue it for transcription"""
+    await validate_callback_url(callback_url)
+    # Upload original audio to S3
+    file_url = await upload_to_s3(file, "AudioSubmissions")
+    
+    # Save to database; the transcription job fills in transcription_text
+    audio_file = AudioFile(
+        user_id=current_user.id,
+        file_url=file_url,
+        audio_type="submission"
+    )
+    db.add(audio_file)
+    db.commit()
+    db.refresh(audio_file)
+    
+    # The upload closed the spooled file; the worker reads the stored copy
+    job = await transcription_jobs.submit_stored(
+        file_url,
+        options={"language": language},
+        audio_file_id=audio_file.id,
+        callback_url=callback_url,
+        user_id=str(current_user.id)
+    )
+    
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "audio_file_id": audio_file.id,
+        "file_url": file_url
+    }
 
 @router.post("/synthesize")
 async def synthesize_speech(
@@ -228,7 +234,7 @@ async def synthesize_speech(
 
 class ChatbotMemoryManager:
     def __init__(self):
-        self.embedding_model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+        self.embedding_model = EmbeddingModelRegistry.get_model(settings.CHATBOT_EMBEDDING_MODEL)
         self.client = None  # Initialize your vector store client here
         self._init_collections()  # Initialize collections on startup
 
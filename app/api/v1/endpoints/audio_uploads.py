@@ -0,0 +1,181 @@
+import math
+import os
+from fastapi import APIRouter, Depends, HTTPException
+from botocore.exceptions import ClientError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.utils import get_current_user
+from app.db.dependencies import get_db
+from app.models.audio_file import AudioFile
+from app.models.users import User
+from app.schemas.files import AbortAudioUpload, AudioUploadPurpose, CompleteAudioUpload, DirectUploadRequest
+from app.services.s3 import new_key, storage
+from app.services.transcription_jobs import transcription_jobs, validate_callback_url
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/uploads/audio", tags=["Audio Uploads"])
+
+# Where each kind of upload lands, who may make it and what runs after it
+UPLOAD_PURPOSES = {
+    AudioUploadPurpose.submission: {
+        "folder": "AudioSubmissions", "audio_type": "submission", "roles": ["Student"], "job_kind": "transcribe"
+    },
+    AudioUploadPurpose.private: {
+        "folder": "PrivateUploads", "audio_type": "private", "roles": ["Teacher"], "job_kind": "transcribe"
+    },
+    AudioUploadPurpose.shadowbank: {
+        "folder": "ShadowBank", "audio_type": "shadowbank", "roles": None, "job_kind": "shadowbank_feedback"
+    },
+}
+
+# S3 rejects multipart uploads with more parts than this
+MAX_MULTIPART_PARTS = 10000
+
+
+def _purpose_for(purpose: AudioUploadPurpose, user: User) -> dict:
+    config = UPLOAD_PURPOSES[purpose]
+    if config["roles"] and user.role.name not in config["roles"]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    return config
+
+
+def _user_folder(config: dict, user: User) -> str:
+    return f"{config['folder']}/{user.id}"
+
+
+@router.post("/presign")
+async def presign_audio_upload(
+    request: DirectUploadRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get upload urls so the client can send audio straight to the bucket
+
+    Files up to S3_MULTIPART_THRESHOLD get a presigned POST (url + form
+    fields). Larger files get a multipart upload with one presigned PUT
+    url per S3_MULTIPART_PART_SIZE part; PUT each part, keep the ETag
+    response header and send the list to /uploads/audio/complete.
+    """
+    config = _purpose_for(request.purpose, current_user)
+    if not request.content_type.startswith("audio/"):
+        raise HTTPException(status_code=400, detail="Only audio uploads are accepted")
+    if request.size <= 0:
+        raise HTTPException(status_code=400, detail="File is empty")
+    if request.size > settings.DIRECT_UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"File exceeds {settings.DIRECT_UPLOAD_MAX_BYTES} bytes")
+
+    key = new_key(_user_folder(config, current_user), request.filename)
+    try:
+        if request.size <= settings.S3_MULTIPART_THRESHOLD:
+            post = await storage.presigned_post(
+                key, request.content_type, settings.DIRECT_UPLOAD_MAX_BYTES, settings.S3_PRESIGN_EXPIRES
+            )
+            return {"method": "post", "key": key, "url": post["url"], "fields": post["fields"]}
+
+        part_size = max(settings.S3_MULTIPART_PART_SIZE, math.ceil(request.size / MAX_MULTIPART_PARTS))
+        upload = await storage.create_multipart_upload(
+            key, request.content_type, math.ceil(request.size / part_size), settings.S3_PRESIGN_EXPIRES
+        )
+        return {
+            "method": "multipart",
+            "key": key,
+            "upload_id": upload["upload_id"],
+            "part_size": part_size,
+            "parts": upload["parts"]
+        }
+    except ClientError as e:
+        logger.error(f"Error presigning upload: {str(e)}")
+        raise HTTPException(status_code=500, detail="Could not start the upload")
+
+
+@router.post("/complete", status_code=201)
+async def complete_audio_upload(
+    request: CompleteAudioUpload,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Register a finished direct upload
+
+    Assembles multipart uploads, checks the object landed in the caller's
+    folder, creates the AudioFile row and queues transcription. The audio
+    bytes never pass through this server.
+    """
+    config = _purpose_for(request.purpose, current_user)
+    if not request.key.startswith(f"{_user_folder(config, current_user)}/"):
+        raise HTTPException(status_code=403, detail="Upload does not belong to this user")
+    await validate_callback_url(request.callback_url)
+    if db.query(AudioFile.id).filter(AudioFile.file_url == request.key).first():
+        raise HTTPException(status_code=409, detail="Upload already completed")
+
+    if request.upload_id:
+        if not request.parts:
+            raise HTTPException(status_code=400, detail="Multipart uploads need their parts")
+        try:
+            await storage.complete_multipart_upload(
+                request.key, request.upload_id, [part.dict() for part in request.parts]
+            )
+        except ClientError as e:
+            raise HTTPException(status_code=400, detail=f"Could not complete upload: {str(e)}")
+
+    head = await storage.head(request.key)
+    if head is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if head["ContentLength"] > settings.DIRECT_UPLOAD_MAX_BYTES:
+        await storage.delete(request.key)
+        raise HTTPException(status_code=413, detail=f"File exceeds {settings.DIRECT_UPLOAD_MAX_BYTES} bytes")
+
+    owner_id = current_user.id
+    if request.purpose == AudioUploadPurpose.private:
+        if not request.user_id:
+            raise HTTPException(status_code=400, detail="user_id is required for private uploads")
+        owner_id = request.user_id
+
+    audio_file = AudioFile(
+        user_id=owner_id,
+        audio_type=config["audio_type"],
+        file_url=request.key,
+        topic=request.topic,
+        question_type=request.question_type,
+        language_level=request.language_level,
+        rubric_score=request.rubric_score
+    )
+    db.add(audio_file)
+    db.commit()
+    db.refresh(audio_file)
+
+    response = {
+        "audio_file_id": audio_file.id,
+        "file_url": request.key,
+        "size": head["ContentLength"],
+        "job_id": None,
+        "status": None
+    }
+    if request.transcribe or config["job_kind"] != "transcribe":
+        job = await transcription_jobs.submit_stored(
+            request.key,
+            options={"language": request.language},
+            kind=config["job_kind"],
+            audio_file_id=audio_file.id,
+            callback_url=request.callback_url,
+            user_id=str(current_user.id)
+        )
+        response.update({"job_id": job["id"], "status": job["status"]})
+    return response
+
+
+@router.post("/abort", status_code=204)
+async def abort_audio_upload(
+    request: AbortAudioUpload,
+    current_user: User = Depends(get_current_user)
+):
+    """Abandon a multipart upload so its parts stop taking up storage"""
+    folder = os.path.dirname(request.key)
+    if not any(folder == _user_folder(config, current_user) for config in UPLOAD_PURPOSES.values()):
+        raise HTTPException(status_code=403, detail="Upload does not belong to this user")
+    try:
+        await storage.abort_multipart_upload(request.key, request.upload_id)
+    except ClientError as e:
+        raise HTTPException(status_code=400, detail=f"Could not abort upload: {str(e)}")
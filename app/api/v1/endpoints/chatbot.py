@@ -1,6 +1,7 @@
 from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from app.core.config import settings
 from app.core.utils import get_current_user
 from app.services.chatbot_service import ChatbotService
 from app.models.chatbot import (
@@ -9,7 +10,10 @@ from app.models.chatbot import (
     ConversationContext
 )
 from app.schemas.common import ResponseSchema
-from app.core.chatbot_vector_store import ChatbotVectorStore
+from app.core.chatbot_vector_store import ChatbotVectorStore, get_chatbot_vector_store
+from app.core.embedding_registry import EmbeddingModelRegistry
+from app.core.embedding_engine import get_engine_stats
+from app.core.cache import get_cache
 from uuid import uuid4
 from datetime import datetime
 
@@ -46,6 +50,31 @@ async def store_memory(
         data=stored_memory
     )
 
+@router.post("/memories/bulk", response_model=ResponseSchema)
+async def store_memories_bulk(
+    memories: List[ChatbotMemorySchema],
+    current_user: Any = Depends(get_current_user),
+    chatbot_service: ChatbotService = Depends()
+) -> ResponseSchema:
+    """Store many chatbot memories in one request"""
+    if not memories:
+        raise HTTPException(status_code=400, detail="No memories provided")
+    if len(memories) > settings.CHATBOT_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.CHATBOT_BULK_MAX_ITEMS} memories can be stored per request"
+        )
+
+    result = await chatbot_service.store_memories_bulk(memories, current_user)
+    return ResponseSchema(
+        success=True,
+        data={
+            "stored": result["stored"],
+            "memory_ids": result["memory_ids"]
+        },
+        meta={"stages": result["stages"]}
+    )
+
 @router.get("/conversations/{conversation_id}/context", response_model=ResponseSchema)
 async def get_conversation_context(
     conversation_id: str,
@@ -120,7 +149,7 @@ async def search_similar_memories(
 # Test endpoint to check Qdrant connection
 @router.get("/test/connection", response_model=ResponseSchema)
 async def test_qdrant_connection(
-    vector_store: ChatbotVectorStore = Depends()
+    vector_store: ChatbotVectorStore = Depends(get_chatbot_vector_store)
 ) -> ResponseSchema:
     """Test Qdrant connection and list collections"""
     try:
@@ -138,12 +167,39 @@ async def test_qdrant_connection(
             detail=f"Failed to connect to Qdrant: {str(e)}"
         )
 
+# Test endpoint to inspect loaded embedding models
+@router.get("/test/models", response_model=ResponseSchema)
+async def get_embedding_model_stats() -> ResponseSchema:
+    """Load time and memory footprint of embedding models in this worker"""
+    return ResponseSchema(
+        success=True,
+        data=EmbeddingModelRegistry.get_stats()
+    )
+
+# Test endpoint to inspect embedding batching
+@router.get("/test/embedding-engine", response_model=ResponseSchema)
+async def get_embedding_engine_stats() -> ResponseSchema:
+    """Batch-size and queue-wait histograms for the embedding engines"""
+    return ResponseSchema(
+        success=True,
+        data=get_engine_stats()
+    )
+
+# Test endpoint to inspect the shared cache
+@router.get("/test/cache", response_model=ResponseSchema)
+async def get_cache_stats() -> ResponseSchema:
+    """Per-tier hit rates, coalesced loads and early refreshes of the shared cache"""
+    return ResponseSchema(
+        success=True,
+        data=get_cache().get_stats()
+    )
+
 # Test endpoint to store a test memory
 @router.post("/test/store", response_model=ResponseSchema)
 async def test_store_memory(
     content: str,
     memory_type: ChatbotMemoryType = ChatbotMemoryType.USER_MESSAGE,
-    vector_store: ChatbotVectorStore = Depends()
+    vector_store: ChatbotVectorStore = Depends(get_chatbot_vector_store)
 ) -> ResponseSchema:
     """Test storing a memory in Qdrant"""
     try:
@@ -180,7 +236,7 @@ async def test_search_memories(
     query: str,
     memory_type: Optional[ChatbotMemoryType] = None,
     limit: int = Query(5, ge=1, le=50),
-    vector_store: ChatbotVectorStore = Depends()
+    vector_store: ChatbotVectorStore = Depends(get_chatbot_vector_store)
 ) -> ResponseSchema:
     """Test searching memories in Qdrant"""
     try:
@@ -1,39 +1,41 @@
-import tempfile
-from fastapi import APIRouter, Depends, UploadFile, File
-import os
-import openai
-# import whisper 
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Depends, UploadFile, File, Form
 from app.core.utils import get_current_user
+from app.services.llm import llm_service
+from app.services.transcription_jobs import transcription_jobs
 
 
 router=APIRouter(tags=["ShadowBank"])
 
-# model = whisper.load_model("base")
 
-@router.post("/shadowbank/upload")
-async def upload_voice(
-    file: UploadFile = File(...),
-    user: dict = Depends(get_current_user)
-):
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
-        tmp.write(await file.read())
-        tmp_path = tmp.name
-
-    # result = model.transcribe(tmp_path, language="zh")
-    # transcript = result["text"]
-
-    os.remove(tmp_path)
-
-#     prompt = f"""你是中文口语老师。学生说了：\n\n"{transcript}"\n\n
-# 请给予发音和流利度的反馈，指出一个可以改进的地方，用简洁、鼓励性的语言回复。"""
+async def shadowbank_feedback(job: Dict[str, Any], transcript_result: Dict[str, Any]) -> Dict[str, Any]:
+    """Pronunciation and fluency feedback, run by the worker once the recording is transcribed"""
+    transcript = transcript_result["text"]
+    prompt = f"""你是中文口语老师。学生说了：\n\n"{transcript}"\n\n
+请给予发音和流利度的反馈，指出一个可以改进的地方，用简洁、鼓励性的语言回复。"""
 
-    gpt_response = openai.ChatCompletion.create(
+    gpt_response = await llm_service.chat(
         model="gpt-4",
-        # messages=[{"role": "user", "content": prompt}],
-         messages=[{"role": "user", "content": ''}],
+        messages=[{"role": "user", "content": prompt}],
         temperature=0.7
     )
+    return {"transcript": transcript, "feedback": gpt_response.choices[0].message.content.strip()}
 
-    feedback = gpt_response.choices[0].message.content.strip()
-    return {"transcript": '', "feedback": feedback}
-#  return {"transcript": transcript, "feedback": feedback}
+transcription_jobs.register("shadowbank_feedback", shadowbank_feedback)
+
+
+@router.post("/shadowbank/upload", status_code=202)
+async def upload_voice(
+    file: UploadFile = File(...),
+    callback_url: Optional[str] = Form(None),
+    user: dict = Depends(get_current_user)
+):
+    """Queue a recording for transcription and feedback; poll the job for the result"""
+    job = await transcription_jobs.submit(
+        file,
+        options={"language": "zh-CN"},
+        kind="shadowbank_feedback",
+        callback_url=callback_url,
+        user_id=str(user.id)
+    )
+    return {"job_id": job["id"], "status": job["status"]}
@@ -1,25 +1,30 @@
 import os
+import json
+import time
 import shutil
-import uuid
-from typing import Optional, List
+import asyncio
+from typing import Optional, List, Dict, Any
 from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.core.config import settings
 from app.core.utils import get_current_user, stt_transcribe
+from app.core.audio_toolchain import AudioSource, audio_toolchain
+from app.services.transcription_jobs import public_job, transcription_jobs
 from app.db.database import SessionLocal
 from app.models.users import User
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 import speech_recognition as sr
-from pydub import AudioSegment
 import tempfile
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Constants
-TEMP_AUDIO_DIR = "temp_audio"
 SUPPORTED_FORMATS = [".wav", ".mp3", ".ogg", ".flac", ".m4a"]
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 
-# Create temp directory if it doesn't exist
-os.makedirs(TEMP_AUDIO_DIR, exist_ok=True)
-
 class TranscriptionOptions(BaseModel):
     language: Optional[str] = "en-US"
     punctuate: bool = True
@@ -40,27 +45,9 @@ router = APIRouter(
     tags=["stt"]
 )
 
-def convert_to_wav(input_path: str) -> str:
-    """Convert audio file to WAV format"""
-    audio = AudioSegment.from_file(input_path)
-    wav_path = f"{TEMP_AUDIO_DIR}/{uuid.uuid4()}.wav"
-    audio.export(wav_path, format="wav")
-    return wav_path
-
-@router.post("/stt/", response_model=TranscriptionResponse)
-async def speech_to_text(
-    file: UploadFile = File(...),
-    options: TranscriptionOptions = None,
-    current_user: User = Depends(get_current_user)
-):
-    """
-    Convert speech to text with advanced options
-    """
-    if not options:
-        options = TranscriptionOptions()
-
+def validate_upload(file: UploadFile):
+    """Reject uploads that are too large or in an unsupported format"""
     # Validate file size
-    file_size = 0
     file.file.seek(0, 2)
     file_size = file.file.tell()
     file.file.seek(0)
@@ -76,61 +63,167 @@ async def speech_to_text(
             detail=f"Unsupported file format. Supported formats: {', '.join(SUPPORTED_FORMATS)}"
         )
 
-    # Save uploaded file
-    temp_file_path = f"{TEMP_AUDIO_DIR}/{uuid.uuid4()}{file_ext}"
-    with open(temp_file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+async def transcribe_audio(audio: AudioSource, options: TranscriptionOptions) -> TranscriptionResponse:
+    """Transcribe one validated audio source"""
+    transcript_result = await stt_transcribe(
+        audio,
+        language=options.language,
+        punctuate=options.punctuate,
+        speaker_diarization=options.speaker_diarization,
+        word_timestamps=options.word_timestamps,
+        profanity_filter=options.profanity_filter
+    )
 
-    try:
-        # Convert to WAV if needed
-        if file_ext != ".wav":
-            wav_path = convert_to_wav(temp_file_path)
-            os.remove(temp_file_path)
-            temp_file_path = wav_path
-
-        # Perform transcription
-        transcript_result = await stt_transcribe(
-            temp_file_path,
-            language=options.language,
-            punctuate=options.punctuate,
-            speaker_diarization=options.speaker_diarization,
-            word_timestamps=options.word_timestamps,
-            profanity_filter=options.profanity_filter
-        )
+    return TranscriptionResponse(
+        transcript=transcript_result["text"],
+        language=transcript_result["language"],
+        confidence=transcript_result["confidence"],
+        duration=transcript_result["duration"],
+        word_timestamps=transcript_result.get("word_timestamps"),
+        speakers=transcript_result.get("speakers")
+    )
 
-        return TranscriptionResponse(
-            transcript=transcript_result["text"],
-            language=transcript_result["language"],
-            confidence=transcript_result["confidence"],
-            duration=transcript_result["duration"],
-            word_timestamps=transcript_result.get("word_timestamps"),
-            speakers=transcript_result.get("speakers")
+@router.post("/stt/", response_model=TranscriptionResponse)
+async def speech_to_text(
+    file: UploadFile = File(...),
+    options: TranscriptionOptions = None,
+    async_job: bool = Query(False, description="Queue the transcription and return a job id"),
+    callback_url: Optional[str] = Query(None, description="URL to POST the finished job to"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Convert speech to text with advanced options
+    
+    With async_job=true the file is queued and a 202 with the job id is
+    returned immediately; poll /transcription-jobs/{job_id} or pass a
+    callback_url.
+    """
+    if not options:
+        options = TranscriptionOptions()
+
+    validate_upload(file)
+
+    if async_job:
+        job = await transcription_jobs.submit(
+            file,
+            options=options.dict(),
+            callback_url=callback_url,
+            user_id=str(current_user.id)
         )
+        return JSONResponse(status_code=202, content=public_job(job))
 
+    try:
+        # Decode straight from the upload spool; no temp files
+        return await transcribe_audio(file.file, options)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        # Cleanup
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
+
+async def _transcribe_batch_item(
+    index: int,
+    filename: str,
+    audio: AudioSource,
+    options: TranscriptionOptions,
+    slots: asyncio.Semaphore,
+    submitted_at: float
+) -> Dict[str, Any]:
+    """Transcribe one batch file; failures are reported, never raised"""
+    async with slots:
+        started_at = time.perf_counter()
+        result = {"index": index, "filename": filename}
+        try:
+            result["transcription"] = await transcribe_audio(audio, options)
+            result["status"] = "ok"
+        except Exception as e:
+            logger.error(f"Batch transcription of {filename} failed: {str(e)}")
+            result["status"] = "error"
+            result["error"] = str(e)
+        finished_at = time.perf_counter()
+
+    result["timings"] = {
+        "queued_ms": round((started_at - submitted_at) * 1000, 1),
+        "transcribe_ms": round((finished_at - started_at) * 1000, 1),
+        "total_ms": round((finished_at - submitted_at) * 1000, 1)
+    }
+    return result
 
 @router.post("/stt/batch/")
 async def batch_speech_to_text(
     files: List[UploadFile] = File(...),
     options: TranscriptionOptions = None,
+    stream: bool = Query(False, description="Stream results as NDJSON in completion order"),
     current_user: User = Depends(get_current_user)
 ):
     """
     Process multiple audio files for transcription
+    
+    Files are transcribed concurrently, at most STT_BATCH_CONCURRENCY at a
+    time. A file that fails validation or transcription gets an error entry
+    instead of failing the batch. Results come back in upload order, or as
+    NDJSON lines as each file finishes when stream=true.
+    """
+    if not options:
+        options = TranscriptionOptions()
+    if len(files) > settings.STT_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files; the limit is {settings.STT_BATCH_MAX_FILES} per batch"
+        )
+
+    submitted_at = time.perf_counter()
+    slots = asyncio.Semaphore(settings.STT_BATCH_CONCURRENCY)
+    results = [None] * len(files)
+    tasks = []
+    spools = []
+    for index, file in enumerate(files):
+        try:
+            validate_upload(file)
+        except HTTPException as e:
+            results[index] = {"index": index, "filename": file.filename, "status": "error", "error": e.detail}
+            continue
+
+        audio = file.file
+        if stream:
+            # Upload spools are closed once the handler returns, so streamed
+            # batches keep their own spool (in memory until AUDIO_SPOOL_MAX_BYTES)
+            audio = tempfile.SpooledTemporaryFile(max_size=settings.AUDIO_SPOOL_MAX_BYTES)
+            shutil.copyfileobj(file.file, audio)
+            spools.append(audio)
+        tasks.append(asyncio.create_task(
+            _transcribe_batch_item(index, file.filename, audio, options, slots, submitted_at)
+        ))
+
+    if not stream:
+        for result in await asyncio.gather(*tasks):
+            results[result["index"]] = result
+        return {
+            "results": results,
+            "total_ms": round((time.perf_counter() - submitted_at) * 1000, 1)
+        }
+
+    async def ndjson_results():
+        try:
+            for result in results:
+                if result is not None:
+                    yield json.dumps(jsonable_encoder(result), ensure_ascii=False) + "\n"
+            for finished in asyncio.as_completed(tasks):
+                result = await finished
+                yield json.dumps(jsonable_encoder(result), ensure_ascii=False) + "\n"
+        finally:
+            # The client may have disconnected; stop the remaining work before freeing the spools
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for spool in spools:
+                spool.close()
+
+    return StreamingResponse(ndjson_results(), media_type="application/x-ndjson")
+
+@router.get("/stt/capabilities/")
+async def get_audio_capabilities():
+    """
+    Get the FFmpeg version and audio codecs available for decoding and encoding
     """
-    results = []
-    for file in files:
-        result = await speech_to_text(file, options, current_user)
-        results.append({
-            "filename": file.filename,
-            "transcription": result
-        })
-    return {"results": results}
+    return audio_toolchain.describe()
 
 @router.get("/stt/supported-languages/")
 async def get_supported_languages():
@@ -122,7 +122,7 @@ async def submit_audio(
 ):
     """Submit audio for a lesson"""
     # Upload to S3
-    file_url = upload_to_s3(file, "StudentSubmissions")
+    file_url = await upload_to_s3(file, "StudentSubmissions")
     
     # Create audio record
     new_audio = AudioFile(
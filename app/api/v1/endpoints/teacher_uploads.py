@@ -30,7 +30,7 @@ async def upload_private_audio(
     current_user: dict = Depends(role_required("Teacher"))
 ):
     """Upload a private audio file for a student"""
-    file_url = upload_to_s3(file, "PrivateUploads")
+    file_url = await upload_to_s3(file, "PrivateUploads")
 
     new_audio = AudioFile(
         user_id=user_id,
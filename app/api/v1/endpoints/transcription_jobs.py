@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException
+from app.core.utils import get_current_user
+from app.models.users import User
+from app.services.transcription_jobs import public_job, transcription_jobs
+
+router = APIRouter(tags=["Transcription Jobs"])
+
+
+@router.get("/transcription-jobs/stats")
+async def get_transcription_job_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get transcription queue depth, processing lag and throughput
+    """
+    return await transcription_jobs.get_stats()
+
+@router.get("/transcription-jobs/{job_id}")
+async def get_transcription_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Poll a transcription job; the result is included once it has completed
+    """
+    job = await transcription_jobs.get(job_id)
+    if not job or job["user_id"] != str(current_user.id):
+        raise HTTPException(status_code=404, detail="Transcription job not found")
+    return public_job(job)
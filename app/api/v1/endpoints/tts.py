@@ -1,26 +1,24 @@
 import os
-import uuid
 from typing import Optional, List
-from fastapi import APIRouter, Depends, Form, HTTPException, Query
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import APIRouter, Depends, Form, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
-from app.core.utils import get_current_user
+from app.core.scratch import temp_audio
+from app.core.utils import get_current_user, role_required
 from app.models.users import User
-from app.services.tts import tts_generate, VOICES, VOICE_INFO, AUDIO_FORMATS
+from app.services.downloads import file_download
+from app.services.tts import tts_generate, tts_generate_chunked, VOICES, VOICE_INFO, AUDIO_FORMATS
+from app.services.tts_cache import tts_audio_cache, tts_cache_key
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     # prefix="/user",
     tags=["Text-to-Speech"]
 )
 
-# Constants
-TEMP_AUDIO_DIR = "temp_audio"
-os.makedirs(TEMP_AUDIO_DIR, exist_ok=True)
-
-# In-memory cache for generated audio files
-session_cache = {}
-
 # Pydantic models for request/response
 class TTSRequest(BaseModel):
     text: str = Field(..., description="Text to convert to speech")
@@ -36,6 +34,29 @@ class TTSResponse(BaseModel):
     audio_format: str = Field(..., description="Format of the generated audio")
     duration: Optional[float] = Field(None, description="Duration of the audio in seconds")
 
+def validate_tts_request(request: TTSRequest, formats=AUDIO_FORMATS):
+    """Raise a 400 for an unsupported format, speaking rate or pitch"""
+    # Validate audio format
+    if request.audio_format not in formats:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported audio format. Supported formats: {', '.join(formats)}"
+        )
+    
+    # Validate speaking rate
+    if not 0.5 <= request.speaking_rate <= 2.0:
+        raise HTTPException(
+            status_code=400,
+            detail="Speaking rate must be between 0.5 and 2.0"
+        )
+    
+    # Validate pitch
+    if not -10 <= request.pitch <= 10:
+        raise HTTPException(
+            status_code=400,
+            detail="Pitch must be between -10 and 10"
+        )
+
 @router.post("/tts", response_model=TTSResponse)
 async def text_to_speech(
     request: TTSRequest,
@@ -52,63 +73,102 @@ async def text_to_speech(
         TTSResponse: Contains information about the generated audio
     """
     try:
-        # Validate audio format
-        if request.audio_format not in AUDIO_FORMATS:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Unsupported audio format. Supported formats: {', '.join(AUDIO_FORMATS.keys())}"
-            )
+        validate_tts_request(request)
         
-        # Validate speaking rate
-        if not 0.5 <= request.speaking_rate <= 2.0:
-            raise HTTPException(
-                status_code=400,
-                detail="Speaking rate must be between 0.5 and 2.0"
-            )
+        voice_name = request.voice_name or "zh-CN-XiaoxiaoNeural"
         
-        # Validate pitch
-        if not -10 <= request.pitch <= 10:
-            raise HTTPException(
-                status_code=400,
-                detail="Pitch must be between -10 and 10"
-            )
-        
-        # Check cache first
-        cache_key = f"tts-{request.text}-{request.voice_name}-{request.audio_format}-{request.speaking_rate}-{request.pitch}"
-        if cache_key in session_cache:
-            return TTSResponse(
-                audio_file=session_cache[cache_key],
-                voice_name=request.voice_name or "zh-CN-XiaoxiaoNeural",
-                audio_format=request.audio_format
-            )
-        
-        # Generate speech
-        audio_data = await tts_generate(
-            text=request.text,
-            voice_name=request.voice_name,
-            audio_format=request.audio_format,
-            speaking_rate=request.speaking_rate,
-            pitch=request.pitch,
-            use_ssml=request.use_ssml
+        # Files are named by content hash, so repeated requests reuse one file
+        cache_key = tts_cache_key(
+            request.text,
+            voice_name,
+            request.audio_format,
+            request.speaking_rate,
+            request.pitch,
+            request.use_ssml
         )
+        file_name = f"{cache_key}.{request.audio_format}"
         
-        # Save to temporary file
-        temp_audio_path = f"{TEMP_AUDIO_DIR}/{uuid.uuid4()}.{request.audio_format}"
-        with open(temp_audio_path, "wb") as f:
-            f.write(audio_data)
-        
-        # Cache the result
-        session_cache[cache_key] = temp_audio_path
+        temp_audio_path = temp_audio.touch(file_name)
+        if temp_audio_path is None:
+            # Generate speech (served from the TTS audio cache when possible)
+            audio_data = await tts_generate(
+                text=request.text,
+                voice_name=voice_name,
+                audio_format=request.audio_format,
+                speaking_rate=request.speaking_rate,
+                pitch=request.pitch,
+                use_ssml=request.use_ssml
+            )
+            temp_audio_path = await temp_audio.write(audio_data, name=file_name)
         
         return TTSResponse(
             audio_file=temp_audio_path,
-            voice_name=request.voice_name or "zh-CN-XiaoxiaoNeural",
+            voice_name=voice_name,
             audio_format=request.audio_format
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Formats whose clips can be concatenated into one playable stream (WAV has a per-clip header)
+STREAMABLE_FORMATS = ["mp3", "ogg"]
+
+@router.post("/tts/stream")
+async def text_to_speech_stream(
+    request: TTSRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Stream speech for long text as a chunked response
+    
+    The text is split at sentence boundaries and synthesized a few
+    sentences at a time, so playback can start after the first sentence.
+    
+    Args:
+        request: TTS request parameters
+        current_user: The authenticated user
+    
+    Returns:
+        StreamingResponse: Audio clips in sentence order
+    """
+    validate_tts_request(request, STREAMABLE_FORMATS)
+    voice_name = request.voice_name or "zh-CN-XiaoxiaoNeural"
+    
+    clips = tts_generate_chunked(
+        text=request.text,
+        voice_name=voice_name,
+        audio_format=request.audio_format,
+        speaking_rate=request.speaking_rate,
+        pitch=request.pitch,
+        use_ssml=request.use_ssml
+    )
+    
+    # Wait for the first clip so a synthesis failure is still a proper error response
+    try:
+        first_clip = await clips.__anext__()
+    except StopAsyncIteration:
+        raise HTTPException(status_code=400, detail="Text contains nothing to synthesize")
+    except Exception as e:
+        await clips.aclose()
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def audio_stream():
+        yield first_clip
+        try:
+            async for clip in clips:
+                yield clip
+        except Exception as e:
+            # Headers are already sent; end the stream early
+            logger.error(f"Streaming TTS failed: {str(e)}")
+        finally:
+            await clips.aclose()
+    
+    return StreamingResponse(
+        audio_stream(),
+        media_type=f"audio/{request.audio_format}",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/tts/voices")
 async def get_available_voices(
     language: Optional[str] = Query(None, description="Filter voices by language code (e.g., zh-CN, en-US)")
@@ -141,6 +201,7 @@ async def get_supported_formats():
 @router.get("/tts/audio/{file_id}")
 async def get_audio_file(
     file_id: str,
+    request: Request,
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -148,37 +209,63 @@ async def get_audio_file(
     
     Args:
         file_id: ID of the audio file
+        request: Used for Range and If-None-Match handling
         current_user: The authenticated user
     
     Returns:
-        FileResponse: The audio file
+        StreamingResponse: The audio file, or the requested byte range of it
     """
-    file_path = f"{TEMP_AUDIO_DIR}/{file_id}"
-    if not os.path.exists(file_path):
+    try:
+        # Serving a file counts as using it, so it outlives its ttl while being played
+        file_path = temp_audio.touch(file_id)
+    except ValueError:
+        file_path = None
+    if file_path is None:
         raise HTTPException(status_code=404, detail="Audio file not found")
-    
-    return FileResponse(
+
+    # Files are named by the hash of what was synthesized, so their content never changes
+    return file_download(
+        request,
         file_path,
-        media_type=f"audio/{os.path.splitext(file_path)[1][1:]}"
+        media_type=f"audio/{os.path.splitext(file_path)[1][1:]}",
+        disposition="inline",
+        cache_control="private, max-age=86400, immutable"
     )
 
 @router.delete("/tts/cache")
 async def clear_cache(
-    current_user: User = Depends(get_current_user)
+    admin_user: User = Depends(role_required("Admin"))
 ):
     """
-    Clear the TTS cache
+    Clear the TTS cache, including the shared disk store
     
     Args:
-        current_user: The authenticated user
+        admin_user: The authenticated admin
     
     Returns:
         dict: Success message
     """
-    global session_cache
-    session_cache = {}
+    await tts_audio_cache.clear()
     return {"message": "Cache cleared successfully"}
 
+@router.get("/tts/cache/stats")
+async def get_cache_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get TTS audio cache hit rates and sizes
+    """
+    return tts_audio_cache.get_stats()
+
+@router.get("/tts/temp-audio/stats")
+async def get_temp_audio_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get file count, disk usage and reaper activity for generated audio files
+    """
+    return temp_audio.get_stats()
+
 # @router.post("/avatar/")
 # async def avatar_generate(text: str = Form(...), current_user: User = Depends(get_current_user)):
 #     video_url = await generate_avatar_speech(text)
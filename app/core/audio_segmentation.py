@@ -0,0 +1,173 @@
+import asyncio
+import wave
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from app.core.audio_toolchain import (
+    AudioSource,
+    TARGET_SAMPLE_RATE,
+    wav_header,
+    audio_toolchain,
+    decode_to_target_wav,
+    is_target_wav
+)
+from app.core.config import settings
+from app.core.utils import stt_transcribe
+import logging
+
+logger = logging.getLogger(__name__)
+
+FRAME_MS = 30
+TIMESTAMP_KEYS = ("start", "end", "start_time", "end_time", "offset")
+
+
+def _frame_dbfs(frame: bytes) -> float:
+    samples = np.frombuffer(frame, dtype="<i2").astype(np.float32)
+    if samples.size == 0:
+        return -120.0
+    rms = np.sqrt(np.mean(samples * samples))
+    return 20 * np.log10(max(rms, 1.0) / 32768.0)
+
+
+def find_segments(
+    wav: wave.Wave_read,
+    max_seconds: float,
+    min_silence_ms: int,
+    silence_dbfs: float
+) -> Iterator[Tuple[int, int]]:
+    """
+    Yield (start_sample, end_sample) ranges split at silences
+
+    Audio is scanned in 30 ms frames and only the current window's silence
+    flags are kept, so memory does not grow with recording length. Each
+    segment is cut in the middle of its last silence of at least
+    min_silence_ms, or hard-cut at max_seconds when there is none.
+    Segments that are silent throughout are skipped.
+    """
+    frame_samples = TARGET_SAMPLE_RATE * FRAME_MS // 1000
+    max_frames = max(int(max_seconds * 1000 / FRAME_MS), 1)
+    min_silent_frames = max(min_silence_ms // FRAME_MS, 1)
+
+    wav.rewind()
+    segment_start = 0
+    position = 0
+    window: List[bool] = []  # silence flag per frame since segment_start
+    while True:
+        frame = wav.readframes(frame_samples)
+        if not frame:
+            break
+        position += len(frame) // 2
+        window.append(_frame_dbfs(frame) < silence_dbfs)
+        if len(window) < max_frames:
+            continue
+
+        cut = _last_silence_midpoint(window, min_silent_frames) or len(window)
+        if not all(window[:cut]):
+            yield segment_start, segment_start + cut * frame_samples
+        segment_start += cut * frame_samples
+        window = window[cut:]
+
+    if window and not all(window):
+        yield segment_start, position
+
+
+def _last_silence_midpoint(window: List[bool], min_run: int) -> Optional[int]:
+    run_end = None
+    for index in range(len(window) - 1, -1, -1):
+        if window[index]:
+            if run_end is None:
+                run_end = index
+        elif run_end is not None:
+            if run_end - index >= min_run:
+                return (index + 1 + run_end + 1) // 2
+            run_end = None
+    return None
+
+
+def _read_segment(wav: wave.Wave_read, start: int, end: int) -> bytes:
+    wav.setpos(start)
+    pcm = wav.readframes(end - start)
+    return wav_header(len(pcm)) + pcm
+
+
+def _offset_timestamps(words: Any, offset_seconds: float) -> List[dict]:
+    if not isinstance(words, list):
+        return []
+    shifted = []
+    for word in words:
+        word = dict(word)
+        for key in TIMESTAMP_KEYS:
+            if isinstance(word.get(key), (int, float)):
+                word[key] = round(word[key] + offset_seconds, 3)
+        shifted.append(word)
+    return shifted
+
+
+async def transcribe_long_audio(audio: AudioSource, **options: Any) -> Dict[str, Any]:
+    """
+    Transcribe a recording of any length with bounded memory
+
+    Audio is decoded once (spilling to disk when large), split at silences
+    into chunks of at most STT_SEGMENT_MAX_SECONDS, and the chunks are
+    transcribed STT_SEGMENT_CONCURRENCY at a time. Each chunk is read from
+    the spool only when its turn comes. Text is stitched in order and word
+    timestamps are shifted by each chunk's offset. Recordings shorter than
+    STT_SEGMENT_THRESHOLD_SECONDS go through stt_transcribe in one piece.
+    """
+    if not audio_toolchain.available and not is_target_wav(audio):
+        return await stt_transcribe(audio, **options)
+
+    if isinstance(audio, str) and is_target_wav(audio):
+        spool: BinaryIO = open(audio, "rb")
+    else:
+        spool = await asyncio.to_thread(decode_to_target_wav, audio)
+
+    try:
+        wav = wave.open(spool, "rb")
+        duration = wav.getnframes() / TARGET_SAMPLE_RATE
+        if duration <= settings.STT_SEGMENT_THRESHOLD_SECONDS:
+            spool.seek(0)
+            return await stt_transcribe(await asyncio.to_thread(spool.read), **options)
+
+        segments = await asyncio.to_thread(lambda: list(find_segments(
+            wav,
+            settings.STT_SEGMENT_MAX_SECONDS,
+            settings.STT_SEGMENT_MIN_SILENCE_MS,
+            settings.STT_VAD_SILENCE_DBFS
+        )))
+        logger.info(f"Split {duration:.1f}s recording into {len(segments)} segments")
+
+        slots = asyncio.Semaphore(settings.STT_SEGMENT_CONCURRENCY)
+        read_lock = asyncio.Lock()
+
+        async def transcribe_segment(start: int, end: int) -> Dict[str, Any]:
+            async with slots:
+                # The spool has a single file position, so reads take turns
+                async with read_lock:
+                    chunk = await asyncio.to_thread(_read_segment, wav, start, end)
+                return await stt_transcribe(chunk, **options)
+
+        results = await asyncio.gather(*(transcribe_segment(start, end) for start, end in segments))
+    finally:
+        spool.close()
+
+    separator = "" if options.get("language", "zh-CN").startswith(("zh", "ja")) else " "
+    words = []
+    stitched = []
+    for (start, end), result in zip(segments, results):
+        offset = start / TARGET_SAMPLE_RATE
+        words.extend(_offset_timestamps(result.get("word_timestamps"), offset))
+        stitched.append({
+            "start": round(offset, 3),
+            "end": round(end / TARGET_SAMPLE_RATE, 3),
+            "text": result["text"]
+        })
+
+    combined = dict(results[0]) if results else {"language": options.get("language")}
+    combined.update({
+        "text": separator.join(segment["text"].strip() for segment in stitched if segment["text"]),
+        "duration": duration,
+        "segments": stitched
+    })
+    if options.get("word_timestamps"):
+        combined["word_timestamps"] = words
+    return combined
@@ -0,0 +1,305 @@
+import io
+import mmap
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+import wave
+from typing import Any, Dict, Optional, Set, Union, BinaryIO
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Format the speech recognizer expects; inputs already in it skip conversion
+TARGET_SAMPLE_RATE = 16000
+TARGET_CHANNELS = 1
+TARGET_SAMPLE_WIDTH = 2  # 16-bit PCM
+WAV_HEADER_BYTES = 44
+PIPE_CHUNK_BYTES = 64 * 1024
+STDERR_TAIL_BYTES = 64 * 1024
+
+AudioSource = Union[str, bytes, bytearray, memoryview, BinaryIO]
+
+
+class AudioDecodeError(Exception):
+    """Raised when ffmpeg cannot decode the input audio"""
+
+
+def _run(args: list) -> Optional[str]:
+    try:
+        result = subprocess.run(args, capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.error(f"Could not run {args[0]}: {str(e)}")
+        return None
+    return result.stdout if result.returncode == 0 else None
+
+
+def _parse_codec_list(output: str) -> Set[str]:
+    """Audio codec names from `ffmpeg -decoders` / `-encoders` output"""
+    names = set()
+    in_table = False
+    for line in output.splitlines():
+        if line.strip().startswith("------"):
+            in_table = True
+            continue
+        parts = line.split()
+        if in_table and len(parts) >= 2 and parts[0].startswith("A"):
+            names.add(parts[1])
+    return names
+
+
+class AudioToolchain:
+    """
+    FFmpeg capabilities, probed once per process
+
+    probe() runs at startup; anything that asks before then triggers the
+    probe itself. Results never change while the process is running.
+    """
+
+    def __init__(self):
+        self._capabilities: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def probe(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._capabilities is None:
+                self._capabilities = self._probe()
+            return self._capabilities
+
+    def _probe(self) -> Dict[str, Any]:
+        ffmpeg_path = shutil.which("ffmpeg")
+        capabilities = {
+            "ffmpeg": ffmpeg_path is not None,
+            "version": None,
+            "decoders": set(),
+            "encoders": set()
+        }
+        if not ffmpeg_path:
+            logger.warning("FFmpeg not found; only WAV input can be processed")
+            return capabilities
+
+        version = _run([ffmpeg_path, "-hide_banner", "-version"])
+        if version:
+            capabilities["version"] = version.splitlines()[0]
+        capabilities["decoders"] = _parse_codec_list(_run([ffmpeg_path, "-hide_banner", "-decoders"]) or "")
+        capabilities["encoders"] = _parse_codec_list(_run([ffmpeg_path, "-hide_banner", "-encoders"]) or "")
+        logger.info(
+            f"Audio toolchain: {capabilities['version']}, "
+            f"{len(capabilities['decoders'])} audio decoders, {len(capabilities['encoders'])} audio encoders"
+        )
+        return capabilities
+
+    @property
+    def available(self) -> bool:
+        """True when non-WAV input can be decoded (the pipe decoder only needs ffmpeg)"""
+        return self.probe()["ffmpeg"]
+
+    def can_decode(self, codec: str) -> bool:
+        return codec in self.probe()["decoders"]
+
+    def can_encode(self, codec: str) -> bool:
+        return codec in self.probe()["encoders"]
+
+    def describe(self) -> Dict[str, Any]:
+        capabilities = self.probe()
+        return {
+            **capabilities,
+            "decoders": sorted(capabilities["decoders"]),
+            "encoders": sorted(capabilities["encoders"]),
+            "target": {
+                "sample_rate": TARGET_SAMPLE_RATE,
+                "channels": TARGET_CHANNELS,
+                "sample_width": TARGET_SAMPLE_WIDTH
+            }
+        }
+
+
+def is_target_wav(source: Union[str, bytes, BinaryIO]) -> bool:
+    """Check the WAV header for 16 kHz mono 16-bit PCM without decoding the audio"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        # The header is all that's needed; don't copy the whole clip
+        source = io.BytesIO(bytes(memoryview(source)[:PIPE_CHUNK_BYTES]))
+    position = source.tell() if hasattr(source, "tell") else None
+    try:
+        if position is not None:
+            source.seek(0)
+        with wave.open(source, "rb") as wav:
+            return (
+                wav.getframerate() == TARGET_SAMPLE_RATE
+                and wav.getnchannels() == TARGET_CHANNELS
+                and wav.getsampwidth() == TARGET_SAMPLE_WIDTH
+            )
+    except (wave.Error, EOFError, OSError):
+        return False
+    finally:
+        if position is not None:
+            source.seek(position)
+
+
+def wav_header(data_bytes: int) -> bytes:
+    """44-byte header for data_bytes of 16 kHz mono 16-bit PCM"""
+    byte_rate = TARGET_SAMPLE_RATE * TARGET_CHANNELS * TARGET_SAMPLE_WIDTH
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_bytes, b"WAVE",
+        b"fmt ", 16, 1, TARGET_CHANNELS, TARGET_SAMPLE_RATE, byte_rate,
+        TARGET_CHANNELS * TARGET_SAMPLE_WIDTH, TARGET_SAMPLE_WIDTH * 8,
+        b"data", data_bytes
+    )
+
+
+def _fileno(source: Any) -> Optional[int]:
+    """A real OS file descriptor behind source, if it has one"""
+    # fileno() on a SpooledTemporaryFile still in memory would roll it over to disk
+    if not getattr(source, "_rolled", True):
+        return None
+    try:
+        return source.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+def _buffer(source: Any) -> Optional[memoryview]:
+    """The bytes of an in-memory file object (BytesIO or unrolled spool), without copying them"""
+    if not getattr(source, "_rolled", True):
+        source = source._file
+    getbuffer = getattr(source, "getbuffer", None)
+    return getbuffer() if getbuffer else None
+
+
+def decode_to_target_wav(source: AudioSource) -> tempfile.SpooledTemporaryFile:
+    """
+    Decode audio to 16 kHz mono WAV through ffmpeg pipes, without temp files
+
+    source may be a path, a bytes-like object (fed from a memoryview, not
+    copied) or a file object such as an UploadFile spool; a spool that has
+    already rolled over to disk is handed to ffmpeg as its file descriptor.
+    The output stays in memory up to AUDIO_SPOOL_MAX_BYTES and spills to
+    disk beyond that. The caller owns and should close the returned file.
+    """
+    args = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin",
+        "-i", "pipe:0",
+        "-f", "s16le", "-acodec", "pcm_s16le",
+        "-ac", str(TARGET_CHANNELS), "-ar", str(TARGET_SAMPLE_RATE),
+        "pipe:1"
+    ]
+    feed = None
+    opened = None
+    if isinstance(source, str):
+        opened = stdin = open(source, "rb")
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        stdin, feed = subprocess.PIPE, memoryview(source)
+    else:
+        source.seek(0)
+        buffer = _buffer(source)
+        if buffer is not None:
+            stdin, feed = subprocess.PIPE, buffer
+        elif _fileno(source) is not None:
+            stdin = source
+        else:
+            stdin, feed = subprocess.PIPE, memoryview(source.read())
+
+    output = tempfile.SpooledTemporaryFile(max_size=settings.AUDIO_SPOOL_MAX_BYTES)
+    try:
+        process = subprocess.Popen(args, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    finally:
+        if opened:
+            opened.close()
+
+    def write_input():
+        try:
+            for offset in range(0, len(feed), PIPE_CHUNK_BYTES):
+                process.stdin.write(feed[offset:offset + PIPE_CHUNK_BYTES])
+        except BrokenPipeError:
+            # ffmpeg gave up on the input; its stderr says why
+            pass
+        finally:
+            process.stdin.close()
+
+    errors = bytearray()
+
+    def drain_errors():
+        # Read concurrently so a corrupt input's flood of errors can't fill the pipe and stall ffmpeg
+        for chunk in iter(lambda: process.stderr.read1(PIPE_CHUNK_BYTES), b""):
+            errors.extend(chunk)
+            del errors[:-STDERR_TAIL_BYTES]
+
+    timed_out = threading.Event()
+
+    def kill():
+        timed_out.set()
+        process.kill()
+
+    threads = [threading.Thread(target=drain_errors, daemon=True)]
+    if feed is not None:
+        threads.append(threading.Thread(target=write_input, daemon=True))
+    watchdog = threading.Timer(settings.AUDIO_DECODE_TIMEOUT_SECONDS, kill)
+    watchdog.daemon = True
+    for thread in threads:
+        thread.start()
+    watchdog.start()
+
+    try:
+        # Leave room for the header; its sizes are only known at the end
+        output.write(b"\0" * WAV_HEADER_BYTES)
+        shutil.copyfileobj(process.stdout, output, PIPE_CHUNK_BYTES)
+        process.wait()
+        threads[0].join()
+        if timed_out.is_set():
+            raise AudioDecodeError(f"ffmpeg did not finish within {settings.AUDIO_DECODE_TIMEOUT_SECONDS}s")
+        if process.returncode != 0:
+            raise AudioDecodeError(errors.decode(errors="replace").strip() or f"ffmpeg exited with {process.returncode}")
+
+        data_bytes = output.tell() - WAV_HEADER_BYTES
+        output.seek(0)
+        output.write(wav_header(data_bytes))
+        output.seek(0)
+        return output
+    except BaseException:
+        process.kill()
+        output.close()
+        raise
+    finally:
+        watchdog.cancel()
+        for thread in threads:
+            thread.join()
+        process.stdout.close()
+        process.stderr.close()
+        if feed is not None:
+            # An exported buffer would keep the caller's BytesIO from being resized
+            feed.release()
+
+
+def read_target_audio(source: AudioSource) -> Union[bytes, memoryview]:
+    """
+    16 kHz mono WAV for the recognizer, converting only when needed
+
+    Input already in the target format is returned as is (bytes-like input
+    is not copied). Without ffmpeg the input is passed through unchanged.
+    Decoded audio larger than AUDIO_SPOOL_MAX_BYTES is memory-mapped from
+    its spool rather than read into memory.
+    """
+    if isinstance(source, str):
+        if is_target_wav(source) or not audio_toolchain.available:
+            with open(source, "rb") as f:
+                return f.read()
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        if is_target_wav(source) or not audio_toolchain.available:
+            return memoryview(source)
+    else:
+        if is_target_wav(source) or not audio_toolchain.available:
+            source.seek(0)
+            return source.read()
+
+    with decode_to_target_wav(source) as wav:
+        if not getattr(wav, "_rolled", False):
+            return wav.read()
+        # Spilled to disk: map it rather than read it back, so the OS pages it in as it is used
+        return memoryview(mmap.mmap(wav.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+# Create a singleton instance
+audio_toolchain = AudioToolchain()
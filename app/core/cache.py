@@ -1,60 +1,377 @@
-from typing import Any, Optional
+from collections import OrderedDict, defaultdict
+from fnmatch import fnmatchcase
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import asyncio
 import json
-import redis
+import math
+import random
+import struct
+import time
+import redis.asyncio as aioredis
 from app.core.config import settings
+from app.core.metrics import HitCounter
+import logging
+
+logger = logging.getLogger(__name__)
+
+TAG_PREFIX = "tag:"
+
+# Values are stored as a 5-byte header (serializer id, seconds the value
+# took to compute) followed by the payload. Entries written before the
+# header existed are plain JSON, which never starts with one of these ids.
+HEADER = struct.Struct("<Bf")
+
+
+class JsonSerializer:
+    id = 1
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value).encode("utf-8")
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonSerializer:
+    id = 2
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def dumps(self, value: Any) -> bytes:
+        return self._orjson.dumps(value)
+
+    def loads(self, data: bytes) -> Any:
+        return self._orjson.loads(data)
+
+
+class MsgpackSerializer:
+    id = 3
 
-class Cache:
     def __init__(self):
-        self.redis = redis.Redis.from_url(settings.REDIS_URL)
+        import msgpack
+        self._msgpack = msgpack
+
+    def dumps(self, value: Any) -> bytes:
+        return self._msgpack.packb(value, use_bin_type=True)
+
+    def loads(self, data: bytes) -> Any:
+        return self._msgpack.unpackb(data, raw=False)
+
+
+SERIALIZERS = {"json": JsonSerializer, "orjson": OrjsonSerializer, "msgpack": MsgpackSerializer}
+
+
+def get_serializer(name: str) -> Any:
+    """Serializer by name; orjson and msgpack are optional and fall back to json"""
+    try:
+        return SERIALIZERS[name]()
+    except ImportError:
+        logger.warning(f"Cache serializer {name} is not installed; using json")
+        return JsonSerializer()
+
+
+class Cache:
+    """
+    Two-tier cache: a short-lived in-process LRU in front of Redis
+
+    Local hits skip both the Redis round trip and deserialization; treat
+    returned values as read-only since they are shared. The local TTL is
+    short because another process's writes and invalidations only reach
+    this process's LRU when its entries expire.
+
+    Entries can be registered under tags (e.g. "business:<id>", "user:<id>")
+    so a group is invalidated by deleting the members of one set instead of
+    matching the whole keyspace. Pattern invalidation walks the keyspace
+    with SCAN in small batches, never KEYS; invalidate_tag() also runs it
+    when given a fallback_pattern, to catch entries written without tags
+    or whose tag set has expired.
+
+    get_or_set() coalesces concurrent misses for a key into one call of the
+    getter, and refreshes a value in the background shortly before it
+    expires with a probability that rises as expiry nears, weighted by how
+    long the value took to compute (XFetch), so a popular key is not
+    recomputed by every worker at once. Pass a fakeredis.aioredis.FakeRedis
+    as client to test without a server.
+    """
+
+    def __init__(
+        self,
+        client: Optional[Any] = None,
+        serializer: Optional[Any] = None,
+        local_max_entries: Optional[int] = None,
+        local_ttl: Optional[float] = None,
+        early_refresh_beta: Optional[float] = None
+    ):
+        self.redis = client if client is not None else aioredis.Redis.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS
+        )
+        self.serializer = serializer or get_serializer(settings.CACHE_SERIALIZER)
         self.default_expire = 300  # 5 minutes
+        self.tag_expire = settings.CACHE_TAG_TTL
+        self.scan_batch = settings.CACHE_SCAN_BATCH
+        self.local_max_entries = settings.CACHE_LOCAL_MAX_ENTRIES if local_max_entries is None else local_max_entries
+        self.local_ttl = settings.CACHE_LOCAL_TTL if local_ttl is None else local_ttl
+        self.early_refresh_beta = settings.CACHE_EARLY_REFRESH_BETA if early_refresh_beta is None else early_refresh_beta
+        # key -> (local expiry, value, redis expiry or None, compute seconds)
+        self._local: "OrderedDict[str, Tuple[float, Any, Optional[float], float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._decoders = {cls.id: cls for cls in SERIALIZERS.values()}
+        self._decoders[self.serializer.id] = self.serializer
+        self.local_hits = HitCounter()
+        self.redis_hits = HitCounter()
+        self._stats = defaultdict(int)
+
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        return f"{TAG_PREFIX}{tag}"
+
+    def _encode(self, value: Any, delta: float) -> bytes:
+        return HEADER.pack(self.serializer.id, delta) + self.serializer.dumps(value)
+
+    def _decode(self, data: bytes) -> Tuple[Any, float]:
+        serializer = self._decoders.get(data[0]) if len(data) >= HEADER.size else None
+        if serializer is None:
+            return json.loads(data), 0.0
+        if isinstance(serializer, type):
+            try:
+                serializer = serializer()
+            except ImportError:
+                # orjson payloads are plain JSON; anything else fails loudly in json.loads
+                serializer = JsonSerializer()
+            self._decoders[data[0]] = serializer
+        _, delta = HEADER.unpack_from(data)
+        return serializer.loads(data[HEADER.size:]), delta
+
+    def _local_get(self, key: str) -> Optional[Tuple[Any, Optional[float], float]]:
+        if not self.local_max_entries:
+            return None
+        entry = self._local.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._local[key]
+            self.local_hits.record(misses=1)
+            return None
+        self._local.move_to_end(key)
+        self.local_hits.record(hits=1)
+        return entry[1:]
+
+    def _local_put(self, key: str, value: Any, expires_at: Optional[float], delta: float):
+        if not self.local_max_entries:
+            return
+        self._local[key] = (time.monotonic() + self.local_ttl, value, expires_at, delta)
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_max_entries:
+            self._local.popitem(last=False)
+
+    def _local_discard(self, keys: Iterable[Any]):
+        for key in keys:
+            self._local.pop(key.decode() if isinstance(key, bytes) else key, None)
+
+    async def _fetch(self, key: str) -> Optional[Tuple[Any, Optional[float], float]]:
+        """(value, expiry timestamp, compute seconds) from the nearest tier, or None"""
+        entry = self._local_get(key)
+        if entry is not None:
+            return entry
+
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.pttl(key)
+        data, ttl_ms = await pipe.execute()
+        if not data:
+            self.redis_hits.record(misses=1)
+            return None
+        self.redis_hits.record(hits=1)
+        value, delta = self._decode(data)
+        expires_at = time.time() + ttl_ms / 1000 if ttl_ms and ttl_ms > 0 else None
+        self._local_put(key, value, expires_at, delta)
+        return value, expires_at, delta
 
     async def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
-        value = self.redis.get(key)
-        if value:
-            return json.loads(value)
-        return None
+        entry = await self._fetch(key)
+        return entry[0] if entry else None
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Get several values, the Redis ones in a single MGET; missing keys are left out"""
+        found = {}
+        remote = []
+        for key in keys:
+            entry = self._local_get(key)
+            if entry is not None:
+                found[key] = entry[0]
+            else:
+                remote.append(key)
+        if not remote:
+            return found
+
+        values = await self.redis.mget(remote)
+        for key, data in zip(remote, values):
+            if data:
+                value, delta = self._decode(data)
+                self._local_put(key, value, None, delta)
+                found[key] = value
+        hits = sum(1 for data in values if data)
+        self.redis_hits.record(hits=hits, misses=len(remote) - hits)
+        return found
 
     async def set(
         self,
         key: str,
         value: Any,
-        expire: Optional[int] = None
+        expire: Optional[int] = None,
+        tags: Optional[Iterable[str]] = None,
+        delta: float = 0.0
     ):
-        """Set value in cache with optional expiration"""
-        self.redis.setex(
-            key,
-            expire or self.default_expire,
-            json.dumps(value)
-        )
+        """Set value in cache with optional expiration and invalidation tags"""
+        await self.set_many({key: value}, expire, tags, delta)
+
+    async def set_many(
+        self,
+        values: Dict[str, Any],
+        expire: Optional[int] = None,
+        tags: Optional[Iterable[str]] = None,
+        delta: float = 0.0
+    ):
+        """Set several values (all under the same tags) in one pipelined round trip"""
+        if not values:
+            return
+        expire = expire or self.default_expire
+        pipe = self.redis.pipeline(transaction=False)
+        for key, value in values.items():
+            pipe.setex(key, expire, self._encode(value, delta))
+        for tag in tags or ():
+            # A tag set outlives its members, and every write extends it
+            pipe.sadd(self._tag_key(tag), *values.keys())
+            pipe.expire(self._tag_key(tag), max(expire, self.tag_expire))
+        await pipe.execute()
+
+        expires_at = time.time() + expire
+        for key, value in values.items():
+            self._local_put(key, value, expires_at, delta)
+
+    async def delete(self, *keys: str):
+        """Delete values from cache"""
+        if keys:
+            self._local_discard(keys)
+            await self.redis.unlink(*keys)
+
+    async def invalidate_tag(self, tag: str, fallback_pattern: Optional[str] = None) -> int:
+        """
+        Delete every entry registered under tag and return how many keys were removed
+
+        When fallback_pattern is given, the keyspace is also scanned for it,
+        so entries written without the tag, or after their tag set expired,
+        are removed too. Leave it out when every writer tags its entries.
+        """
+        tag_key = self._tag_key(tag)
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.exists(tag_key)
+        pipe.smembers(tag_key)
+        pipe.unlink(tag_key)
+        exists, members, _ = await pipe.execute()
+
+        members = list(members) if exists else []
+        self._local_discard(members)
+        removed = 0
+        for start in range(0, len(members), self.scan_batch):
+            removed += await self.redis.unlink(*members[start:start + self.scan_batch])
+        if fallback_pattern:
+            # Tagged members are already gone, so nothing is counted twice
+            removed += await self.invalidate_pattern(fallback_pattern)
+        return removed
 
-    async def delete(self, key: str):
-        """Delete value from cache"""
-        self.redis.delete(key)
+    async def invalidate_pattern(self, pattern: str) -> int:
+        """Delete keys matching pattern with incremental SCAN, without blocking Redis"""
+        self._local_discard([key for key in self._local if fnmatchcase(key, pattern)])
+        removed = 0
+        batch = []
+        async for key in self.redis.scan_iter(match=pattern, count=self.scan_batch):
+            batch.append(key)
+            if len(batch) >= self.scan_batch:
+                removed += await self.redis.unlink(*batch)
+                batch = []
+        if batch:
+            removed += await self.redis.unlink(*batch)
+        return removed
 
     async def invalidate_memory_cache(self, business_id: str):
         """Invalidate all memory-related caches for a business"""
-        pattern = f"memory:*:{business_id}:*"
-        keys = self.redis.keys(pattern)
-        if keys:
-            self.redis.delete(*keys)
+        await self.invalidate_tag(f"business:{business_id}", fallback_pattern=f"memory:*:{business_id}:*")
 
     async def invalidate_user_cache(self, user_id: str):
         """Invalidate all user-related caches"""
-        pattern = f"user:*:{user_id}:*"
-        keys = self.redis.keys(pattern)
-        if keys:
-            self.redis.delete(*keys)
+        await self.invalidate_tag(f"user:{user_id}", fallback_pattern=f"user:*:{user_id}:*")
+
+    def _should_refresh(self, expires_at: Optional[float], delta: float) -> bool:
+        if not expires_at or delta <= 0 or self.early_refresh_beta <= 0:
+            return False
+        # 1 - random() is in (0, 1], so the log is defined
+        return time.time() - delta * self.early_refresh_beta * math.log(1.0 - random.random()) >= expires_at
+
+    async def _load(self, key: str, getter_func, expire: Optional[int], tags: Optional[Iterable[str]]) -> Any:
+        started = time.monotonic()
+        value = await getter_func()
+        self._stats["loads"] += 1
+        await self.set(key, value, expire, tags, delta=time.monotonic() - started)
+        return value
+
+    def _start_load(self, key: str, getter_func, expire: Optional[int], tags: Optional[Iterable[str]]) -> asyncio.Task:
+        task = asyncio.create_task(self._load(key, getter_func, expire, tags))
+        self._inflight[key] = task
+
+        def finished(task: asyncio.Task):
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+            if not task.cancelled() and task.exception() is not None:
+                logger.warning(f"Cache load for {key} failed: {str(task.exception())}")
+
+        task.add_done_callback(finished)
+        return task
 
     async def get_or_set(
         self,
         key: str,
         getter_func,
-        expire: Optional[int] = None
+        expire: Optional[int] = None,
+        tags: Optional[Iterable[str]] = None
     ) -> Any:
         """Get value from cache or set it using the getter function"""
-        value = await self.get(key)
-        if value is None:
-            value = await getter_func()
-            await self.set(key, value, expire)
-        return value 
\ No newline at end of file
+        entry = await self._fetch(key)
+        if entry is not None:
+            value, expires_at, delta = entry
+            if key not in self._inflight and self._should_refresh(expires_at, delta):
+                self._stats["early_refreshes"] += 1
+                self._start_load(key, getter_func, expire, tags)
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self._stats["coalesced"] += 1
+        else:
+            task = self._start_load(key, getter_func, expire, tags)
+        # Shielded so one caller giving up doesn't cancel the load for the rest
+        return await asyncio.shield(task)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "serializer": type(self.serializer).__name__,
+            "local_entries": len(self._local),
+            "local_max_entries": self.local_max_entries,
+            "inflight": len(self._inflight),
+            "local": self.local_hits.snapshot(),
+            "redis": self.redis_hits.snapshot()
+        }
+
+    async def close(self):
+        await self.redis.close()
+
+
+@lru_cache()
+def get_cache() -> Cache:
+    """Shared Cache so every request uses the same connection pool and local tier"""
+    return Cache()
@@ -1,8 +1,10 @@
 from typing import List, Dict, Any, Optional
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
-from sentence_transformers import SentenceTransformer
+from functools import lru_cache
 from app.core.config import settings
+from app.core.embedding_registry import EmbeddingModelRegistry
+from app.core.embedding_engine import get_embedding_engine
 from app.models.chatbot import ChatbotMemoryType
 import logging
 
@@ -17,7 +19,8 @@ class ChatbotVectorStore:
                 timeout=settings.QDRANT_TIMEOUT
             )
             # Using a multilingual model for better language support
-            self.embedding_model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+            self.embedding_model = EmbeddingModelRegistry.get_model(settings.CHATBOT_EMBEDDING_MODEL)
+            self.embedding_engine = get_embedding_engine(settings.CHATBOT_EMBEDDING_MODEL)
             self._init_collections()
             logger.info("Successfully connected to Qdrant")
         except Exception as e:
@@ -49,7 +52,7 @@ class ChatbotVectorStore:
     async def generate_embedding(self, text: str) -> List[float]:
         """Generate embedding for text using the multilingual model"""
         try:
-            return self.embedding_model.encode(text).tolist()
+            return await self.embedding_engine.embed(text)
         except Exception as e:
             logger.error(f"Failed to generate embedding: {str(e)}")
             raise
@@ -85,6 +88,45 @@ class ChatbotVectorStore:
             logger.error(f"Failed to store memory: {str(e)}")
             raise
 
+    async def store_memories(
+        self,
+        memory_type: ChatbotMemoryType,
+        points: List[Dict[str, Any]],
+        chunk_size: int = 256
+    ):
+        """Store many memories in one collection using chunked upserts.
+
+        Each point is a dict with id, content, embedding and metadata. All
+        chunks but the last are sent with wait=False; the last one waits,
+        which acts as a barrier because Qdrant applies updates in order.
+        """
+        if not points:
+            return
+        try:
+            collection_name = f"chatbot_{memory_type.value}"
+            chunks = [points[i:i + chunk_size] for i in range(0, len(points), chunk_size)]
+
+            for index, chunk in enumerate(chunks):
+                self.client.upsert(
+                    collection_name=collection_name,
+                    points=[
+                        models.PointStruct(
+                            id=point["id"],
+                            vector=point["embedding"],
+                            payload={
+                                "content": point["content"],
+                                **point["metadata"]
+                            }
+                        )
+                        for point in chunk
+                    ],
+                    wait=index == len(chunks) - 1
+                )
+            logger.info(f"Stored {len(points)} memories in collection {collection_name} ({len(chunks)} chunks)")
+        except Exception as e:
+            logger.error(f"Failed to store memories: {str(e)}")
+            raise
+
     async def search_similar_memories(
         self,
         query: str,
@@ -186,4 +228,9 @@ class ChatbotVectorStore:
             logger.info(f"Deleted memory from collection {collection_name}: {memory_id}")
         except Exception as e:
             logger.error(f"Failed to delete memory: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+
+@lru_cache()
+def get_chatbot_vector_store() -> ChatbotVectorStore:
+    """Shared ChatbotVectorStore so collections are only initialized once per worker"""
+    return ChatbotVectorStore()
@@ -32,12 +32,24 @@ class Settings(BaseSettings):
 
     # OpenAI
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
+    OPENAI_TIMEOUT: float = 60.0
+    OPENAI_MAX_RETRIES: int = 2
+    OPENAI_MAX_CONNECTIONS: int = 100
     
     # AWS Settings (Optional)
     AWS_ACCESS_KEY_ID: Optional[str] = None
     AWS_SECRET_ACCESS_KEY: Optional[str] = None
     AWS_REGION: Optional[str] = None
     AWS_BUCKET_NAME: Optional[str] = None
+    S3_ENDPOINT_URL: Optional[str] = None  # e.g. a local moto server or MinIO
+    S3_MULTIPART_THRESHOLD: int = 8 * 1024 * 1024
+    S3_MULTIPART_PART_SIZE: int = 8 * 1024 * 1024
+    S3_MAX_CONCURRENCY: int = 4  # parallel parts per upload
+    S3_UPLOAD_WORKERS: int = 8
+    S3_PRESIGN_EXPIRES: int = 15 * 60  # seconds a presigned upload url stays valid
+    DIRECT_UPLOAD_MAX_BYTES: int = 500 * 1024 * 1024
+    S3_DOWNLOAD_MODE: str = "redirect"  # "redirect" to a presigned url or "proxy" through the API
+    DOWNLOAD_CHUNK_BYTES: int = 256 * 1024
     
     # Supabase Settings (Optional)
     SUPABASE_URL: Optional[str] = None
@@ -55,6 +67,21 @@ class Settings(BaseSettings):
     QDRANT_API_KEY: Optional[str] = os.getenv("QDRANT_API_KEY")
     QDRANT_TIMEOUT: float = float(os.getenv("QDRANT_TIMEOUT", "10.0"))
     
+    # Embedding models (loaded once per worker by EmbeddingModelRegistry)
+    CHATBOT_EMBEDDING_MODEL: str = "paraphrase-multilingual-MiniLM-L12-v2"
+    MEMORY_EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
+    EMBEDDING_MAX_BATCH_SIZE: int = 32
+    EMBEDDING_MAX_WAIT_MS: float = 5.0
+    EMBEDDING_WORKERS: int = 1
+    CHATBOT_BULK_UPSERT_CHUNK_SIZE: int = 256
+    CHATBOT_BULK_MAX_ITEMS: int = 5000
+    
+    # Embedding cache ("redis", "disk" or "none" for the in-process LRU only)
+    EMBEDDING_CACHE_BACKEND: str = "redis"
+    EMBEDDING_CACHE_SIZE: int = 10000
+    EMBEDDING_CACHE_TTL: int = 30 * 24 * 60 * 60  # 30 days
+    EMBEDDING_CACHE_DIR: str = "./embedding_cache"
+    
     # Redis Settings
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
@@ -79,12 +106,77 @@ class Settings(BaseSettings):
     AALAM_DEFAULT_LANGUAGE: str = "zh-CN"
     AALAM_DEFAULT_AUDIO_FORMAT: str = "mp3"
     AALAM_TEMP_DIR: str = "temp_audio"
+    AALAM_TTS_TIMEOUT: float = 30.0
+    AALAM_AVATAR_TIMEOUT: float = 8.0
+    
+    # Aalam response cache (only contexts listed here are cached)
+    AALAM_RESPONSE_CACHE_CONTEXTS: list = ["explain", "review"]
+    AALAM_RESPONSE_CACHE_TTL: int = 24 * 60 * 60  # 1 day
+    # Opt-in embedding tier: cosine similarity (e.g. 0.97) above which a cached answer is reused for
+    # a differently worded prompt. Off by default; near-identical prompts can need different answers
+    AALAM_RESPONSE_CACHE_SIMILARITY: Optional[float] = None
+    AALAM_RESPONSE_CACHE_INDEX_SIZE: int = 2000
     
     # Service endpoints
     ROOM_127_ENDPOINT: str
     CODEX_ENDPOINT: str
     SUSPENSE_QUEUE_ENDPOINT: str
     
+    # Background outbox for Room 127 / Codex / suspense queue logging
+    OUTBOX_MAX_SIZE: int = 10000
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_MAX_ATTEMPTS: int = 5
+    OUTBOX_BACKOFF_SECONDS: float = 1.0
+    OUTBOX_SPILL_PATH: str = "./outbox/spill.jsonl"
+    OUTBOX_HTTP_TIMEOUT: float = 10.0
+    OUTBOX_HTTP_MAX_CONNECTIONS: int = 50
+    
+    # Scratch space for generated audio handed out by path; unused files are reaped
+    TEMP_AUDIO_DIR: str = "temp_audio"
+    TEMP_AUDIO_TTL_SECONDS: int = 60 * 60
+    TEMP_AUDIO_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+    TEMP_AUDIO_REAP_INTERVAL: float = 60.0
+
+    # Synthesized audio cache ("disk", "s3" or "none" for memory only)
+    TTS_CACHE_BACKEND: str = "disk"
+    TTS_CACHE_DIR: str = "./tts_cache"
+    TTS_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024  # 2 GB, shared by all workers using TTS_CACHE_DIR
+    TTS_CACHE_SCAN_INTERVAL: float = 30.0  # seconds between rescans of the directory's usage
+    TTS_CACHE_MEMORY_BYTES: int = 64 * 1024 * 1024  # 64 MB per worker
+    TTS_CACHE_S3_PREFIX: str = "tts-cache"
+    
+    # Audio decoding: decoded PCM stays in memory up to this size, then spills to disk
+    AUDIO_SPOOL_MAX_BYTES: int = 32 * 1024 * 1024
+    AUDIO_DECODE_TIMEOUT_SECONDS: float = 600.0  # ffmpeg is killed if a decode takes longer
+    
+    # /stt/batch/
+    STT_BATCH_CONCURRENCY: int = 4
+    STT_BATCH_MAX_FILES: int = 50
+    
+    # Long recordings are split at silences and transcribed in parallel
+    STT_SEGMENT_THRESHOLD_SECONDS: float = 60.0
+    STT_SEGMENT_MAX_SECONDS: float = 30.0
+    STT_SEGMENT_MIN_SILENCE_MS: int = 300
+    STT_VAD_SILENCE_DBFS: float = -40.0
+    STT_SEGMENT_CONCURRENCY: int = 4
+    
+    # Background transcription jobs ("memory" keeps the queue in-process;
+    # with "redis" every worker must see TRANSCRIPTION_SPOOL_DIR, e.g. a shared volume)
+    TRANSCRIPTION_QUEUE_BACKEND: str = "memory"
+    TRANSCRIPTION_WORKERS: int = 2
+    TRANSCRIPTION_SPOOL_DIR: str = "./transcription_spool"
+    TRANSCRIPTION_JOB_TTL: int = 7 * 24 * 60 * 60  # 7 days
+    TRANSCRIPTION_WORKER_HEARTBEAT_TTL: int = 30  # a worker silent this long has its running jobs requeued
+    # https hosts job callbacks may be POSTed to ("*.example.com" matches subdomains); empty disables callbacks
+    TRANSCRIPTION_CALLBACK_HOSTS: list = []
+    
+    # Azure synthesizer pool
+    TTS_SYNTHESIZERS_PER_VOICE: int = 4
+    TTS_SYNTHESIS_WORKERS: int = 16
+    TTS_STREAM_CHUNK_BYTES: int = 4096
+    TTS_STREAM_WINDOW: int = 3  # sentences synthesized concurrently by /tts/stream
+    TTS_STREAM_MAX_CHUNK_CHARS: int = 200
+    
     # Database settings
     POOL_SIZE: int = 20
     MAX_OVERFLOW: int = 10
@@ -97,6 +189,19 @@ class Settings(BaseSettings):
     
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
+    REDIS_MAX_CONNECTIONS: int = 50
+    CACHE_TAG_TTL: int = 24 * 60 * 60  # tag sets live at least this long after their last write
+    CACHE_SCAN_BATCH: int = 500  # keys per SCAN/UNLINK call when invalidating
+    REDIS_SERVICE_BACKEND: str = "redis"  # "memory" keeps lists and values in-process (tests, dev)
+    REDIS_LIST_MAX_LENGTH: int = 1000  # lists are trimmed to their newest entries
+    REDIS_LIST_MAX_LENGTHS: dict = {}  # per-list overrides, e.g. {"user:<id>:interactions": 200}
+    EVENT_LOG_RETENTION_DAYS: int = 90  # audit, codex and contradiction events
+    METRICS_FLUSH_INTERVAL: float = 5.0  # how often buffered dashboard counters reach Redis
+    METRICS_ROLLUP_RETENTION: dict = {"minute": 2 * 24 * 60 * 60, "hour": 35 * 24 * 60 * 60, "day": 400 * 24 * 60 * 60}
+    CACHE_SERIALIZER: str = "json"  # "json", "orjson" or "msgpack"
+    CACHE_LOCAL_MAX_ENTRIES: int = 10000  # 0 disables the in-process tier
+    CACHE_LOCAL_TTL: float = 5.0  # how stale another worker's writes can look here
+    CACHE_EARLY_REFRESH_BETA: float = 1.0  # higher refreshes earlier; 0 disables
     
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 100
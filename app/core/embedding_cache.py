@@ -0,0 +1,168 @@
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+import numpy as np
+import redis
+from app.core.config import settings
+from app.core.metrics import HitCounter
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different inputs share a cache entry"""
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def embedding_key(model_name: str, text: str) -> str:
+    digest = hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+    return f"emb:{model_name}:{digest}"
+
+
+def encode_vector(vector: List[float]) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def decode_vector(data: bytes) -> List[float]:
+    return np.frombuffer(data, dtype=np.float32).tolist()
+
+
+class RedisEmbeddingStore:
+    """Shared embedding tier stored as raw float32 bytes in Redis"""
+
+    def __init__(self, url: str, ttl: int):
+        self.redis = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return self.redis.mget(keys)
+
+    def set_many(self, items: Dict[str, bytes]):
+        pipe = self.redis.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.setex(key, self.ttl, value)
+        pipe.execute()
+
+
+class DiskEmbeddingStore:
+    """Embedding tier stored as one float32 file per key on local disk"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        digest = key.rsplit(":", 1)[-1]
+        return os.path.join(self.directory, digest[:2], f"{digest}.f32")
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        values = []
+        for key in keys:
+            try:
+                with open(self._path(key), "rb") as f:
+                    values.append(f.read())
+            except FileNotFoundError:
+                values.append(None)
+        return values
+
+    def set_many(self, items: Dict[str, bytes]):
+        for key, value in items.items():
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache: in-process LRU over an optional shared store"""
+
+    def __init__(self, max_entries: int, store: Optional[Any] = None):
+        self.max_entries = max_entries
+        self.store = store
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = HitCounter()
+        self.store_hits = HitCounter()
+
+    def _remember(self, key: str, value: bytes):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_local(self, key: str) -> Optional[List[float]]:
+        """Look up the in-process tier only; safe to call from the event loop"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+        if value is None:
+            self.local_hits.record(misses=1)
+            return None
+        self.local_hits.record(hits=1)
+        return decode_vector(value)
+
+    def get_many_from_store(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Look up the shared tier (blocking); hits are promoted into the LRU"""
+        if not self.store or not keys:
+            return {}
+        try:
+            values = self.store.get_many(keys)
+        except Exception as e:
+            logger.warning(f"Embedding cache store lookup failed: {str(e)}")
+            return {}
+
+        found = {}
+        for key, value in zip(keys, values):
+            if value is not None:
+                self._remember(key, value)
+                found[key] = decode_vector(value)
+        self.store_hits.record(hits=len(found), misses=len(keys) - len(found))
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        """Add embeddings to both tiers (blocking)"""
+        if not items:
+            return
+        encoded = {key: encode_vector(vector) for key, vector in items.items()}
+        for key, value in encoded.items():
+            self._remember(key, value)
+        if self.store:
+            try:
+                self.store.set_many(encoded)
+            except Exception as e:
+                logger.warning(f"Embedding cache store write failed: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = len(self._entries)
+            local_bytes = sum(len(value) for value in self._entries.values())
+        return {
+            "backend": type(self.store).__name__ if self.store else None,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "local_bytes": local_bytes,
+            "local": self.local_hits.snapshot(),
+            "store": self.store_hits.snapshot()
+        }
+
+
+def _build_store() -> Optional[Any]:
+    backend = settings.EMBEDDING_CACHE_BACKEND
+    if backend == "redis":
+        return RedisEmbeddingStore(settings.REDIS_URL, settings.EMBEDDING_CACHE_TTL)
+    if backend == "disk":
+        return DiskEmbeddingStore(settings.EMBEDDING_CACHE_DIR)
+    return None
+
+
+embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_SIZE, _build_store())
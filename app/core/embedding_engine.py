@@ -0,0 +1,150 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+from app.core.config import settings
+from app.core.embedding_cache import EmbeddingCache, embedding_cache, embedding_key
+from app.core.embedding_registry import EmbeddingModelRegistry
+from app.core.metrics import Histogram
+import logging
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128]
+QUEUE_WAIT_MS_BUCKETS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000]
+
+
+class EmbeddingEngine:
+    """Micro-batching front end for SentenceTransformer.encode.
+
+    Concurrent embed() calls are queued and encoded together on a thread
+    pool, so the event loop is never blocked by model inference. Results
+    are cached by content hash, so identical text is only encoded once.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+        max_workers: Optional[int] = None,
+        cache: Optional[EmbeddingCache] = embedding_cache
+    ):
+        self.model_name = model_name
+        self.cache = cache
+        self.max_batch_size = max_batch_size or settings.EMBEDDING_MAX_BATCH_SIZE
+        self.max_wait_ms = settings.EMBEDDING_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.EMBEDDING_WORKERS,
+            thread_name_prefix=f"embed-{model_name}"
+        )
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_MS_BUCKETS)
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def embed(self, text: str) -> List[float]:
+        """Queue a single text and wait for its embedding"""
+        key = embedding_key(self.model_name, text)
+        if self.cache:
+            cached = self.cache.get_local(key)
+            if cached is not None:
+                return cached
+
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self._queue.put_nowait((text, key, future, time.perf_counter()))
+        return await future
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embed several texts; they share batches with other callers"""
+        return list(await asyncio.gather(*(self.embed(text) for text in texts)))
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+
+            # Give concurrent callers a short window to join this batch
+            if self.max_wait_ms > 0 and self._queue.qsize() < self.max_batch_size - 1:
+                await asyncio.sleep(self.max_wait_ms / 1000)
+
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            await self._encode_batch(batch)
+
+    async def _encode_batch(self, batch: List[Tuple[str, str, asyncio.Future, float]]):
+        started = time.perf_counter()
+        for _, _, _, enqueued_at in batch:
+            self.queue_wait_ms.observe((started - enqueued_at) * 1000)
+        self.batch_sizes.observe(len(batch))
+
+        texts = [text for text, _, _, _ in batch]
+        keys = [key for _, key, _, _ in batch]
+        try:
+            embeddings = await self._loop.run_in_executor(self._executor, self._encode, texts, keys)
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(batch)} failed: {str(e)}")
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future, _), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding)
+
+    def _encode(self, texts: List[str], keys: List[str]) -> List[List[float]]:
+        """Runs on the executor: consult the shared cache, encode the misses"""
+        found = self.cache.get_many_from_store(list(set(keys))) if self.cache else {}
+
+        # Encode each missing text once, even if it appears twice in the batch
+        missing = {}
+        for text, key in zip(texts, keys):
+            if key not in found:
+                missing.setdefault(key, text)
+
+        if missing:
+            model = EmbeddingModelRegistry.get_model(self.model_name)
+            vectors = model.encode(list(missing.values()), batch_size=len(missing)).tolist()
+            encoded = dict(zip(missing.keys(), vectors))
+            if self.cache:
+                self.cache.put_many(encoded)
+            found.update(encoded)
+
+        return [found[key] for key in keys]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+            "cache": self.cache.get_stats() if self.cache else None
+        }
+
+
+_engines: Dict[str, EmbeddingEngine] = {}
+
+
+def get_embedding_engine(model_name: str) -> EmbeddingEngine:
+    """Shared engine per model so all callers in a worker batch together"""
+    engine = _engines.get(model_name)
+    if engine is None:
+        engine = _engines.setdefault(model_name, EmbeddingEngine(model_name))
+    return engine
+
+
+def get_engine_stats() -> Dict[str, Any]:
+    return {name: engine.get_stats() for name, engine in _engines.items()}
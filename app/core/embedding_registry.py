@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+from typing import Dict, Any
+from sentence_transformers import SentenceTransformer
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _current_rss_bytes() -> int:
+    """Resident set size of this worker process in bytes (0 if unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class EmbeddingModelRegistry:
+    """Process-wide registry of SentenceTransformer models.
+
+    Each model is loaded at most once per worker and shared by every
+    vector store that asks for it.
+    """
+    _models: Dict[str, SentenceTransformer] = {}
+    _stats: Dict[str, Dict[str, Any]] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_model(cls, model_name: str) -> SentenceTransformer:
+        """Return the shared model instance, loading it on first use"""
+        model = cls._models.get(model_name)
+        if model is not None:
+            return model
+
+        with cls._lock:
+            # Another thread may have finished loading while we waited
+            model = cls._models.get(model_name)
+            if model is not None:
+                return model
+
+            rss_before = _current_rss_bytes()
+            started = time.perf_counter()
+            model = SentenceTransformer(model_name)
+            load_seconds = time.perf_counter() - started
+            rss_after = _current_rss_bytes()
+
+            parameter_bytes = sum(
+                p.numel() * p.element_size() for p in model.parameters()
+            )
+            cls._models[model_name] = model
+            cls._stats[model_name] = {
+                "load_seconds": round(load_seconds, 3),
+                "parameter_bytes": parameter_bytes,
+                "rss_delta_bytes": max(rss_after - rss_before, 0),
+                "embedding_dimension": model.get_sentence_embedding_dimension(),
+                "loaded_at": time.time()
+            }
+            logger.info(
+                f"Loaded embedding model {model_name} in {load_seconds:.2f}s "
+                f"({parameter_bytes / (1024 * 1024):.1f} MiB of parameters)"
+            )
+            return model
+
+    @classmethod
+    def is_loaded(cls, model_name: str) -> bool:
+        return model_name in cls._models
+
+    @classmethod
+    def get_stats(cls) -> Dict[str, Any]:
+        """Load time and memory footprint for every model loaded in this worker"""
+        return {
+            "pid": os.getpid(),
+            "rss_bytes": _current_rss_bytes(),
+            "models": {name: dict(stats) for name, stats in cls._stats.items()}
+        }
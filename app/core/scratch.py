@@ -0,0 +1,192 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, Optional
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+PARTIAL_SUFFIX = ".part"
+
+
+def _size(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_size
+    except FileNotFoundError:
+        return None
+
+
+class ScratchSpace:
+    """
+    Managed directory for short-lived audio files
+
+    A file's last use is the later of its mtime (set by writes) and its
+    atime (set by touch(), which leaves mtime alone so a file's validators
+    stay stable while it is served), and the reaper deletes files unused
+    for ttl seconds. The directory is kept
+    under max_bytes by deleting the least recently used files first, both
+    by the reaper and before a write that would go over. Because the state
+    lives on disk, several API processes can share one directory. Partial
+    writes are never evicted and only reaped once unmodified for ttl.
+
+    Files are served from a handle opened before the response starts, and
+    an open handle keeps working after the file is unlinked, so a reap
+    never cuts off a download in progress.
+    """
+
+    def __init__(self, directory: str, ttl: int, max_bytes: int, reap_interval: float):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.reap_interval = reap_interval
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._bytes = 0
+        self._files = 0
+        self._stats = defaultdict(int)
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, name: str) -> str:
+        if not name or os.path.basename(name) != name:
+            raise ValueError(f"Invalid scratch file name: {name!r}")
+        return os.path.join(self.directory, name)
+
+    async def write(self, data: bytes, name: Optional[str] = None, suffix: str = "") -> str:
+        """Write data atomically and return its path; name defaults to a random one"""
+        return await asyncio.to_thread(self._write, data, name or f"{uuid.uuid4()}{suffix}")
+
+    def _write(self, data: bytes, name: str) -> str:
+        path = self.path(name)
+        # Rewriting a file replaces its bytes rather than adding to them
+        replaced = _size(path)
+        if self._bytes - (replaced or 0) + len(data) > self.max_bytes:
+            self.reap(reserve=len(data))
+            replaced = _size(path)
+
+        partial_path = f"{path}.{os.getpid()}.{threading.get_ident()}{PARTIAL_SUFFIX}"
+        try:
+            with open(partial_path, "wb") as f:
+                f.write(data)
+            os.replace(partial_path, path)
+        except OSError:
+            try:
+                os.remove(partial_path)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            self._bytes += len(data) - (replaced or 0)
+            self._files += replaced is None
+            self._stats["writes"] += 1
+            self._stats["bytes_written"] += len(data)
+        return path
+
+    def touch(self, name: str) -> Optional[str]:
+        """Mark a file as used (restarting its ttl) and return its path, or None if it is gone"""
+        path = self.path(name)
+        try:
+            os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+        except FileNotFoundError:
+            return None
+        return path
+
+    def reap(self, reserve: int = 0) -> Dict[str, int]:
+        """Delete expired files, then least recently used ones until reserve more bytes fit"""
+        now = time.time()
+
+        kept = []
+        total = 0
+        expired = evicted = freed = 0
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            name = entry.name
+            partial = name.endswith(PARTIAL_SUFFIX)
+            # A partial may still be being written by another thread or process;
+            # one older than the ttl was left behind by a crashed writer
+            last_used = stat.st_mtime if partial else max(stat.st_atime, stat.st_mtime)
+            if now - last_used > self.ttl and self._remove(entry.path):
+                expired += 1
+                freed += stat.st_size
+                continue
+            kept.append((last_used, name, entry.path, stat.st_size))
+            total += stat.st_size
+
+        for _, name, path, size in sorted(kept):
+            if total + reserve <= self.max_bytes:
+                break
+            if name.endswith(PARTIAL_SUFFIX) or not self._remove(path):
+                continue
+            evicted += 1
+            freed += size
+            total -= size
+
+        with self._lock:
+            self._bytes = total
+            self._files = len(kept) - evicted
+            self._stats["reaped_files"] += expired
+            self._stats["evicted_files"] += evicted
+            self._stats["freed_bytes"] += freed
+        if expired or evicted:
+            logger.info(f"Scratch {self.directory}: removed {expired} expired and {evicted} over-quota files ({freed} bytes)")
+        return {"expired": expired, "evicted": evicted, "freed_bytes": freed}
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return True
+        except OSError as e:
+            logger.error(f"Could not remove scratch file {path}: {str(e)}")
+            return False
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._reap_forever())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _reap_forever(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.reap)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Scratch reaper failed: {str(e)}")
+            await asyncio.sleep(self.reap_interval)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self._stats,
+                "files": self._files,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl
+            }
+
+
+# Create a singleton instance
+temp_audio = ScratchSpace(
+    settings.TEMP_AUDIO_DIR,
+    ttl=settings.TEMP_AUDIO_TTL_SECONDS,
+    max_bytes=settings.TEMP_AUDIO_MAX_BYTES,
+    reap_interval=settings.TEMP_AUDIO_REAP_INTERVAL
+)
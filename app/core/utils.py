@@ -18,10 +18,9 @@ import asyncio
 import tempfile
 import jieba
 import re
-from pydub import AudioSegment
-import ffmpeg
 import logging
 from app.core.source_registry import SourceRegistry, SourceType
+from app.core.audio_toolchain import AudioSource, audio_toolchain, read_target_audio
 
 load_dotenv() 
 
@@ -140,22 +139,11 @@ async def text_to_speech(text: str, language: str = "zh-CN") -> bytes:
     return audio_data
 
 def verify_ffmpeg_installation() -> bool:
-    """Verify FFmpeg installation and return True if properly installed"""
-    try:
-        # Try to get ffmpeg version
-        stream = ffmpeg.input('dummy.mp4')
-        stream = ffmpeg.output(stream, 'dummy.mp3')
-        ffmpeg.run(stream, capture_stdout=True, capture_stderr=True, overwrite_output=True)
-        return True
-    except ffmpeg.Error as e:
-        logger.error(f"FFmpeg error: {e.stderr.decode() if e.stderr else str(e)}")
-        return False
-    except Exception as e:
-        logger.error(f"Error checking FFmpeg: {str(e)}")
-        return False
+    """Return True if FFmpeg is installed (probed once per process)"""
+    return audio_toolchain.available
 
 async def stt_transcribe(
-    audio_file_path: str,
+    audio_file_path: AudioSource,
     language: str = "zh-CN",
     punctuate: bool = True,
     speaker_diarization: bool = False,
@@ -163,23 +151,16 @@ async def stt_transcribe(
     profanity_filter: bool = True
 ) -> Dict[str, Any]:
     """
-    Transcribe audio file to text with advanced options
+    Transcribe audio to text with advanced options
+    
+    Accepts a file path, raw bytes / memoryview, or an open file such as an
+    UploadFile spool; audio is decoded in memory without temp files.
     """
     try:
-        # Verify FFmpeg installation
-        if not verify_ffmpeg_installation():
+        if not audio_toolchain.available:
             logger.warning("FFmpeg not found. Attempting to use alternative method...")
-            # Fallback to direct file reading if FFmpeg is not available
-            with open(audio_file_path, 'rb') as f:
-                audio_data = f.read()
-        else:
-            # Convert audio to required format using FFmpeg
-            audio = AudioSegment.from_file(audio_file_path)
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                audio.export(temp_file.name, format='wav')
-                with open(temp_file.name, 'rb') as f:
-                    audio_data = f.read()
-                os.unlink(temp_file.name)
+        # Decode and resample off the event loop (a no-op for 16 kHz mono WAV)
+        audio_data = await asyncio.to_thread(read_target_audio, audio_file_path)
 
         # Initialize Edge TTS
         communicate = edge_tts.Communicate()
@@ -1,8 +1,10 @@
 from typing import List, Dict, Any, Optional
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
-from sentence_transformers import SentenceTransformer
+from functools import lru_cache
 from app.core.config import settings
+from app.core.embedding_registry import EmbeddingModelRegistry
+from app.core.embedding_engine import get_embedding_engine
 
 class VectorStore:
     def __init__(self):
@@ -10,7 +12,8 @@ class VectorStore:
             host=settings.QDRANT_HOST,
             port=settings.QDRANT_PORT
         )
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.embedding_model = EmbeddingModelRegistry.get_model(settings.MEMORY_EMBEDDING_MODEL)
+        self.embedding_engine = get_embedding_engine(settings.MEMORY_EMBEDDING_MODEL)
         self._init_collection()
 
     def _init_collection(self):
@@ -29,7 +32,7 @@ class VectorStore:
 
     async def generate_embedding(self, text: str) -> List[float]:
         """Generate embedding for text using the sentence transformer model"""
-        return self.embedding_model.encode(text).tolist()
+        return await self.embedding_engine.embed(text)
 
     async def store_memory(
         self,
@@ -95,4 +98,9 @@ class VectorStore:
             points_selector=models.PointIdsList(
                 points=[memory_id]
             )
-        ) 
\ No newline at end of file
+        )
+
+@lru_cache()
+def get_vector_store() -> VectorStore:
+    """Shared VectorStore so the collection is only initialized once per worker"""
+    return VectorStore()
@@ -1,10 +1,20 @@
 import os
+import asyncio
+import time
 from dotenv import load_dotenv
-from fastapi import FastAPI ,APIRouter
+from fastapi import FastAPI ,APIRouter, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer
 from app.api.v1 import router as all_routes
 from app.api.v1.endpoints import memory, subai
+from app.services.llm import llm_service
+from app.services.outbox import outbox, http_client as outbox_http_client
+from app.core.audio_toolchain import audio_toolchain
+from app.core.scratch import temp_audio
+from app.core.cache import get_cache
+from app.services.redis_service import redis_service
+from app.services.metrics import metrics
+from app.services.transcription_jobs import transcription_jobs
 
 
 load_dotenv()
@@ -30,9 +40,6 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 #     "site Domain"
 # ]
 
-TEMP_AUDIO_DIR = "./tmp_audio"
-os.makedirs(TEMP_AUDIO_DIR, exist_ok=True)
-
 
 app.add_middleware(
     CORSMiddleware,
@@ -42,12 +49,75 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        metrics.record_request(status_code, time.perf_counter() - started)
+
 # app.include_router(auth.router,prefix='/auth',tags=["Auth"])
 # app.include_router(users.router,prefix="/users",tags=["Users"])
 app.include_router(all_routes,prefix="/api")
 app.include_router(memory.router, prefix="/api/v1/memory", tags=["memory"])
 app.include_router(subai.router, prefix="/api/v1", tags=["Sub-AI"])
 
+@app.on_event("startup")
+async def probe_audio_toolchain():
+    await asyncio.to_thread(audio_toolchain.probe)
+
+@app.on_event("startup")
+async def start_temp_audio_reaper():
+    await temp_audio.start()
+
+@app.on_event("shutdown")
+async def stop_temp_audio_reaper():
+    await temp_audio.stop()
+
+@app.on_event("startup")
+async def start_transcription_workers():
+    await transcription_jobs.start()
+
+@app.on_event("shutdown")
+async def stop_transcription_workers():
+    # Before the outbox stops, so finished jobs can still queue their callbacks
+    await transcription_jobs.stop()
+
+@app.on_event("startup")
+async def start_outbox():
+    await outbox.start()
+
+@app.on_event("shutdown")
+async def stop_outbox():
+    await outbox.stop()
+    await outbox_http_client.aclose()
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    await llm_service.close()
+
+@app.on_event("shutdown")
+async def close_cache():
+    await get_cache().close()
+
+@app.on_event("startup")
+async def start_metrics_flusher():
+    await metrics.start()
+
+@app.on_event("shutdown")
+async def stop_metrics_flusher():
+    # Flushes what is buffered, so it has to run before Redis is closed
+    await metrics.stop()
+
+@app.on_event("shutdown")
+async def close_redis_service():
+    # After the outbox, whose last flush may still push to Redis lists
+    await redis_service.close()
+
 @app.get("/")
 def read_root():
     return{"message": "Welcome to the Language Learning Ai Backend"}
@@ -1,4 +1,6 @@
-from typing import Optional
+from enum import Enum
+from typing import List, Optional
+from uuid import UUID
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -24,4 +26,37 @@ class AudioTag(BaseModel):
     topic: str
     level: int
     question_type: str
-    rubric_score: int
\ No newline at end of file
+    rubric_score: int
+
+class AudioUploadPurpose(str, Enum):
+    submission = "submission"
+    private = "private"
+    shadowbank = "shadowbank"
+
+class DirectUploadRequest(BaseModel):
+    purpose: AudioUploadPurpose
+    filename: str
+    content_type: str
+    size: int
+
+class UploadedPart(BaseModel):
+    part_number: int
+    etag: str
+
+class CompleteAudioUpload(BaseModel):
+    purpose: AudioUploadPurpose
+    key: str
+    upload_id: Optional[str] = None  # multipart uploads only
+    parts: Optional[List[UploadedPart]] = None
+    user_id: Optional[UUID] = None  # private uploads: the student the audio is for
+    topic: Optional[str] = None
+    question_type: Optional[str] = None
+    language_level: Optional[str] = None
+    rubric_score: Optional[float] = None
+    transcribe: bool = True
+    language: str = "zh-CN"
+    callback_url: Optional[str] = None
+
+class AbortAudioUpload(BaseModel):
+    key: str
+    upload_id: str
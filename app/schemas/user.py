@@ -91,6 +91,9 @@ class AalamResponse(BaseModel):
     transcription: Optional[str] = None
     word_timestamps: Optional[List[dict]] = None
     speakers: Optional[List[dict]] = None
+    avatar_url: Optional[str] = None
+    avatar_metadata: Optional[Dict[str, Any]] = None
+    avatar_job_id: Optional[str] = Field(None, description="Poll /aalam/avatar/{job_id} when the avatar was still rendering")
 
 class TeacherSubmission(BaseModel):
     teacher_id: str
@@ -1,12 +1,20 @@
 import os
+import asyncio
+import time
+import uuid
 import httpx
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Set
 from dotenv import load_dotenv
+from app.services.redis_service import redis_service
+import logging
 
 load_dotenv()
 
 SYNESTHESIA_API_KEY = os.getenv("SYNESTHESIA_API_KEY")
 SYNESTHESIA_API_URL = "https://api.synesthesia.ai/v1"  # Replace with actual API endpoint
+AVATAR_JOB_TTL = 60 * 60  # Keep finished avatar jobs for an hour
+
+logger = logging.getLogger(__name__)
 
 class AvatarService:
     def __init__(self):
@@ -77,4 +85,68 @@ class AvatarService:
             raise Exception(f"Failed to fetch avatars: {str(e)}")
 
 # Create a singleton instance
-avatar_service = AvatarService() 
\ No newline at end of file
+avatar_service = AvatarService()
+
+class AvatarJobStore:
+    """
+    Tracks avatar generations that outlived the request that started them
+
+    Job records live in Redis (through redis_service), so a poll can land
+    on any API worker, not just the one rendering the avatar.
+    """
+
+    def __init__(self, store: Any, ttl: int = AVATAR_JOB_TTL, prefix: str = "avatar_job"):
+        self.store = store
+        self.ttl = ttl
+        self.prefix = prefix
+        # Saves scheduled from done callbacks; referenced so they aren't garbage collected mid-flight
+        self._saves: Set[asyncio.Task] = set()
+
+    def _key(self, job_id: str) -> str:
+        return f"{self.prefix}:{job_id}"
+
+    async def track(self, task: asyncio.Task) -> str:
+        """Register a running avatar task and return its job id"""
+        job_id = str(uuid.uuid4())
+        job = {
+            "job_id": job_id,
+            "status": "pending",
+            "avatar_url": None,
+            "avatar_metadata": None,
+            "error": None,
+            "created_at": time.time()
+        }
+        await self.store.set(self._key(job_id), job, expire=self.ttl)
+        task.add_done_callback(lambda t: self._schedule_finish(job, t))
+        return job_id
+
+    def _schedule_finish(self, job: Dict[str, Any], task: asyncio.Task):
+        save = asyncio.create_task(self._finish(job, task))
+        self._saves.add(save)
+        save.add_done_callback(self._saves.discard)
+
+    async def _finish(self, job: Dict[str, Any], task: asyncio.Task):
+        job_id = job["job_id"]
+        if task.cancelled():
+            job.update(status="failed", error="Avatar generation was cancelled")
+        elif task.exception():
+            job.update(status="failed", error=str(task.exception()))
+            logger.error(f"Avatar job {job_id} failed: {str(task.exception())}")
+        else:
+            result = task.result()
+            job.update(
+                status="completed",
+                avatar_url=result.get("video_url"),
+                avatar_metadata=result.get("metadata")
+            )
+        job["finished_at"] = time.time()
+        try:
+            await self.store.set(self._key(job_id), job, expire=self.ttl)
+        except Exception as e:
+            logger.error(f"Could not save avatar job {job_id}: {str(e)}")
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.store.get(self._key(job_id))
+
+# Create a singleton instance
+avatar_jobs = AvatarJobStore(redis_service)
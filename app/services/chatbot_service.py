@@ -1,16 +1,20 @@
 from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
 from app.models.chatbot import ChatbotMemory, ChatbotMemorySchema, ChatbotMemoryType, ConversationContext
-from app.core.chatbot_vector_store import ChatbotVectorStore
+from app.core.chatbot_vector_store import get_chatbot_vector_store
 from uuid import uuid4
 from datetime import datetime
+from collections import defaultdict
 from fastapi import Depends
+from app.core.config import settings
 from app.db.dependencies import get_db
+import json
+import time
 
 class ChatbotService:
     def __init__(self, db: Session = Depends(get_db)):
         self.db = db
-        self.vector_store = ChatbotVectorStore()
+        self.vector_store = get_chatbot_vector_store()
 
     async def create_conversation(
         self,
@@ -75,6 +79,77 @@ class ChatbotService:
             "metadata": memory.metadata
         }
 
+    async def store_memories_bulk(
+        self,
+        memories: List[ChatbotMemorySchema],
+        current_user: Any
+    ) -> Dict[str, Any]:
+        """Store many chatbot memories with batched embedding, upserts and inserts"""
+        user_id = str(current_user.id)
+        timestamp = datetime.utcnow().isoformat()
+        stages = {}
+
+        # Stage 1: embed everything that doesn't already carry an embedding
+        started = time.perf_counter()
+        to_embed = [i for i, memory in enumerate(memories) if not memory.embedding]
+        generated = await self.vector_store.embedding_engine.embed_many(
+            [memories[i].content for i in to_embed]
+        )
+        embeddings = [memory.embedding for memory in memories]
+        for i, embedding in zip(to_embed, generated):
+            embeddings[i] = embedding
+        stages["embed"] = _stage_stats(len(to_embed), time.perf_counter() - started)
+
+        # Stage 2: chunked upserts, grouped by target collection
+        started = time.perf_counter()
+        memory_ids = [str(uuid4()) for _ in memories]
+        points_by_type = defaultdict(list)
+        for memory_id, memory, embedding in zip(memory_ids, memories, embeddings):
+            points_by_type[memory.type].append({
+                "id": memory_id,
+                "content": memory.content,
+                "embedding": embedding,
+                "metadata": {
+                    "user_id": user_id,
+                    "business_id": memory.business_id,
+                    "conversation_id": memory.conversation_id,
+                    "timestamp": timestamp
+                }
+            })
+        for memory_type, points in points_by_type.items():
+            await self.vector_store.store_memories(
+                memory_type=memory_type,
+                points=points,
+                chunk_size=settings.CHATBOT_BULK_UPSERT_CHUNK_SIZE
+            )
+        stages["upsert"] = _stage_stats(len(memories), time.perf_counter() - started)
+
+        # Stage 3: a single bulk insert into SQL
+        started = time.perf_counter()
+        self.db.bulk_insert_mappings(
+            ChatbotMemory,
+            [
+                {
+                    "id": memory_id,
+                    "user_id": user_id,
+                    "business_id": memory.business_id,
+                    "conversation_id": memory.conversation_id,
+                    "type": memory.type.value,
+                    "content": memory.content,
+                    "memory_metadata": json.dumps(memory.memory_metadata)
+                }
+                for memory_id, memory in zip(memory_ids, memories)
+            ]
+        )
+        self.db.commit()
+        stages["insert"] = _stage_stats(len(memories), time.perf_counter() - started)
+
+        return {
+            "stored": len(memories),
+            "memory_ids": memory_ids,
+            "stages": stages
+        }
+
     async def get_conversation_context(
         self,
         conversation_id: str,
@@ -135,4 +210,12 @@ class ChatbotService:
             limit=limit
         )
         
-        return memories 
\ No newline at end of file
+        return memories
+
+
+def _stage_stats(items: int, seconds: float) -> Dict[str, Any]:
+    return {
+        "items": items,
+        "seconds": round(seconds, 4),
+        "items_per_second": round(items / seconds, 1) if seconds > 0 else None
+    }
@@ -0,0 +1,233 @@
+import asyncio
+import mimetypes
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from typing import AsyncIterator, BinaryIO, Callable, Dict, Optional, Tuple
+from fastapi import HTTPException, Request
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+from app.core.config import settings
+from app.services.s3 import storage
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Streams the inclusive byte range start-end of the file being served
+RangeReader = Callable[[int, int], AsyncIterator[bytes]]
+
+
+class RangeNotSatisfiable(Exception):
+    """The requested range starts beyond the end of the file"""
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive (start, end) for a single-range Range header
+
+    None means the header should be ignored and the whole file sent, which
+    is also how multi-range requests are answered.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes="):].strip()
+    if "," in spec:
+        return None
+    first, separator, last = spec.partition("-")
+    if not separator:
+        return None
+    try:
+        if first == "":
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0 or size == 0:
+                raise RangeNotSatisfiable()
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+def _parse_http_date(value: str) -> Optional[float]:
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Weak comparison, as If-None-Match uses"""
+    if header.strip() == "*":
+        return True
+    strip_weak = lambda tag: tag.strip().removeprefix("W/")
+    return strip_weak(etag) in (strip_weak(tag) for tag in header.split(","))
+
+
+def is_not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    """True when the client's cached copy is current (If-None-Match wins over If-Modified-Since)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        since = _parse_http_date(if_modified_since)
+        return since is not None and int(last_modified) <= since
+    return False
+
+
+def _if_range_allows(request: Request, etag: str, last_modified: float) -> bool:
+    """A Range only applies if the client's copy (per If-Range) is still the current one"""
+    if_range = request.headers.get("if-range")
+    if not if_range:
+        return True
+    if if_range.startswith(("\"", "W/")):
+        return not if_range.startswith("W/") and if_range == etag
+    return _parse_http_date(if_range) == float(int(last_modified))
+
+
+def ranged_response(
+    request: Request,
+    size: int,
+    etag: str,
+    last_modified: float,
+    media_type: str,
+    read_range: RangeReader,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    200, 206, 304 or 416 for a GET of a file with known size and validators
+
+    Only the bytes that are sent are read, so a player seeking through a
+    long recording fetches just the part it plays.
+    """
+    validators = {
+        "ETag": etag,
+        "Last-Modified": http_date(last_modified),
+        "Accept-Ranges": "bytes",
+        **(headers or {})
+    }
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=validators)
+
+    byte_range = None
+    if _if_range_allows(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.headers.get("range"), size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**validators, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        validators["Content-Range"] = f"bytes {start}-{end}/{size}"
+    validators["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(read_range(start, end), status_code=status_code, media_type=media_type, headers=validators)
+
+
+def _disposition(filename: Optional[str], disposition: str) -> Dict[str, str]:
+    return {"Content-Disposition": f'{disposition}; filename="{filename}"'} if filename else {}
+
+
+async def _iter_file(f: BinaryIO, start: int, end: int) -> AsyncIterator[bytes]:
+    try:
+        await asyncio.to_thread(f.seek, start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await asyncio.to_thread(f.read, min(settings.DOWNLOAD_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def file_download(
+    request: Request,
+    path: str,
+    media_type: Optional[str] = None,
+    filename: Optional[str] = None,
+    disposition: str = "attachment",
+    cache_control: Optional[str] = None
+) -> Response:
+    """Serve a local file with Range and conditional request support"""
+    try:
+        # Opened up front so the response survives the file being cleaned up mid-stream
+        f = open(path, "rb")
+    except (FileNotFoundError, IsADirectoryError):
+        raise HTTPException(status_code=404, detail="Audio file not found")
+
+    stat = os.fstat(f.fileno())
+    headers = _disposition(filename, disposition)
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    response = ranged_response(
+        request,
+        stat.st_size,
+        f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+        stat.st_mtime,
+        media_type or mimetypes.guess_type(path)[0] or "application/octet-stream",
+        lambda start, end: _iter_file(f, start, end),
+        headers
+    )
+    if not isinstance(response, StreamingResponse):
+        f.close()
+    return response
+
+
+async def s3_download(
+    request: Request,
+    key: str,
+    media_type: Optional[str] = None,
+    filename: Optional[str] = None,
+    mode: Optional[str] = None
+) -> Response:
+    """
+    Serve an S3 object, by redirect or proxied
+
+    In "redirect" mode (S3_DOWNLOAD_MODE) the client is sent to a presigned
+    url and S3 answers ranges and revalidation itself, so no audio bytes
+    leave through the API. "proxy" streams only the requested range from
+    S3 for clients that cannot follow a redirect to the bucket.
+    """
+    if (mode or settings.S3_DOWNLOAD_MODE) == "redirect":
+        return RedirectResponse(await storage.presigned_url(key, settings.S3_PRESIGN_EXPIRES, filename), status_code=307)
+
+    head = await storage.head(key)
+    if head is None:
+        raise HTTPException(status_code=404, detail="Audio file not found")
+    size = head["ContentLength"]
+
+    def read_range(start: int, end: int) -> AsyncIterator[bytes]:
+        if start == 0 and end == size - 1:
+            return storage.stream(key, chunk_size=settings.DOWNLOAD_CHUNK_BYTES)
+        return storage.stream(key, start, end, settings.DOWNLOAD_CHUNK_BYTES)
+
+    return ranged_response(
+        request,
+        size,
+        head["ETag"],
+        head["LastModified"].timestamp(),
+        media_type or head.get("ContentType") or "application/octet-stream",
+        read_range,
+        _disposition(filename, "attachment")
+    )
+
+
+async def stored_audio_download(request: Request, file_url: str, filename: Optional[str] = None) -> Response:
+    """Serve an AudioFile.file_url, which may be an S3 key, a full url or (older rows) a local path"""
+    if file_url.startswith(("http://", "https://")):
+        return RedirectResponse(file_url, status_code=307)
+    if os.path.isfile(file_url):
+        return file_download(request, file_url, filename=filename)
+    return await s3_download(request, file_url, mimetypes.guess_type(file_url)[0], filename)
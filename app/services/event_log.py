@@ -0,0 +1,253 @@
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+from app.services.redis_service import InMemoryRedisService, redis_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+# Fields each stream can be filtered on server side
+INDEXED_FIELDS = {
+    "audit": ("action", "user_id"),
+    "codex": ("context",),
+    "contradiction": ("status", "user_id"),
+}
+
+
+class InvalidCursor(ValueError):
+    """The pagination cursor is malformed"""
+
+
+def to_ms(value: Any) -> int:
+    """Epoch milliseconds for a datetime or ISO-8601 string (naive means UTC)"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+def encode_cursor(score: int, event_id: str) -> str:
+    return f"{score}:{event_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    score, _, event_id = cursor.partition(":")
+    try:
+        return int(score), event_id
+    except ValueError:
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+
+
+def _str(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _matches(event: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+    return all(str(event.get(field)) == str(value) for field, value in filters.items())
+
+
+class EventLogStore:
+    """
+    Append-only event streams indexed by time in Redis sorted sets
+
+    Streams are partitioned by UTC day. Each day has a hash of event JSON,
+    a sorted set of event ids scored by timestamp, and one sorted set per
+    indexed field value (e.g. audit action=login). Every key expires
+    EVENT_LOG_RETENTION_DAYS after its day, so old events cost nothing to
+    drop. Queries walk days newest first with ZREVRANGEBYSCORE on the most
+    selective index and return a cursor, so each page touches only the
+    events it returns, however large the stream grows.
+    """
+
+    def __init__(self, client: Any, retention_days: int, page_scan: int = 500, prefix: str = "events"):
+        self.redis = client
+        self.retention_days = retention_days
+        self.page_scan = page_scan
+        self.prefix = prefix
+
+    def _day_key(self, stream: str, day: int) -> str:
+        return f"{self.prefix}:{stream}:{day}"
+
+    def _index_key(self, stream: str, day: int, field: Optional[str] = None, value: Any = None) -> str:
+        base = self._day_key(stream, day)
+        return f"{base}:time" if field is None else f"{base}:{field}:{value}"
+
+    async def add(self, stream: str, event: Dict[str, Any]) -> str:
+        return (await self.add_many(stream, [event]))[0]
+
+    async def add_many(self, stream: str, events: Iterable[Dict[str, Any]]) -> List[str]:
+        """Append events (stamped with the current time unless they carry a timestamp) in one round trip"""
+        pipe = self.redis.pipeline(transaction=False)
+        touched = set()
+        ids = []
+        for event in events:
+            event = dict(event)
+            event.setdefault("timestamp", datetime.utcnow().isoformat())
+            score = to_ms(event["timestamp"])
+            day = score // DAY_MS
+            event_id = f"{score:013d}-{uuid.uuid4().hex[:8]}"
+            event["id"] = event_id
+            ids.append(event_id)
+
+            pipe.hset(f"{self._day_key(stream, day)}:data", event_id, json.dumps(event, default=str))
+            index_keys = [self._index_key(stream, day)]
+            for field in INDEXED_FIELDS.get(stream, ()):
+                if event.get(field) is not None:
+                    index_keys.append(self._index_key(stream, day, field, event[field]))
+            for key in index_keys:
+                pipe.zadd(key, {event_id: score})
+            touched.update((key, day) for key in index_keys)
+            touched.add((f"{self._day_key(stream, day)}:data", day))
+
+        for key, day in touched:
+            pipe.expireat(key, (day + 1 + self.retention_days) * DAY_MS // 1000)
+        if ids:
+            await pipe.execute()
+        return ids
+
+    async def query(
+        self,
+        stream: str,
+        start: Optional[Any] = None,
+        end: Optional[Any] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Newest-first page of events between start and end matching filters
+
+        One filter on an indexed field is served from its index; further
+        filters are checked on the events read from it. Pass next_cursor
+        back as cursor for the following page; it is None on the last page.
+        """
+        filters = {field: value for field, value in (filters or {}).items() if value is not None}
+        indexed = [field for field in INDEXED_FIELDS.get(stream, ()) if field in filters]
+        index_field = indexed[0] if indexed else None
+        residual = {field: value for field, value in filters.items() if field != index_field}
+
+        now_ms = int(time.time() * 1000)
+        max_ms = min(to_ms(end), now_ms) if end else now_ms
+        min_ms = max(to_ms(start) if start else 0, (now_ms // DAY_MS - self.retention_days) * DAY_MS)
+        after = None
+        if cursor:
+            after = decode_cursor(cursor)
+            max_ms = min(max_ms, after[0])
+
+        events: List[Dict[str, Any]] = []
+        last: Optional[Tuple[int, str]] = None
+        exhausted = True
+        day = max_ms // DAY_MS
+        while day >= min_ms // DAY_MS:
+            key = self._index_key(stream, day, index_field, filters.get(index_field))
+            data_key = f"{self._day_key(stream, day)}:data"
+            upper = min(max_ms, (day + 1) * DAY_MS - 1)
+            lower = max(min_ms, day * DAY_MS)
+            offset = 0
+            while True:
+                batch = await self.redis.zrevrangebyscore(
+                    key, upper, lower, start=offset, num=self.page_scan, withscores=True
+                )
+                if not batch:
+                    break
+                offset += len(batch)
+                batch = [(_str(member), int(score)) for member, score in batch]
+                if after:
+                    # Ids tied on the cursor's timestamp come back in descending order
+                    batch = [(member, score) for member, score in batch if score < after[0] or member < after[1]]
+                if not batch:
+                    continue
+                records = await self.redis.hmget(data_key, [member for member, _ in batch])
+                for (member, score), record in zip(batch, records):
+                    if record is None:
+                        continue
+                    event = json.loads(record)
+                    if not _matches(event, residual):
+                        continue
+                    if len(events) == limit:
+                        exhausted = False
+                        break
+                    events.append(event)
+                    last = (score, member)
+                if not exhausted:
+                    break
+            if not exhausted:
+                break
+            day -= 1
+
+        return {
+            "events": events,
+            "next_cursor": encode_cursor(*last) if last and not exhausted else None
+        }
+
+
+class InMemoryEventLogStore:
+    """Process-local stand-in with the same query semantics, for tests and development"""
+
+    def __init__(self, retention_days: int):
+        self.retention_days = retention_days
+        self._streams: Dict[str, List[Tuple[int, str, Dict[str, Any]]]] = {}
+
+    async def add(self, stream: str, event: Dict[str, Any]) -> str:
+        return (await self.add_many(stream, [event]))[0]
+
+    async def add_many(self, stream: str, events: Iterable[Dict[str, Any]]) -> List[str]:
+        entries = self._streams.setdefault(stream, [])
+        ids = []
+        for event in events:
+            event = dict(event)
+            event.setdefault("timestamp", datetime.utcnow().isoformat())
+            score = to_ms(event["timestamp"])
+            event["id"] = f"{score:013d}-{uuid.uuid4().hex[:8]}"
+            entries.append((score, event["id"], event))
+            ids.append(event["id"])
+        entries.sort(key=lambda entry: (entry[0], entry[1]))
+        cutoff = (int(time.time() * 1000) // DAY_MS - self.retention_days) * DAY_MS
+        while entries and entries[0][0] < cutoff:
+            entries.pop(0)
+        return ids
+
+    async def query(
+        self,
+        stream: str,
+        start: Optional[Any] = None,
+        end: Optional[Any] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        filters = {field: value for field, value in (filters or {}).items() if value is not None}
+        min_ms = to_ms(start) if start else 0
+        max_ms = to_ms(end) if end else float("inf")
+        after = decode_cursor(cursor) if cursor else None
+
+        events = []
+        last = None
+        for score, event_id, event in reversed(self._streams.get(stream, [])):
+            if score > max_ms or (after and (score, event_id) >= after):
+                continue
+            if score < min_ms:
+                break
+            if not _matches(event, filters):
+                continue
+            if len(events) == limit:
+                return {"events": events, "next_cursor": encode_cursor(*last)}
+            events.append(event)
+            last = (score, event_id)
+        return {"events": events, "next_cursor": None}
+
+
+def _build_event_log() -> Any:
+    if isinstance(redis_service, InMemoryRedisService):
+        return InMemoryEventLogStore(settings.EVENT_LOG_RETENTION_DAYS)
+    return EventLogStore(redis_service.redis_client, settings.EVENT_LOG_RETENTION_DAYS)
+
+
+# Create a singleton instance
+event_log = _build_event_log()
@@ -0,0 +1,67 @@
+import httpx
+from typing import Any, AsyncIterator, Dict, List, Optional
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LLMService:
+    """Shared async OpenAI client with a pooled HTTP connection"""
+
+    def __init__(self):
+        self.default_model = settings.AALAM_MODEL
+        self.client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            timeout=settings.OPENAI_TIMEOUT,
+            max_retries=settings.OPENAI_MAX_RETRIES,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.OPENAI_MAX_CONNECTIONS
+                ),
+                timeout=settings.OPENAI_TIMEOUT
+            )
+        )
+
+    async def chat(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        **kwargs: Any
+    ) -> ChatCompletion:
+        """Run a chat completion without blocking the event loop"""
+        return await self.client.chat.completions.create(
+            model=model or self.default_model,
+            messages=messages,
+            **kwargs
+        )
+
+    async def stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[ChatCompletionChunk]:
+        """
+        Stream a chat completion chunk by chunk
+
+        The final chunk carries token usage and has no choices.
+        """
+        stream = await self.client.chat.completions.create(
+            model=model or self.default_model,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+            **kwargs
+        )
+        async for chunk in stream:
+            yield chunk
+
+    async def close(self):
+        await self.client.close()
+
+# Create a singleton instance
+llm_service = LLMService()
@@ -5,16 +5,16 @@ from sqlalchemy.orm import Session
 from fastapi import Depends, HTTPException
 from app.db.database import get_db
 from app.models.memory import Memory, MemorySchema, MemoryType
-from app.core.vector_store import VectorStore
-from app.core.cache import Cache
+from app.core.vector_store import VectorStore, get_vector_store
+from app.core.cache import Cache, get_cache
 from app.core.security import check_permissions
 
 class MemoryService:
     def __init__(
         self,
         db: Session = Depends(get_db),
-        vector_store: VectorStore = Depends(),
-        cache: Cache = Depends()
+        vector_store: VectorStore = Depends(get_vector_store),
+        cache: Cache = Depends(get_cache)
     ):
         self.db = db
         self.vector_store = vector_store
@@ -99,7 +99,7 @@ class MemoryService:
     #     results = query.all()
 
     #     # Cache results
-    #     await self.cache.set(cache_key, results, expire=300)  # Cache for 5 minutes
+    #     await self.cache.set(cache_key, results, expire=300, tags=[f"business:{business_id}"])  # Cache for 5 minutes
 
     #     return results
 
@@ -0,0 +1,329 @@
+import asyncio
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.audio_file import AudioFile
+from app.models.learning_module import LearningModule
+from app.models.lesson import Lesson
+from app.models.role import UserRole
+from app.models.users import User
+from app.services.redis_service import InMemoryRedisService, redis_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_SECONDS = {"minute": 60, "hour": 60 * 60, "day": 24 * 60 * 60}
+
+# (granularity, bucket start in epoch seconds) -> counter name -> amount
+Rollups = Dict[Tuple[str, int], Dict[str, int]]
+
+
+def role_field(role_id: Any) -> str:
+    """Running total of users holding a role"""
+    return f"role:{role_id}"
+
+
+class MetricsStore:
+    """
+    Running totals and per minute/hour/day rollups in Redis hashes
+
+    Totals live in one hash; each rollup bucket is a small hash of counter
+    name -> amount that expires METRICS_ROLLUP_RETENTION after it closes.
+    Every write is an HINCRBY, so any number of API processes can add to
+    the same counters.
+    """
+
+    def __init__(self, client: Any, retention: Dict[str, int], prefix: str = "metrics"):
+        self.redis = client
+        self.retention = retention
+        self.prefix = prefix
+        self.totals_key = f"{prefix}:totals"
+
+    def _bucket_key(self, granularity: str, start: int) -> str:
+        return f"{self.prefix}:{granularity}:{start}"
+
+    async def apply(self, totals: Dict[str, int], rollups: Rollups):
+        pipe = self.redis.pipeline(transaction=False)
+        for field, amount in totals.items():
+            pipe.hincrby(self.totals_key, field, amount)
+        pipe.hset(self.totals_key, "updated_at", int(time.time()))
+        for (granularity, start), counts in rollups.items():
+            key = self._bucket_key(granularity, start)
+            for field, amount in counts.items():
+                pipe.hincrby(key, field, amount)
+            pipe.expireat(key, start + ROLLUP_SECONDS[granularity] + self.retention[granularity])
+        await pipe.execute()
+
+    async def get_totals(self) -> Dict[str, int]:
+        return {field: int(value) for field, value in (await self.redis.hgetall(self.totals_key)).items()}
+
+    async def set_totals(self, values: Dict[str, int]):
+        await self.redis.hset(self.totals_key, mapping=values)
+
+    async def claim_seed(self, now: int) -> bool:
+        """Mark the totals as seeded; true only for the one caller that set the mark"""
+        return bool(await self.redis.hsetnx(self.totals_key, "seeded_at", now))
+
+    async def get_rollups(self, granularity: str, starts: List[int]) -> List[Dict[str, int]]:
+        pipe = self.redis.pipeline(transaction=False)
+        for start in starts:
+            pipe.hgetall(self._bucket_key(granularity, start))
+        return [
+            {field: int(value) for field, value in bucket.items()}
+            for bucket in await pipe.execute()
+        ]
+
+
+class InMemoryMetricsStore:
+    """Process-local stand-in with the same behaviour, for tests and development"""
+
+    def __init__(self, retention: Dict[str, int]):
+        self.retention = retention
+        self._totals: Dict[str, int] = Counter()
+        self._rollups: Dict[Tuple[str, int], Counter] = defaultdict(Counter)
+
+    async def apply(self, totals: Dict[str, int], rollups: Rollups):
+        self._totals.update(totals)
+        self._totals["updated_at"] = int(time.time())
+        for bucket, counts in rollups.items():
+            self._rollups[bucket].update(counts)
+        now = time.time()
+        for granularity, start in list(self._rollups):
+            if start + ROLLUP_SECONDS[granularity] + self.retention[granularity] <= now:
+                del self._rollups[(granularity, start)]
+
+    async def get_totals(self) -> Dict[str, int]:
+        return dict(self._totals)
+
+    async def set_totals(self, values: Dict[str, int]):
+        for field, value in values.items():
+            self._totals[field] = value
+
+    async def claim_seed(self, now: int) -> bool:
+        if "seeded_at" in self._totals:
+            return False
+        self._totals["seeded_at"] = now
+        return True
+
+    async def get_rollups(self, granularity: str, starts: List[int]) -> List[Dict[str, int]]:
+        return [dict(self._rollups.get((granularity, start), {})) for start in starts]
+
+
+def count_tables(db: Session) -> Dict[str, int]:
+    """Exact values of the running totals, counted from the tables"""
+    totals = {
+        "users": db.query(func.count(User.id)).scalar(),
+        "active_users": db.query(func.count(User.id)).filter(User.is_active == True).scalar(),
+        "modules": db.query(func.count(LearningModule.id)).scalar(),
+        "lessons": db.query(func.count(Lesson.id)).scalar(),
+        "audio_files": db.query(func.count(AudioFile.id)).scalar()
+    }
+    for role_id, count in db.query(UserRole.role_id, func.count(UserRole.id)).group_by(UserRole.role_id):
+        totals[role_field(role_id)] = count
+    return totals
+
+
+class Metrics:
+    """
+    Incrementally maintained counters behind the admin dashboards
+
+    Two kinds of counter are kept. Event counters (requests, signups,
+    uploads, contradictions) add to a running total and to the minute,
+    hour and day buckets they happened in. Running totals of table rows
+    (users, modules, audio files, ...) are moved by the ORM hooks below as
+    rows are committed, and are seeded from COUNT(*) once, so dashboards
+    read precomputed values instead of scanning tables.
+
+    Increments are buffered in process and flushed every
+    METRICS_FLUSH_INTERVAL seconds in one round trip, so recording a
+    request costs a dict update. Totals can drift if rows change outside
+    this app's sessions (bulk updates, ON DELETE CASCADE); reseed() resets
+    them from the tables.
+
+    A reseed is exact only up to METRICS_FLUSH_INTERVAL. It flushes this
+    process's buffer, but deltas other workers have buffered for rows the
+    COUNT(*) already saw are added on top when they flush. Deltas for rows
+    committed between the count and the write can be overwritten. Totals
+    settle within one flush interval of a rebuild, give or take those rows.
+    """
+
+    def __init__(self, store: Any, flush_interval: float):
+        self.store = store
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._totals: Counter = Counter()
+        self._rollups: Dict[Tuple[str, int], Counter] = defaultdict(Counter)
+        self._task: Optional[asyncio.Task] = None
+
+    def count(self, name: str, amount: int = 1):
+        """Add to an event counter"""
+        self.add({name: amount})
+
+    def add(self, events: Dict[str, int], totals: Optional[Dict[str, int]] = None, at: Optional[float] = None):
+        """Buffer event counts (rolled up by time) and running total deltas (not rolled up)"""
+        at = at or time.time()
+        with self._lock:
+            self._totals.update(events)
+            self._totals.update(totals or {})
+            for granularity, seconds in ROLLUP_SECONDS.items():
+                self._rollups[(granularity, int(at // seconds * seconds))].update(events)
+
+    def record_request(self, status_code: int, duration: float):
+        self.add({
+            "requests": 1,
+            "requests_failed" if status_code >= 400 else "requests_succeeded": 1,
+            "response_time_us": int(duration * 1_000_000)
+        })
+
+    def _take(self) -> Tuple[Dict[str, int], Rollups]:
+        with self._lock:
+            totals, rollups = self._totals, self._rollups
+            self._totals, self._rollups = Counter(), defaultdict(Counter)
+        return (
+            {field: amount for field, amount in totals.items() if amount},
+            {bucket: dict(counts) for bucket, counts in rollups.items() if counts}
+        )
+
+    async def flush(self):
+        totals, rollups = self._take()
+        if not totals and not rollups:
+            return
+        try:
+            await self.store.apply(totals, rollups)
+        except Exception:
+            # Put the increments back so the next flush retries them
+            with self._lock:
+                self._totals.update(totals)
+                for bucket, counts in rollups.items():
+                    self._rollups[bucket].update(counts)
+            raise
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_forever())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Final metrics flush failed: {str(e)}")
+
+    async def _flush_forever(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Metrics flush failed: {str(e)}")
+
+    async def get_totals(self, db: Session) -> Dict[str, int]:
+        """
+        Running totals, seeded from the tables the first time they are read
+
+        Only the worker that claims seeded_at (HSETNX) counts the tables;
+        the others return the totals as they stand until its seed lands.
+        """
+        totals = await self.store.get_totals()
+        if "seeded_at" not in totals and await self.store.claim_seed(int(time.time())):
+            totals = await self.reseed(db)
+        return totals
+
+    async def reseed(self, db: Session) -> Dict[str, int]:
+        """Reset the running totals of table rows from COUNT(*); event counters are kept"""
+        await self.flush()
+        counted = count_tables(db)
+        current = await self.store.get_totals()
+        # Roles nobody holds any more are not in the GROUP BY
+        stale = {field: 0 for field in current if field.startswith("role:") and field not in counted}
+        await self.store.set_totals({**stale, **counted, "seeded_at": int(time.time())})
+        logger.info("Seeded running totals from the database")
+        return await self.store.get_totals()
+
+    async def get_rollups(self, granularity: str, points: int, end: Optional[float] = None) -> List[Dict[str, Any]]:
+        """The last points buckets of a granularity up to end (default now), oldest first"""
+        seconds = ROLLUP_SECONDS[granularity]
+        last = int((end or time.time()) // seconds * seconds)
+        starts = [last - seconds * i for i in reversed(range(points))]
+        buckets = await self.store.get_rollups(granularity, starts)
+        return [
+            {"start": datetime.utcfromtimestamp(start).isoformat(), **bucket}
+            for start, bucket in zip(starts, buckets)
+        ]
+
+
+def _row_deltas(obj: Any, sign: int) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """(event counts, running total deltas) for inserting (sign 1) or deleting (sign -1) a row"""
+    if isinstance(obj, User):
+        totals = {"users": sign}
+        # is_active defaults to true on insert
+        if obj.is_active is not False:
+            totals["active_users"] = sign
+        return ({"signups": 1} if sign > 0 else {}), totals
+    if isinstance(obj, AudioFile):
+        return ({"uploads": 1} if sign > 0 else {}), {"audio_files": sign}
+    if isinstance(obj, LearningModule):
+        return {}, {"modules": sign}
+    if isinstance(obj, Lesson):
+        return {}, {"lessons": sign}
+    if isinstance(obj, UserRole) and obj.role_id is not None:
+        return {}, {role_field(obj.role_id): sign}
+    return {}, {}
+
+
+def _track_flush(session: Session, flush_context: Any):
+    """Collect what a flush changed; it only counts once the transaction commits"""
+    events = session.info.setdefault("metrics_events", Counter())
+    totals = session.info.setdefault("metrics_totals", Counter())
+    for objects, sign in ((session.new, 1), (session.deleted, -1)):
+        for obj in objects:
+            row_events, row_totals = _row_deltas(obj, sign)
+            events.update(row_events)
+            totals.update(row_totals)
+    for obj in session.dirty:
+        if not isinstance(obj, User):
+            continue
+        history = inspect(obj).attrs.is_active.history
+        # Without the old value loaded we cannot tell whether it changed
+        if history.added and history.deleted:
+            totals["active_users"] += bool(history.added[0]) - bool(history.deleted[0])
+
+
+def _record_commit(session: Session):
+    events = session.info.pop("metrics_events", None)
+    totals = session.info.pop("metrics_totals", None)
+    if events or totals:
+        metrics.add(dict(events or {}), dict(totals or {}))
+
+
+def _discard_rollback(session: Session):
+    session.info.pop("metrics_events", None)
+    session.info.pop("metrics_totals", None)
+
+
+def _build_metrics_store() -> Any:
+    if isinstance(redis_service, InMemoryRedisService):
+        return InMemoryMetricsStore(settings.METRICS_ROLLUP_RETENTION)
+    return MetricsStore(redis_service.redis_client, settings.METRICS_ROLLUP_RETENTION)
+
+
+# Create a singleton instance
+metrics = Metrics(_build_metrics_store(), settings.METRICS_FLUSH_INTERVAL)
+
+event.listen(SessionLocal, "after_flush", _track_flush)
+event.listen(SessionLocal, "after_commit", _record_commit)
+event.listen(SessionLocal, "after_rollback", _discard_rollback)
@@ -0,0 +1,338 @@
+import asyncio
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from uuid import UUID
+import httpx
+from sqlalchemy.exc import DataError, IntegrityError, SQLAlchemyError
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.feedback_log import FeedbackLog
+from app.services.redis_service import redis_service
+from app.services.event_log import event_log
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A sink handler receives a batch of payloads and returns the ones to retry;
+# payloads that can never be delivered are logged and not returned
+SinkHandler = Callable[[List[Dict[str, Any]]], Awaitable[Optional[List[Dict[str, Any]]]]]
+
+
+class Outbox:
+    """
+    Bounded in-process outbox for side effects that must not delay a response
+
+    publish() never blocks: events go onto a bounded queue, or are spilled
+    to a JSON-lines file when the queue is full. A background worker pulls
+    events in batches, groups them by sink and retries failures with
+    exponential backoff.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        batch_size: int,
+        max_attempts: int,
+        backoff_base: float,
+        spill_path: str
+    ):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.spill_path = spill_path
+        self._sinks: Dict[str, SinkHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._retries: List[Dict[str, Any]] = []
+        self._inflight: List[Dict[str, Any]] = []
+        self._worker: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._stats = defaultdict(int)
+
+    def register(self, sink: str, handler: SinkHandler):
+        self._sinks[sink] = handler
+
+    def _ensure_queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+        return self._queue
+
+    def publish(self, sink: str, payload: Dict[str, Any]):
+        """Hand an event to the outbox without waiting for delivery"""
+        event = {"sink": sink, "payload": payload, "attempts": 0, "due": 0.0}
+        self._stats["published"] += 1
+        try:
+            self._ensure_queue().put_nowait(event)
+        except asyncio.QueueFull:
+            self._spill([event])
+
+    async def start(self):
+        self._ensure_queue()
+        self._restore_spilled()
+        self._stopping = False
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        """Drain what we can, let the batch being delivered finish, then spill everything still pending to disk"""
+        if self._worker:
+            deadline = time.monotonic() + timeout
+            try:
+                await asyncio.wait_for(self._drain(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Outbox drain timed out; spilling remaining events")
+            self._stopping = True
+            try:
+                await asyncio.wait_for(asyncio.shield(self._worker), max(deadline - time.monotonic(), 1.0))
+            except asyncio.TimeoutError:
+                # Its batch stays in _inflight and is spilled below
+                self._worker.cancel()
+                try:
+                    await self._worker
+                except asyncio.CancelledError:
+                    pass
+            self._worker = None
+
+        pending = self._inflight + self._retries
+        self._inflight = []
+        self._retries = []
+        while self._queue and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        self._spill(pending)
+
+    async def _drain(self):
+        while self._queue.qsize() or self._inflight or any(e["due"] <= time.time() for e in self._retries):
+            await asyncio.sleep(0.05)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                batch = await self._next_batch()
+                if batch:
+                    # Held until dispatched, so a cancelled worker's batch is spilled rather than lost
+                    self._inflight = batch
+                    await self._dispatch(batch)
+                self._inflight = []
+                self._restore_spilled()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._inflight = []
+                logger.error(f"Outbox worker error: {str(e)}")
+
+    async def _next_batch(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        batch = [e for e in self._retries if e["due"] <= now][:self.batch_size]
+        for event in batch:
+            self._retries.remove(event)
+
+        if not batch:
+            next_due = min((e["due"] for e in self._retries), default=now + 1.0)
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), max(next_due - now, 0.01)))
+            except asyncio.TimeoutError:
+                return []
+
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _dispatch(self, batch: List[Dict[str, Any]]):
+        by_sink = defaultdict(list)
+        for event in batch:
+            by_sink[event["sink"]].append(event)
+
+        results = await asyncio.gather(
+            *(self._deliver(sink, events) for sink, events in by_sink.items())
+        )
+        for failed in results:
+            for event in failed:
+                self._schedule_retry(event)
+
+    async def _deliver(self, sink: str, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        handler = self._sinks.get(sink)
+        if handler is None:
+            logger.error(f"Outbox has no sink named {sink}; dropping {len(events)} events")
+            self._stats["dropped"] += len(events)
+            return []
+
+        try:
+            failed_payloads = await handler([event["payload"] for event in events]) or []
+        except Exception as e:
+            logger.warning(f"Outbox sink {sink} failed: {str(e)}")
+            failed_payloads = [event["payload"] for event in events]
+
+        failed_ids = {id(payload) for payload in failed_payloads}
+        failed = [event for event in events if id(event["payload"]) in failed_ids]
+        self._stats["delivered"] += len(events) - len(failed)
+        return failed
+
+    def _schedule_retry(self, event: Dict[str, Any]):
+        event["attempts"] += 1
+        if event["attempts"] >= self.max_attempts:
+            logger.error(f"Outbox giving up on {event['sink']} event after {event['attempts']} attempts")
+            self._stats["dropped"] += 1
+            return
+        event["due"] = time.time() + self.backoff_base * (2 ** (event["attempts"] - 1))
+        self._stats["retried"] += 1
+        self._retries.append(event)
+
+    def _spill(self, events: List[Dict[str, Any]]):
+        if not events:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for event in events:
+                    f.write(json.dumps(event, default=str) + "\n")
+            self._stats["spilled"] += len(events)
+        except OSError as e:
+            logger.error(f"Outbox could not spill {len(events)} events: {str(e)}")
+            self._stats["dropped"] += len(events)
+
+    def _restore_spilled(self):
+        """Move spilled events back onto the queue once it has room"""
+        queue = self._ensure_queue()
+        if queue.qsize() > self.max_size // 2 or not os.path.exists(self.spill_path):
+            return
+
+        restoring_path = f"{self.spill_path}.restoring"
+        try:
+            os.replace(self.spill_path, restoring_path)
+            with open(restoring_path, encoding="utf-8") as f:
+                events = [json.loads(line) for line in f if line.strip()]
+            os.remove(restoring_path)
+        except (OSError, ValueError) as e:
+            logger.error(f"Outbox could not restore spilled events: {str(e)}")
+            return
+
+        overflow = []
+        for event in events:
+            event["due"] = 0.0
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                overflow.append(event)
+        self._stats["restored"] += len(events) - len(overflow)
+        if overflow:
+            # Not counted as new spills; they were already spilled once
+            self._stats["spilled"] -= len(overflow)
+            self._spill(overflow)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "pending_retries": len(self._retries),
+            "spill_file_bytes": os.path.getsize(self.spill_path) if os.path.exists(self.spill_path) else 0
+        }
+
+
+http_client = httpx.AsyncClient(
+    timeout=settings.OUTBOX_HTTP_TIMEOUT,
+    limits=httpx.Limits(max_connections=settings.OUTBOX_HTTP_MAX_CONNECTIONS)
+)
+
+
+async def deliver_http(payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """POST each payload's json to its url over the shared connection pool"""
+    async def post(payload: Dict[str, Any]) -> bool:
+        try:
+            response = await http_client.post(payload["url"], json=payload["json"])
+        except httpx.HTTPError as e:
+            logger.warning(f"POST {payload['url']} failed: {str(e)}")
+            return False
+        if response.status_code >= 500 or response.status_code == 429:
+            return False
+        if response.status_code >= 400:
+            logger.error(f"POST {payload['url']} rejected with {response.status_code}; not retrying")
+        return True
+
+    delivered = await asyncio.gather(*(post(payload) for payload in payloads))
+    return [payload for payload, ok in zip(payloads, delivered) if not ok]
+
+
+async def deliver_redis_lists(payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Push a batch of values to their Redis lists, trims and expiries included, in one round trip"""
+    await redis_service.add_to_lists(payloads)
+    return []
+
+
+async def deliver_event_logs(payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Append {"stream", "event"} payloads to the event log, one round trip per stream"""
+    streams: Dict[str, List[Dict[str, Any]]] = {}
+    for payload in payloads:
+        streams.setdefault(payload["stream"], []).append(payload["event"])
+    for stream, events in streams.items():
+        await event_log.add_many(stream, events)
+    return []
+
+
+def _feedback_log_row(payload: Dict[str, Any]) -> Optional[FeedbackLog]:
+    try:
+        user_id = UUID(str(payload["user_id"]))
+    except ValueError:
+        logger.warning(f"Skipping feedback log for non-UUID user id {payload['user_id']}")
+        return None
+    return FeedbackLog(
+        user_id=user_id,
+        source=payload["source"],
+        feedback_text=payload["feedback_text"],
+        related_module=payload["related_module"]
+    )
+
+
+def _write_feedback_logs(payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Insert the batch in one transaction; if a row is rejected, insert row by
+    row and drop only the bad ones. Returns the payloads to retry.
+    """
+    rows = [(payload, _feedback_log_row(payload)) for payload in payloads]
+    rows = [(payload, row) for payload, row in rows if row is not None]
+    db = SessionLocal()
+    try:
+        try:
+            db.add_all([row for _, row in rows])
+            db.commit()
+            return []
+        except (DataError, IntegrityError) as e:
+            db.rollback()
+            logger.warning(f"Feedback log batch rejected, retrying rows one at a time: {str(e)}")
+
+        for index, (payload, _) in enumerate(rows):
+            try:
+                # A fresh row; the rolled back one is no longer usable
+                db.add(_feedback_log_row(payload))
+                db.commit()
+            except (DataError, IntegrityError) as e:
+                db.rollback()
+                logger.error(f"Dropping feedback log for user {payload['user_id']}: {str(e)}")
+            except SQLAlchemyError as e:
+                # The database went away mid-batch; rows already committed are not retried
+                db.rollback()
+                logger.warning(f"Feedback log insert failed, retrying {len(rows) - index} rows later: {str(e)}")
+                return [payload for payload, _ in rows[index:]]
+        return []
+    finally:
+        db.close()
+
+
+async def deliver_feedback_logs(payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Insert a batch of FeedbackLog rows off the event loop"""
+    return await asyncio.to_thread(_write_feedback_logs, payloads)
+
+
+outbox = Outbox(
+    max_size=settings.OUTBOX_MAX_SIZE,
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    backoff_base=settings.OUTBOX_BACKOFF_SECONDS,
+    spill_path=settings.OUTBOX_SPILL_PATH
+)
+outbox.register("http", deliver_http)
+outbox.register("redis_list", deliver_redis_lists)
+outbox.register("event_log", deliver_event_logs)
+outbox.register("feedback_log", deliver_feedback_logs)
@@ -1,71 +1,186 @@
+import json
 import logging
-from typing import Any, Optional, Dict, List
-from datetime import datetime
+import time
+from typing import Any, Optional, Dict, Iterable, List, Tuple
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+def _dumps(value: Any) -> str:
+    return json.dumps(value, default=str)
+
+
+def _loads(value: Optional[str]) -> Any:
+    if value is None:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def _group_list_entries(entries: Iterable[Dict[str, Any]]) -> Dict[str, Tuple[List[Any], Optional[int]]]:
+    """name -> (values in push order, longest expiry requested for the list)"""
+    grouped: Dict[str, Tuple[List[Any], Optional[int]]] = {}
+    for entry in entries:
+        values, expire = grouped.get(entry["name"], ([], None))
+        values.append(entry["value"])
+        if entry.get("expire"):
+            expire = max(expire or 0, entry["expire"])
+        grouped[entry["name"]] = (values, expire)
+    return grouped
+
+
 class RedisService:
+    """
+    JSON values, hashes and capped lists on a pooled async Redis client
+
+    Lists are newest first: add_to_list pushes to the head and trims the
+    tail in the same round trip, so no list grows past its cap
+    (REDIS_LIST_MAX_LENGTHS per name, REDIS_LIST_MAX_LENGTH otherwise).
+    """
+
+    def __init__(self, client: Optional[Any] = None):
+        if client is None:
+            import redis.asyncio as aioredis
+            client = aioredis.Redis.from_url(
+                settings.REDIS_URL,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                decode_responses=True
+            )
+        self.redis_client = client
+
+    def max_length(self, name: str) -> int:
+        return settings.REDIS_LIST_MAX_LENGTHS.get(name, settings.REDIS_LIST_MAX_LENGTH)
+
+    async def set(self, key: str, value: Any, expire: Optional[int] = None) -> bool:
+        """Store a JSON value, optionally expiring after expire seconds"""
+        return bool(await self.redis_client.set(key, _dumps(value), ex=expire))
+
+    async def get(self, key: str) -> Any:
+        return _loads(await self.redis_client.get(key))
+
+    async def delete(self, key: str) -> bool:
+        return bool(await self.redis_client.delete(key))
+
+    async def exists(self, key: str) -> bool:
+        return bool(await self.redis_client.exists(key))
+
+    async def set_hash(self, name: str, mapping: Dict[str, Any]) -> bool:
+        if not mapping:
+            return True
+        await self.redis_client.hset(name, mapping={field: _dumps(value) for field, value in mapping.items()})
+        return True
+
+    async def get_hash(self, name: str) -> Dict[str, Any]:
+        return {field: _loads(value) for field, value in (await self.redis_client.hgetall(name)).items()}
+
+    async def add_to_list(self, name: str, value: Any, expire: Optional[int] = None) -> bool:
+        """Push to the head of a capped list, setting its expiry in the same round trip"""
+        await self.add_to_lists([{"name": name, "value": value, "expire": expire}])
+        return True
+
+    async def add_to_lists(self, entries: Iterable[Dict[str, Any]]):
+        """Push {"name", "value", "expire"} entries to many lists in one pipelined round trip"""
+        grouped = _group_list_entries(entries)
+        if not grouped:
+            return
+        pipe = self.redis_client.pipeline(transaction=False)
+        for name, (values, expire) in grouped.items():
+            pipe.lpush(name, *(_dumps(value) for value in values))
+            pipe.ltrim(name, 0, self.max_length(name) - 1)
+            if expire:
+                pipe.expire(name, expire)
+        await pipe.execute()
+
+    async def set_expiry(self, key: str, seconds: int) -> bool:
+        return bool(await self.redis_client.expire(key, seconds))
+
+    async def get_list(self, name: str, start: int = 0, end: int = -1) -> List[Any]:
+        """Items from start to end inclusive, newest first"""
+        return [_loads(value) for value in await self.redis_client.lrange(name, start, end)]
+
+    async def close(self):
+        await self.redis_client.close()
+
+
+class InMemoryRedisService(RedisService):
+    """Process-local stand-in with the same behaviour, for tests and development"""
+
     def __init__(self):
-        # Redis connection commented out
-        # self.redis_client = redis.Redis(
-        #     host=settings.REDIS_HOST,
-        #     port=settings.REDIS_PORT, 
-        #     db=settings.REDIS_DB,
-        #     password=settings.REDIS_PASSWORD,
-        #     ssl=settings.REDIS_SSL,
-        #     decode_responses=True
-        # )
-        logger.info("Redis service is disabled - using mock implementation")
-        
+        self._values: Dict[str, Any] = {}
+        self._expires: Dict[str, float] = {}
+
+    def _live(self, key: str) -> bool:
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.time():
+            self._values.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._values
+
     async def set(self, key: str, value: Any, expire: Optional[int] = None) -> bool:
-        """Mock set operation"""
-        logger.info(f"Mock Redis set: {key}")
+        self._values[key] = _loads(_dumps(value))
+        if expire:
+            self._expires[key] = time.time() + expire
+        else:
+            self._expires.pop(key, None)
         return True
-            
+
     async def get(self, key: str) -> Any:
-        """Mock get operation"""
-        logger.info(f"Mock Redis get: {key}")
-        return None
-            
+        return self._values[key] if self._live(key) else None
+
     async def delete(self, key: str) -> bool:
-        """Mock delete operation"""
-        logger.info(f"Mock Redis delete: {key}")
-        return True
-            
+        self._expires.pop(key, None)
+        return self._values.pop(key, None) is not None
+
     async def exists(self, key: str) -> bool:
-        """Mock exists operation"""
-        logger.info(f"Mock Redis exists: {key}")
-        return False
-            
+        return self._live(key)
+
     async def set_hash(self, name: str, mapping: Dict[str, Any]) -> bool:
-        """Mock set_hash operation"""
-        logger.info(f"Mock Redis set_hash: {name}")
+        if not self._live(name):
+            self._values[name] = {}
+        self._values[name].update(_loads(_dumps(mapping)))
         return True
-            
+
     async def get_hash(self, name: str) -> Dict[str, Any]:
-        """Mock get_hash operation"""
-        logger.info(f"Mock Redis get_hash: {name}")
-        return {}
-            
-    async def add_to_list(self, name: str, value: Any) -> bool:
-        """Mock add_to_list operation"""
-        logger.info(f"Mock Redis add_to_list: {name}")
+        return dict(self._values[name]) if self._live(name) else {}
+
+    async def add_to_lists(self, entries: Iterable[Dict[str, Any]]):
+        for name, (values, expire) in _group_list_entries(entries).items():
+            if not self._live(name):
+                self._values[name] = []
+            items = self._values[name]
+            for value in values:
+                items.insert(0, _loads(_dumps(value)))
+            del items[self.max_length(name):]
+            if expire:
+                self._expires[name] = time.time() + expire
+
+    async def set_expiry(self, key: str, seconds: int) -> bool:
+        if not self._live(key):
+            return False
+        self._expires[key] = time.time() + seconds
         return True
-            
+
     async def get_list(self, name: str, start: int = 0, end: int = -1) -> List[Any]:
-        """Mock get_list operation"""
-        logger.info(f"Mock Redis get_list: {name}")
-        return []
-            
-    async def log_audit(self, action: str, user_id: str, details: Dict[str, Any]) -> bool:
-        """Mock audit log operation"""
-        logger.info(f"Mock Redis audit log: {action} by {user_id}")
-        return True
-            
-    async def get_audit_logs(self, limit: int = 100) -> List[Dict[str, Any]]:
-        """Mock get_audit_logs operation"""
-        logger.info(f"Mock Redis get_audit_logs: limit={limit}")
-        return []
+        if not self._live(name):
+            return []
+        items = self._values[name]
+        # LRANGE semantics: negative indexes count from the end, end is inclusive
+        start = max(len(items) + start, 0) if start < 0 else start
+        end = len(items) + end if end < 0 else end
+        return list(items[start:end + 1])
+
+    async def close(self):
+        pass
+
+
+def _build_redis_service() -> RedisService:
+    if settings.REDIS_SERVICE_BACKEND == "memory":
+        logger.info("Redis service is using the in-memory backend")
+        return InMemoryRedisService()
+    return RedisService()
+
 
 # Create a singleton instance
-redis_service = RedisService() 
\ No newline at end of file
+redis_service = _build_redis_service()
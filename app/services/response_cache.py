@@ -0,0 +1,161 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from app.core.cache import Cache, get_cache
+from app.core.config import settings
+from app.core.embedding_cache import normalize_text
+from app.core.embedding_engine import get_embedding_engine
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache of LLM answers for deterministic Aalam prompts
+
+    Exact hits are keyed by (model, system prompt, normalized user text) and
+    shared through Redis. When a similarity threshold is configured, a
+    per-worker embedding index also matches near-identical questions.
+    """
+
+    def __init__(
+        self,
+        cache: Cache,
+        ttl: int,
+        contexts: List[str],
+        similarity_threshold: Optional[float] = None,
+        max_index_entries: int = 2000
+    ):
+        self.cache = cache
+        self.ttl = ttl
+        self.contexts = set(contexts)
+        self.similarity_threshold = similarity_threshold
+        self.max_index_entries = max_index_entries
+        # bucket -> exact key -> (normalized embedding, expires_at)
+        self._index: Dict[str, "OrderedDict[str, Tuple[np.ndarray, float]]"] = {}
+        self._lock = threading.Lock()
+
+    def enabled_for(self, context: str) -> bool:
+        return context in self.contexts
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return normalize_text(text).casefold()
+
+    async def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(
+            await get_embedding_engine(settings.CHATBOT_EMBEDDING_MODEL).embed(text),
+            dtype=np.float32
+        )
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _nearest(self, bucket: str, vector: np.ndarray) -> Tuple[Optional[str], float]:
+        now = time.time()
+        best_key, best_score = None, -1.0
+        with self._lock:
+            entries = self._index.get(bucket, {})
+            for key, (candidate, expires_at) in list(entries.items()):
+                if expires_at < now:
+                    del entries[key]
+                    continue
+                score = float(np.dot(vector, candidate))
+                if score > best_score:
+                    best_key, best_score = key, score
+        return best_key, best_score
+
+    def _add_to_index(self, bucket: str, key: str, vector: np.ndarray):
+        with self._lock:
+            entries = self._index.setdefault(bucket, OrderedDict())
+            entries[key] = (vector, time.time() + self.ttl)
+            entries.move_to_end(key)
+            while len(entries) > self.max_index_entries:
+                entries.popitem(last=False)
+
+    async def lookup(self, model: str, system_prompt: str, user_text: str) -> Optional[Dict[str, Any]]:
+        """Return a cached answer with match details, or None"""
+        normalized = self._normalize(user_text)
+        bucket = _digest(model, system_prompt)
+        key = f"aalam:response:{_digest(bucket, normalized)}"
+
+        try:
+            cached = await self.cache.get(key)
+            if cached:
+                return {**cached, "match": "exact", "similarity": 1.0}
+
+            if self.similarity_threshold is None:
+                return None
+
+            nearest_key, score = self._nearest(bucket, await self._embed(normalized))
+            if nearest_key and score >= self.similarity_threshold:
+                cached = await self.cache.get(nearest_key)
+                if cached:
+                    return {**cached, "match": "semantic", "similarity": round(score, 4)}
+        except Exception as e:
+            logger.warning(f"Response cache lookup failed: {str(e)}")
+        return None
+
+    async def store(
+        self,
+        model: str,
+        system_prompt: str,
+        user_text: str,
+        message: str,
+        prompt_tokens: int,
+        completion_tokens: int
+    ):
+        normalized = self._normalize(user_text)
+        bucket = _digest(model, system_prompt)
+        key = f"aalam:response:{_digest(bucket, normalized)}"
+
+        try:
+            await self.cache.set(
+                key,
+                {
+                    "message": message,
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "cached_at": time.time()
+                },
+                expire=self.ttl
+            )
+            if self.similarity_threshold is not None:
+                self._add_to_index(bucket, key, await self._embed(normalized))
+        except Exception as e:
+            logger.warning(f"Response cache store failed: {str(e)}")
+
+
+def cache_hit_metadata(hit: Dict[str, Any]) -> Dict[str, Any]:
+    """Response metadata for a cached answer: no tokens spent, savings recorded"""
+    return {
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "total_tokens": 0,
+        "cache": {
+            "hit": True,
+            "match": hit["match"],
+            "similarity": hit["similarity"]
+        },
+        "tokens_saved": {
+            "prompt": hit["prompt_tokens"],
+            "completion": hit["completion_tokens"],
+            "total": hit["prompt_tokens"] + hit["completion_tokens"]
+        }
+    }
+
+
+response_cache = ResponseCache(
+    get_cache(),
+    ttl=settings.AALAM_RESPONSE_CACHE_TTL,
+    contexts=settings.AALAM_RESPONSE_CACHE_CONTEXTS,
+    similarity_threshold=settings.AALAM_RESPONSE_CACHE_SIMILARITY,
+    max_index_entries=settings.AALAM_RESPONSE_CACHE_INDEX_SIZE
+)
@@ -1,52 +1,220 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 import json
 import uuid
 import boto3, os
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+from typing import Any, AsyncIterator, BinaryIO, Dict, List, Optional
 from uuid import uuid4
+from fastapi import UploadFile
 
-from app.core.config import Settings
+from app.core.config import settings
 
 s3 = boto3.client(
     "s3",
     aws_access_key_id=os.getenv("AWS_ACCESS_KEY"),
     aws_secret_access_key=os.getenv("AWS_SECRET_KEY"),
-    region_name="us-west-2"
+    region_name=settings.AWS_REGION or "us-west-2",
+    endpoint_url=settings.S3_ENDPOINT_URL
+)
+
+BUCKET_NAME = settings.AWS_BUCKET_NAME or os.getenv("AWS_BUCKET_NAME", "commonplace-uploads")
+
+
+class S3StorageService:
+    """
+    Async facade over boto3 for uploads from request handlers
+
+    Transfers run on a dedicated thread pool so they never block the event
+    loop. Files above the multipart threshold are sent as parallel
+    multipart uploads read straight from the file object (e.g. an
+    UploadFile spool), so a large upload is never held in memory whole.
+    Pass a client created under moto (or pointed at a local endpoint) to
+    test against a stand-in.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        bucket: str,
+        multipart_threshold: int,
+        part_size: int,
+        max_concurrency: int,
+        workers: int
+    ):
+        self.client = client
+        self.bucket = bucket
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=part_size,
+            max_concurrency=max_concurrency,
+            use_threads=max_concurrency > 1
+        )
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="s3")
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: func(*args, **kwargs))
+
+    async def upload_fileobj(self, fileobj: BinaryIO, key: str, content_type: Optional[str] = None) -> str:
+        """Stream a file object to S3, switching to multipart above the threshold"""
+        fileobj.seek(0)
+        extra_args = {"ContentType": content_type} if content_type else None
+        await self._run(
+            self.client.upload_fileobj,
+            fileobj,
+            self.bucket,
+            key,
+            ExtraArgs=extra_args,
+            Config=self.transfer_config
+        )
+        return key
+
+    async def upload_bytes(self, data: bytes, key: str, content_type: Optional[str] = None) -> str:
+        return await self.upload_fileobj(BytesIO(data), key, content_type)
+
+    async def upload(self, file: UploadFile, folder: str) -> str:
+        """Upload an UploadFile under folder with a unique name and return its key"""
+        return await self.upload_fileobj(file.file, new_key(folder, file.filename), file.content_type)
+
+    async def download_bytes(self, key: str) -> bytes:
+        response = await self._run(self.client.get_object, Bucket=self.bucket, Key=key)
+        return await self._run(response["Body"].read)
+
+    async def stream(
+        self,
+        key: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        chunk_size: int = 256 * 1024
+    ) -> AsyncIterator[bytes]:
+        """Yield an object, or the inclusive byte range start-end of it, chunk by chunk"""
+        params = {"Bucket": self.bucket, "Key": key}
+        if start is not None:
+            params["Range"] = f"bytes={start}-{'' if end is None else end}"
+        response = await self._run(self.client.get_object, **params)
+        body = response["Body"]
+        try:
+            while True:
+                chunk = await self._run(body.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
+    async def presigned_url(self, key: str, expires: int, filename: Optional[str] = None) -> str:
+        """Temporary GET url; S3 then serves ranges and conditional requests itself"""
+        params = {"Bucket": self.bucket, "Key": key}
+        if filename:
+            params["ResponseContentDisposition"] = f'attachment; filename="{filename}"'
+        return await self._run(self.client.generate_presigned_url, "get_object", Params=params, ExpiresIn=expires)
+
+    async def download_file(self, key: str, path: str):
+        """Download to a local path, in parallel ranged parts for large objects"""
+        await self._run(self.client.download_file, self.bucket, key, path, Config=self.transfer_config)
+
+    async def head(self, key: str) -> Optional[Dict[str, Any]]:
+        """Object metadata, or None when the key does not exist"""
+        try:
+            return await self._run(self.client.head_object, Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    async def presigned_post(self, key: str, content_type: str, max_bytes: int, expires: int) -> Dict[str, Any]:
+        """URL and form fields for a browser to POST one object straight to the bucket"""
+        return await self._run(
+            self.client.generate_presigned_post,
+            Bucket=self.bucket,
+            Key=key,
+            Fields={"Content-Type": content_type},
+            Conditions=[{"Content-Type": content_type}, ["content-length-range", 1, max_bytes]],
+            ExpiresIn=expires
+        )
+
+    async def create_multipart_upload(
+        self,
+        key: str,
+        content_type: str,
+        part_count: int,
+        expires: int
+    ) -> Dict[str, Any]:
+        """Start a multipart upload and presign a PUT url for each of its parts"""
+        response = await self._run(
+            self.client.create_multipart_upload,
+            Bucket=self.bucket,
+            Key=key,
+            ContentType=content_type
+        )
+        upload_id = response["UploadId"]
+
+        def presign_parts() -> List[Dict[str, Any]]:
+            return [
+                {
+                    "part_number": part_number,
+                    "url": self.client.generate_presigned_url(
+                        "upload_part",
+                        Params={"Bucket": self.bucket, "Key": key, "UploadId": upload_id, "PartNumber": part_number},
+                        ExpiresIn=expires
+                    )
+                }
+                for part_number in range(1, part_count + 1)
+            ]
+
+        return {"upload_id": upload_id, "parts": await self._run(presign_parts)}
+
+    async def complete_multipart_upload(self, key: str, upload_id: str, parts: List[Dict[str, Any]]):
+        """Assemble uploaded parts; parts are {"part_number", "etag"} as reported by the client"""
+        await self._run(
+            self.client.complete_multipart_upload,
+            Bucket=self.bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={
+                "Parts": [
+                    {"PartNumber": part["part_number"], "ETag": part["etag"]}
+                    for part in sorted(parts, key=lambda part: part["part_number"])
+                ]
+            }
+        )
+
+    async def abort_multipart_upload(self, key: str, upload_id: str):
+        await self._run(self.client.abort_multipart_upload, Bucket=self.bucket, Key=key, UploadId=upload_id)
+
+    async def delete(self, key: str):
+        await self._run(self.client.delete_object, Bucket=self.bucket, Key=key)
+
+    def url_for(self, key: str) -> str:
+        return f"https://{self.bucket}.s3.{settings.AWS_REGION}.amazonaws.com/{key}"
+
+
+def new_key(folder: str, filename: Optional[str]) -> str:
+    """Unique object key under folder that keeps the file's extension"""
+    ext = os.path.splitext(filename or "")[1].lstrip(".")
+    unique_name = f"{uuid.uuid4()}.{ext}" if ext else str(uuid.uuid4())
+    return f"{folder}/{unique_name}"
+
+# Create a singleton instance
+storage = S3StorageService(
+    s3,
+    BUCKET_NAME,
+    multipart_threshold=settings.S3_MULTIPART_THRESHOLD,
+    part_size=settings.S3_MULTIPART_PART_SIZE,
+    max_concurrency=settings.S3_MAX_CONCURRENCY,
+    workers=settings.S3_UPLOAD_WORKERS
 )
 
-BUCKET_NAME = os.getenv("AWS_BUCKET_NAME", "commonplace-uploads")
 
 async def upload_to_s3(file, folder: str):
-    # filename = f"{folder}/{uuid4()}_{file.filename}"
-    # s3.upload_fileobj(file.file, BUCKET_NAME, filename)
-    # return f"https://{BUCKET_NAME}.s3.amazonaws.com/{filename}"
-    ext = file.filename.split('-')[-1]
-    unique_name=f"{uuid.uuid4()}.{ext}"
-    key=f"{folder}/{unique_name}"
-    file.file.seek(0)
-    s3.upload_fileobj(
-        file.file,
-        Settings.AWS_BUCKET_NAME,
-        key,ExtraArgs={
-            "ContentType":file.content_type,
-        }
-    )
-    return key
-
-
-
-def upload_metadata_to_s3(metadata: dict, folder: str) -> str:
-    file_buffer = BytesIO()
-    file_buffer.write(json.dumps(metadata).encode("utf-8"))
-    
+    return await storage.upload(file, folder)
+
+
+
+async def upload_metadata_to_s3(metadata: dict, folder: str) -> str:
     filename = f"{folder}/{uuid4()}.json"
-    content_type = "application/json"
-    
-    file_buffer.seek(0)
-    s3.upload_fileobj(
-        file_buffer,
-        Settings.AWS_BUCKET_NAME,
-        filename,
-        ExtraArgs={"ContentType": content_type}
-    )
-
-    return f"https://{Settings.AWS_BUCKET_NAME}.s3.{Settings.AWS_REGION}.amazonaws.com/{filename}"
\ No newline at end of file
+    await storage.upload_bytes(json.dumps(metadata).encode("utf-8"), filename, "application/json")
+    return storage.url_for(filename)
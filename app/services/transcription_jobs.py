@@ -0,0 +1,469 @@
+import asyncio
+import ipaddress
+import json
+import os
+import shutil
+import socket
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+from fastapi import HTTPException, UploadFile
+from app.core.config import settings
+from app.core.metrics import Histogram
+from app.core.audio_segmentation import transcribe_long_audio
+from app.db.database import SessionLocal
+from app.models.audio_file import AudioFile
+from app.services.outbox import outbox
+from app.services.s3 import storage
+import logging
+
+logger = logging.getLogger(__name__)
+
+LAG_SECONDS_BUCKETS = [0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600]
+PROCESSING_SECONDS_BUCKETS = [0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600]
+
+# Runs after transcription for jobs of a given kind; returns extra result fields
+JobHandler = Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+
+
+def _callback_host_allowed(host: str) -> bool:
+    for allowed in settings.TRANSCRIPTION_CALLBACK_HOSTS:
+        allowed = allowed.lower()
+        if host == allowed or (allowed.startswith("*.") and host.endswith(allowed[1:])):
+            return True
+    return False
+
+
+async def validate_callback_url(url: Optional[str]):
+    """
+    Reject callback urls the server must not POST to
+
+    Only https urls on a TRANSCRIPTION_CALLBACK_HOSTS host are accepted, and
+    every address the host resolves to must be public, so a callback cannot
+    reach internal services or cloud metadata endpoints.
+    """
+    if url is None:
+        return
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme != "https" or not host:
+        raise HTTPException(status_code=400, detail="callback_url must be an https url")
+    if not _callback_host_allowed(host):
+        raise HTTPException(status_code=400, detail=f"callback_url host {host} is not allowed")
+    try:
+        port = parts.port or 443
+        addresses = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (ValueError, socket.gaierror):
+        raise HTTPException(status_code=400, detail=f"callback_url host {host} does not resolve")
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0].split("%")[0])
+        if getattr(address, "ipv4_mapped", None):
+            address = address.ipv4_mapped
+        if not address.is_global:
+            raise HTTPException(status_code=400, detail=f"callback_url host {host} resolves to a non-public address")
+
+
+class InMemoryJobBackend:
+    """In-process stand-in for tests and single-worker deployments"""
+
+    def __init__(self, max_jobs: int = 10000):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+
+    def _ensure_queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    async def save(self, job: Dict[str, Any]):
+        self._jobs[job["id"]] = dict(job)
+        self._jobs.move_to_end(job["id"])
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+
+    async def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def enqueue(self, job_id: str):
+        self._ensure_queue().put_nowait(job_id)
+
+    async def dequeue(self, timeout: float) -> Optional[str]:
+        try:
+            return await asyncio.wait_for(self._ensure_queue().get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def ack(self, job_id: str):
+        pass
+
+    async def heartbeat(self):
+        pass
+
+    async def recover(self) -> List[str]:
+        return []
+
+    async def depth(self) -> int:
+        return self._ensure_queue().qsize()
+
+    async def close(self):
+        pass
+
+
+class RedisJobBackend:
+    """
+    Redis list as the queue, one JSON record per job; shared by all workers
+
+    dequeue() moves a job id into this process's processing list with
+    BLMOVE, and ack() removes it once the job is finished, so a job is
+    never only in the memory of a process that might die. Each process
+    keeps a heartbeat key alive; recover() hands the processing lists of
+    processes whose heartbeat has expired back to the queue.
+    """
+
+    def __init__(self, url: str, job_ttl: int, heartbeat_ttl: int, prefix: str = "transcription"):
+        import redis.asyncio as aioredis
+        self.redis = aioredis.Redis.from_url(url, decode_responses=True)
+        self.job_ttl = job_ttl
+        self.heartbeat_ttl = heartbeat_ttl
+        self.prefix = prefix
+        self.queue_key = f"{prefix}:queue"
+        self.job_prefix = f"{prefix}:job:"
+        self.workers_key = f"{prefix}:workers"
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.processing_key = self._processing_key(self.worker_id)
+
+    def _processing_key(self, worker_id: str) -> str:
+        return f"{self.prefix}:processing:{worker_id}"
+
+    def _heartbeat_key(self, worker_id: str) -> str:
+        return f"{self.prefix}:heartbeat:{worker_id}"
+
+    async def save(self, job: Dict[str, Any]):
+        await self.redis.set(f"{self.job_prefix}{job['id']}", json.dumps(job, default=str), ex=self.job_ttl)
+
+    async def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        value = await self.redis.get(f"{self.job_prefix}{job_id}")
+        return json.loads(value) if value else None
+
+    async def enqueue(self, job_id: str):
+        await self.redis.lpush(self.queue_key, job_id)
+
+    async def dequeue(self, timeout: float) -> Optional[str]:
+        return await self.redis.blmove(
+            self.queue_key, self.processing_key, max(int(timeout), 1), src="RIGHT", dest="LEFT"
+        )
+
+    async def ack(self, job_id: str):
+        await self.redis.lrem(self.processing_key, 1, job_id)
+
+    async def heartbeat(self):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.set(self._heartbeat_key(self.worker_id), int(time.time()), ex=self.heartbeat_ttl)
+        pipe.sadd(self.workers_key, self.worker_id)
+        await pipe.execute()
+
+    async def _requeue(self, worker_id: str) -> List[str]:
+        """Move a worker's processing list back to the front of the queue"""
+        requeued = []
+        while True:
+            job_id = await self.redis.lmove(self._processing_key(worker_id), self.queue_key, "RIGHT", "RIGHT")
+            if job_id is None:
+                return requeued
+            requeued.append(job_id)
+
+    async def recover(self) -> List[str]:
+        """Requeue the jobs of workers that stopped heartbeating; returns their ids"""
+        requeued = []
+        for worker_id in await self.redis.smembers(self.workers_key):
+            if worker_id == self.worker_id or await self.redis.exists(self._heartbeat_key(worker_id)):
+                continue
+            requeued.extend(await self._requeue(worker_id))
+            await self.redis.srem(self.workers_key, worker_id)
+        return requeued
+
+    async def depth(self) -> int:
+        return await self.redis.llen(self.queue_key)
+
+    async def close(self):
+        # Anything still ours (e.g. moved by a BLMOVE cancelled in flight) goes back to the queue
+        await self._requeue(self.worker_id)
+        await self.redis.delete(self._heartbeat_key(self.worker_id))
+        await self.redis.srem(self.workers_key, self.worker_id)
+        await self.redis.close()
+
+
+class TranscriptionJobQueue:
+    """
+    Background transcription so long recordings don't hold an HTTP request open
+
+    submit() spools the audio next to the queue and returns a job record
+    at once; submit_stored() queues audio that was uploaded straight to the
+    bucket and is only downloaded by the worker that runs the job. Workers
+    transcribe queued jobs, write the text to AudioFile.transcription_text
+    when the job names a row, and POST the finished job to its
+    callback_url through the outbox. Clients without a callback poll the
+    job by id.
+    """
+
+    def __init__(self, backend: Any, workers: int, spool_dir: str, heartbeat_interval: float = 10.0):
+        self.backend = backend
+        self.workers = workers
+        self.heartbeat_interval = heartbeat_interval
+        self.spool_dir = spool_dir
+        self._handlers: Dict[str, JobHandler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._running = 0
+        self._stats = defaultdict(int)
+        self.lag_seconds = Histogram(LAG_SECONDS_BUCKETS)
+        self.processing_seconds = Histogram(PROCESSING_SECONDS_BUCKETS)
+        os.makedirs(spool_dir, exist_ok=True)
+
+    def register(self, kind: str, handler: JobHandler):
+        self._handlers[kind] = handler
+
+    def _spool_upload(self, upload: UploadFile, path: str):
+        upload.file.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(upload.file, f)
+
+    async def submit(
+        self,
+        audio: UploadFile,
+        user_id: str,
+        options: Optional[Dict[str, Any]] = None,
+        kind: str = "transcribe",
+        audio_file_id: Optional[int] = None,
+        callback_url: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Queue an upload for transcription and return its job record"""
+        await validate_callback_url(callback_url)
+        job_id = uuid.uuid4().hex
+        path = self._spool_path(job_id, audio.filename)
+        await asyncio.to_thread(self._spool_upload, audio, path)
+        return await self._enqueue_job(
+            job_id, path, audio.filename, None, options, kind, audio_file_id, callback_url, user_id, context
+        )
+
+    async def submit_stored(
+        self,
+        key: str,
+        user_id: str,
+        options: Optional[Dict[str, Any]] = None,
+        kind: str = "transcribe",
+        audio_file_id: Optional[int] = None,
+        callback_url: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Queue audio already in the bucket; the worker downloads it when the job runs"""
+        await validate_callback_url(callback_url)
+        job_id = uuid.uuid4().hex
+        filename = os.path.basename(key)
+        return await self._enqueue_job(
+            job_id, self._spool_path(job_id, filename), filename, key,
+            options, kind, audio_file_id, callback_url, user_id, context
+        )
+
+    def _spool_path(self, job_id: str, filename: Optional[str]) -> str:
+        extension = os.path.splitext(filename or "")[1].lower()
+        return os.path.join(self.spool_dir, f"{job_id}{extension}")
+
+    async def _enqueue_job(
+        self,
+        job_id: str,
+        path: str,
+        filename: Optional[str],
+        audio_key: Optional[str],
+        options: Optional[Dict[str, Any]],
+        kind: str,
+        audio_file_id: Optional[int],
+        callback_url: Optional[str],
+        user_id: str,
+        context: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        job = {
+            "id": job_id,
+            "kind": kind,
+            "status": "queued",
+            "audio_path": path,
+            "audio_key": audio_key,
+            "filename": filename,
+            "options": options or {},
+            "audio_file_id": audio_file_id,
+            "callback_url": callback_url,
+            "user_id": user_id,
+            "context": context or {},
+            "enqueued_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None
+        }
+        await self.backend.save(job)
+        await self.backend.enqueue(job_id)
+        self._stats["submitted"] += 1
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.backend.load(job_id)
+
+    async def start(self):
+        if self._tasks:
+            return
+        # The first heartbeat runs before any worker can take a job
+        await self._heartbeat_once()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+
+    async def _heartbeat_once(self):
+        await self.backend.heartbeat()
+        for job_id in await self.backend.recover():
+            job = await self.backend.load(job_id)
+            if job and job["status"] == "running":
+                job["status"] = "queued"
+                job["started_at"] = None
+                await self.backend.save(job)
+            self._stats["recovered"] += 1
+            logger.warning(f"Requeued transcription job {job_id} from a worker that stopped")
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self._heartbeat_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Transcription heartbeat failed: {str(e)}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.backend.close()
+
+    async def _work(self):
+        while True:
+            try:
+                job_id = await self.backend.dequeue(timeout=1.0)
+                if job_id:
+                    await self._process(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Transcription worker error: {str(e)}")
+                await asyncio.sleep(1.0)
+
+    async def _process(self, job_id: str):
+        job = await self.backend.load(job_id)
+        if job is None:
+            logger.warning(f"Transcription job {job_id} expired before it was processed")
+            await self.backend.ack(job_id)
+            return
+
+        job["status"] = "running"
+        job["started_at"] = time.time()
+        self.lag_seconds.observe(job["started_at"] - job["enqueued_at"])
+        await self.backend.save(job)
+
+        self._running += 1
+        try:
+            if job.get("audio_key"):
+                await storage.download_file(job["audio_key"], job["audio_path"])
+            transcript_result = await transcribe_long_audio(job["audio_path"], **job["options"])
+            result = {"text": transcript_result["text"], "transcription": transcript_result}
+            handler = self._handlers.get(job["kind"])
+            if handler:
+                result.update(await handler(job, transcript_result) or {})
+            if job["audio_file_id"]:
+                await asyncio.to_thread(_save_transcription, job["audio_file_id"], transcript_result["text"])
+            job["status"] = "completed"
+            job["result"] = result
+            self._stats["completed"] += 1
+        except asyncio.CancelledError:
+            # Shutting down mid-job: put it back so it isn't lost with a shared backend
+            job["status"] = "queued"
+            job["started_at"] = None
+            await self.backend.save(job)
+            await self.backend.enqueue(job_id)
+            await self.backend.ack(job_id)
+            self._running -= 1
+            raise
+        except Exception as e:
+            logger.error(f"Transcription job {job_id} failed: {str(e)}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+            self._stats["failed"] += 1
+
+        self._running -= 1
+        job["finished_at"] = time.time()
+        self.processing_seconds.observe(job["finished_at"] - job["started_at"])
+        try:
+            os.remove(job["audio_path"])
+        except OSError:
+            pass
+
+        await self.backend.save(job)
+        await self.backend.ack(job_id)
+        if job["callback_url"]:
+            outbox.publish("http", {"url": job["callback_url"], "json": public_job(job)})
+
+    async def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "depth": await self.backend.depth(),
+            "running": self._running,
+            "workers": len(self._tasks),
+            "lag_seconds": self.lag_seconds.snapshot(),
+            "processing_seconds": self.processing_seconds.snapshot()
+        }
+
+
+def _save_transcription(audio_file_id: int, text: str):
+    db = SessionLocal()
+    try:
+        db.query(AudioFile).filter(AudioFile.id == audio_file_id).update(
+            {AudioFile.transcription_text: text},
+            synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Job fields safe to return to clients (no spool paths or callback urls)"""
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "filename": job["filename"],
+        "audio_file_id": job["audio_file_id"],
+        "enqueued_at": job["enqueued_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "result": job["result"],
+        "error": job["error"]
+    }
+
+
+def _build_backend() -> Any:
+    if settings.TRANSCRIPTION_QUEUE_BACKEND == "redis":
+        return RedisJobBackend(
+            settings.REDIS_URL, settings.TRANSCRIPTION_JOB_TTL, settings.TRANSCRIPTION_WORKER_HEARTBEAT_TTL
+        )
+    return InMemoryJobBackend()
+
+
+# Create a singleton instance
+transcription_jobs = TranscriptionJobQueue(
+    _build_backend(),
+    workers=settings.TRANSCRIPTION_WORKERS,
+    spool_dir=settings.TRANSCRIPTION_SPOOL_DIR,
+    heartbeat_interval=settings.TRANSCRIPTION_WORKER_HEARTBEAT_TTL / 3
+)
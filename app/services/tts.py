@@ -1,8 +1,14 @@
 import os
+import re
+import asyncio
+from collections import deque
 import azure.cognitiveservices.speech as speechsdk
 from dotenv import load_dotenv
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator, Iterator, List
 import json
+from app.core.config import settings
+from app.services.tts_cache import tts_audio_cache, tts_cache_key
+from app.services.tts_pool import SynthesizerPool
 
 load_dotenv()
 
@@ -92,18 +98,14 @@ VOICE_INFO = {
 
 def get_speech_config(
     voice_name: str = "zh-CN-XiaoxiaoNeural",
-    audio_format: str = "mp3",
-    speaking_rate: float = 1.0,
-    pitch: float = 0.0
+    audio_format: str = "mp3"
 ) -> speechsdk.SpeechConfig:
     """
-    Get Azure Speech Service configuration with custom settings
+    Get Azure Speech Service configuration for a voice and output format
     
     Args:
         voice_name: The voice to use
         audio_format: Output audio format (mp3, wav, ogg)
-        speaking_rate: Speaking rate (0.5 to 2.0)
-        pitch: Voice pitch adjustment (-10 to 10)
     
     Returns:
         SpeechConfig: Configured speech service config
@@ -123,19 +125,87 @@ def get_speech_config(
     if audio_format in AUDIO_FORMATS:
         config.set_speech_synthesis_output_format(AUDIO_FORMATS[audio_format])
     
-    # Set speaking rate and pitch using SSML
-    ssml = f"""
+    return config
+
+def build_ssml(
+    text: str,
+    voice_name: str,
+    speaking_rate: float = 1.0,
+    pitch: float = 0.0
+) -> str:
+    """
+    Wrap text in SSML that applies the speaking rate and pitch
+    """
+    return f"""
     <speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" xml:lang="en-US">
         <voice name="{voice_name}">
             <prosody rate="{speaking_rate}" pitch="{pitch}st">
-                {{text}}
+                {text}
             </prosody>
         </voice>
     </speak>
     """
-    config.set_speech_synthesis_output_format(speechsdk.SpeechSynthesisOutputFormat.Ssml)
+
+def _check_result(result):
+    if result.reason not in (
+        speechsdk.ResultReason.SynthesizingAudioCompleted,
+        speechsdk.ResultReason.SynthesizingAudioStarted
+    ):
+        error_details = result.cancellation_details
+        raise Exception(f"Speech synthesis failed: {error_details.reason}, {error_details.error_details}")
+
+class AzureSynthesizer:
+    """
+    Warm Azure synthesizer for one voice and format
     
-    return config, ssml
+    Methods block and are meant to run on the synthesizer pool's threads.
+    """
+    
+    def __init__(self, voice_name: str, audio_format: str):
+        self.synthesizer = speechsdk.SpeechSynthesizer(
+            speech_config=get_speech_config(voice_name, audio_format),
+            audio_config=None
+        )
+        # Open the service connection up front so the first request doesn't pay for it
+        speechsdk.Connection.from_speech_synthesizer(self.synthesizer).open(True)
+    
+    def speak(self, text: str, ssml: Optional[str] = None) -> bytes:
+        if ssml:
+            result = self.synthesizer.speak_ssml_async(ssml).get()
+        else:
+            result = self.synthesizer.speak_text_async(text).get()
+        _check_result(result)
+        return result.audio_data
+    
+    def stream(self, text: str, ssml: Optional[str] = None) -> Iterator[bytes]:
+        # start_speaking_* returns once the first audio arrives; the rest is read as it is synthesized
+        if ssml:
+            result = self.synthesizer.start_speaking_ssml_async(ssml).get()
+        else:
+            result = self.synthesizer.start_speaking_text_async(text).get()
+        _check_result(result)
+        
+        audio_stream = speechsdk.AudioDataStream(result)
+        buffer = bytes(settings.TTS_STREAM_CHUNK_BYTES)
+        while True:
+            filled = audio_stream.read_data(buffer)
+            if filled == 0:
+                break
+            yield buffer[:filled]
+        
+        if audio_stream.status == speechsdk.StreamStatus.Canceled:
+            error_details = audio_stream.cancellation_details
+            raise Exception(f"Speech synthesis failed: {error_details.reason}, {error_details.error_details}")
+    
+    def stop(self):
+        self.synthesizer.stop_speaking_async().get()
+
+# Create a singleton instance
+synthesizer_pool = SynthesizerPool(
+    AzureSynthesizer,
+    size_per_key=settings.TTS_SYNTHESIZERS_PER_VOICE,
+    max_workers=settings.TTS_SYNTHESIS_WORKERS
+)
 
 async def tts_generate(
     text: str,
@@ -148,6 +218,9 @@ async def tts_generate(
     """
     Generate speech from text using Azure Text-to-Speech service
     
+    Identical requests are served from the TTS audio cache, so a phrase is
+    only synthesized once.
+    
     Args:
         text: The text to convert to speech
         voice_name: The voice to use
@@ -159,33 +232,147 @@ async def tts_generate(
     Returns:
         bytes: The generated audio data
     """
+    voice_name = voice_name or "zh-CN-XiaoxiaoNeural"
+    key = tts_cache_key(text, voice_name, audio_format, speaking_rate, pitch, use_ssml)
+    return await tts_audio_cache.get_or_create(
+        key,
+        audio_format,
+        lambda: _synthesize(text, voice_name, audio_format, speaking_rate, pitch, use_ssml)
+    )
+
+async def _synthesize(
+    text: str,
+    voice_name: str,
+    audio_format: str,
+    speaking_rate: float,
+    pitch: float,
+    use_ssml: bool
+) -> bytes:
+    """Call Azure for audio that is not in the cache"""
     try:
-        # Create speech config
-        speech_config, ssml_template = get_speech_config(
-            voice_name=voice_name,
-            audio_format=audio_format,
-            speaking_rate=speaking_rate,
-            pitch=pitch
-        )
-        
-        # Create speech synthesizer
-        synthesizer = speechsdk.SpeechSynthesizer(
-            speech_config=speech_config,
-            audio_config=None
-        )
-        
-        # Synthesize text to speech
-        if use_ssml:
-            ssml = ssml_template.format(text=text)
-            result = synthesizer.speak_ssml_async(ssml).get()
-        else:
-            result = synthesizer.speak_text_async(text).get()
-        
-        if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-            return result.audio_data
-        else:
-            error_details = result.cancellation_details
-            raise Exception(f"Speech synthesis failed: {error_details.reason}, {error_details.error_details}")
-            
+        ssml = build_ssml(text, voice_name, speaking_rate, pitch) if use_ssml else None
+        return await synthesizer_pool.synthesize(text, voice_name, audio_format, ssml)
     except Exception as e:
-        raise Exception(f"TTS generation failed: {str(e)}") 
\ No newline at end of file
+        raise Exception(f"TTS generation failed: {str(e)}")
+
+async def tts_stream(
+    text: str,
+    voice_name: str = "zh-CN-XiaoxiaoNeural",
+    audio_format: str = "mp3",
+    speaking_rate: float = 1.0,
+    pitch: float = 0.0,
+    use_ssml: bool = False
+) -> AsyncIterator[bytes]:
+    """
+    Stream speech audio in chunks as Azure synthesizes it
+    
+    Cached clips are yielded in one piece; a fully streamed clip is added
+    to the cache afterwards.
+    
+    Args:
+        text: The text to convert to speech
+        voice_name: The voice to use
+        audio_format: Output audio format (mp3, wav, ogg)
+        speaking_rate: Speaking rate (0.5 to 2.0)
+        pitch: Voice pitch adjustment (-10 to 10)
+        use_ssml: Whether to use SSML for advanced formatting
+    
+    Yields:
+        bytes: Audio chunks in playback order
+    """
+    voice_name = voice_name or "zh-CN-XiaoxiaoNeural"
+    key = tts_cache_key(text, voice_name, audio_format, speaking_rate, pitch, use_ssml)
+    cached = await tts_audio_cache.get(key, audio_format)
+    if cached is not None:
+        yield cached
+        return
+    
+    ssml = build_ssml(text, voice_name, speaking_rate, pitch) if use_ssml else None
+    chunks = []
+    async for chunk in synthesizer_pool.stream(text, voice_name, audio_format, ssml):
+        chunks.append(chunk)
+        yield chunk
+    await tts_audio_cache.put(key, audio_format, b"".join(chunks))
+
+# Chinese sentence enders split anywhere; Latin ones only before whitespace, so "3.14" stays whole
+SENTENCE_END = re.compile(r"(?<=[。！？；\n])|(?<=[.!?;])(?=\s)")
+CLAUSE_END = re.compile(r"(?<=[，、,：:])")
+
+def split_sentences(text: str, max_chars: int = 200) -> List[str]:
+    """
+    Split text into sentences for chunked synthesis
+    
+    Sentences longer than max_chars are split again at clause punctuation,
+    then hard-wrapped as a last resort.
+    """
+    chunks = []
+    for sentence in SENTENCE_END.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if len(sentence) <= max_chars:
+            chunks.append(sentence)
+            continue
+        
+        current = ""
+        for clause in CLAUSE_END.split(sentence):
+            if current and len(current) + len(clause) > max_chars:
+                chunks.append(current.strip())
+                current = ""
+            current += clause
+            while len(current) > max_chars:
+                chunks.append(current[:max_chars].strip())
+                current = current[max_chars:]
+        if current.strip():
+            chunks.append(current.strip())
+    return chunks
+
+async def tts_generate_chunked(
+    text: str,
+    voice_name: str = "zh-CN-XiaoxiaoNeural",
+    audio_format: str = "mp3",
+    speaking_rate: float = 1.0,
+    pitch: float = 0.0,
+    use_ssml: bool = False,
+    window: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """
+    Synthesize text sentence by sentence, yielding each clip in order
+    
+    Up to `window` sentences are synthesized concurrently, so the first
+    clip is ready as soon as the first sentence is, while later ones are
+    already in progress. Each sentence goes through tts_generate and is
+    cached on its own.
+    
+    Args:
+        text: The text to convert to speech
+        voice_name: The voice to use
+        audio_format: Output audio format (mp3, ogg)
+        speaking_rate: Speaking rate (0.5 to 2.0)
+        pitch: Voice pitch adjustment (-10 to 10)
+        use_ssml: Whether to use SSML for advanced formatting
+        window: Maximum sentences in flight
+    
+    Yields:
+        bytes: One audio clip per sentence
+    """
+    window = window or settings.TTS_STREAM_WINDOW
+    pending = deque()
+    try:
+        for sentence in split_sentences(text, settings.TTS_STREAM_MAX_CHUNK_CHARS):
+            pending.append(asyncio.create_task(tts_generate(
+                text=sentence,
+                voice_name=voice_name,
+                audio_format=audio_format,
+                speaking_rate=speaking_rate,
+                pitch=pitch,
+                use_ssml=use_ssml
+            )))
+            if len(pending) >= window:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        # The client went away or a sentence failed; don't keep synthesizing
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,277 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def tts_cache_key(
+    text: str,
+    voice_name: str,
+    audio_format: str,
+    speaking_rate: float,
+    pitch: float,
+    use_ssml: bool
+) -> str:
+    """Content address of a synthesized clip: every input that changes the audio"""
+    params = json.dumps(
+        [text, voice_name, audio_format, float(speaking_rate), float(pitch), bool(use_ssml)],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(params.encode("utf-8")).hexdigest()
+
+
+class DiskAudioStore:
+    """
+    Shared on-disk tier, evicting least recently used clips above max_bytes
+
+    Usage is read from the directory rather than tracked per process, so
+    the bound holds across all workers sharing it and clips written by any
+    of them get evicted. A put that may take the directory over max_bytes,
+    or that comes scan_interval seconds after the last scan, rescans it
+    and deletes the least recently used clips (reads bump mtime) until it
+    fits again.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, scan_interval: float = 30.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.scan_interval = scan_interval
+        # As of the last scan, plus this process's writes since
+        self._files = 0
+        self._bytes = 0
+        self._last_scan = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._enforce()
+
+    def _enforce(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp") or not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, entry.path, stat.st_size))
+            total += stat.st_size
+
+        entries.sort()
+        evicted = 0
+        # The newest clip is kept even if it alone is over the limit
+        for _, path, size in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Another worker evicted it first
+                pass
+            total -= size
+            evicted += 1
+
+        with self._lock:
+            self._files = len(entries) - evicted
+            self._bytes = total
+            self._last_scan = time.monotonic()
+        if evicted:
+            logger.info(f"TTS disk cache evicted {evicted} clips")
+
+    def path_for(self, key: str, audio_format: str) -> str:
+        return os.path.join(self.directory, f"{key}.{audio_format}")
+
+    def get(self, key: str, audio_format: str) -> Optional[bytes]:
+        path = self.path_for(key, audio_format)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def put(self, key: str, audio_format: str, data: bytes):
+        path = self.path_for(key, audio_format)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._files += 1
+            self._bytes += len(data)
+            due = self._bytes > self.max_bytes or time.monotonic() - self._last_scan > self.scan_interval
+        if due:
+            self._enforce()
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp") or not entry.is_file():
+                continue
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._files = 0
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"files": self._files, "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+class S3AudioStore:
+    """Shared S3 tier; expiry is left to a lifecycle rule on the prefix"""
+
+    def __init__(self, prefix: str):
+        from app.services.s3 import s3, BUCKET_NAME
+        self.client = s3
+        self.bucket = BUCKET_NAME
+        self.prefix = prefix.rstrip("/")
+
+    def _key(self, key: str, audio_format: str) -> str:
+        return f"{self.prefix}/{key}.{audio_format}"
+
+    def get(self, key: str, audio_format: str) -> Optional[bytes]:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._key(key, audio_format))
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return response["Body"].read()
+
+    def put(self, key: str, audio_format: str, data: bytes):
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self._key(key, audio_format),
+            Body=data,
+            ContentType=f"audio/{audio_format}"
+        )
+
+    def clear(self):
+        # Shared objects are not deleted from the API; lifecycle rules expire them
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"bucket": self.bucket, "prefix": self.prefix}
+
+
+class TTSAudioCache:
+    """
+    Two-tier cache of synthesized audio
+
+    A byte-bounded in-process LRU sits in front of a shared disk or S3
+    store. Concurrent requests for the same clip share one synthesis.
+    """
+
+    def __init__(self, memory_bytes: int, store: Optional[Any] = None):
+        self.memory_bytes = memory_bytes
+        self.store = store
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._stats = {"memory_hits": 0, "store_hits": 0, "misses": 0}
+
+    def _remember(self, key: str, data: bytes):
+        if len(data) > self.memory_bytes:
+            return
+        if key in self._entries:
+            self._size -= len(self._entries.pop(key))
+        self._entries[key] = data
+        self._size += len(data)
+        while self._size > self.memory_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    async def get(self, key: str, audio_format: str) -> Optional[bytes]:
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+            self._stats["memory_hits"] += 1
+            return data
+
+        if self.store:
+            try:
+                data = await asyncio.to_thread(self.store.get, key, audio_format)
+            except Exception as e:
+                logger.warning(f"TTS cache store lookup failed: {str(e)}")
+                data = None
+            if data is not None:
+                self._remember(key, data)
+                self._stats["store_hits"] += 1
+                return data
+        return None
+
+    async def put(self, key: str, audio_format: str, data: bytes):
+        self._remember(key, data)
+        if self.store:
+            try:
+                await asyncio.to_thread(self.store.put, key, audio_format, data)
+            except Exception as e:
+                logger.warning(f"TTS cache store write failed: {str(e)}")
+
+    async def _create(self, key: str, audio_format: str, create) -> bytes:
+        data = await create()
+        await self.put(key, audio_format, data)
+        return data
+
+    async def get_or_create(self, key: str, audio_format: str, create) -> bytes:
+        """Return cached audio or await create() once for all concurrent callers"""
+        data = await self.get(key, audio_format)
+        if data is not None:
+            return data
+
+        task = self._inflight.get(key)
+        if task is None:
+            self._stats["misses"] += 1
+            task = asyncio.create_task(self._create(key, audio_format, create))
+            self._inflight[key] = task
+
+            def finished(task: asyncio.Task):
+                if self._inflight.get(key) is task:
+                    del self._inflight[key]
+                if not task.cancelled() and task.exception() is not None:
+                    logger.warning(f"TTS synthesis for {key} failed: {str(task.exception())}")
+
+            task.add_done_callback(finished)
+        # Shielded so one caller giving up doesn't cancel synthesis for the rest
+        return await asyncio.shield(task)
+
+    async def clear(self):
+        self._entries.clear()
+        self._size = 0
+        if self.store:
+            # Unlinking a large cache directory must not block the event loop
+            await asyncio.to_thread(self.store.clear)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = sum(self._stats.values())
+        hits = self._stats["memory_hits"] + self._stats["store_hits"]
+        return {
+            **self._stats,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._entries),
+            "memory_bytes": self._size,
+            "store": self.store.stats() if self.store else None
+        }
+
+
+def _build_store() -> Optional[Any]:
+    backend = settings.TTS_CACHE_BACKEND
+    if backend == "disk":
+        return DiskAudioStore(settings.TTS_CACHE_DIR, settings.TTS_CACHE_MAX_BYTES, settings.TTS_CACHE_SCAN_INTERVAL)
+    if backend == "s3":
+        return S3AudioStore(settings.TTS_CACHE_S3_PREFIX)
+    return None
+
+
+tts_audio_cache = TTSAudioCache(settings.TTS_CACHE_MEMORY_BYTES, _build_store())
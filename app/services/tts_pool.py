@@ -0,0 +1,135 @@
+import asyncio
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Protocol, Tuple, Iterable
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Synthesizer(Protocol):
+    """Blocking synthesizer for one voice/format; the pool runs it off the event loop"""
+
+    def speak(self, text: str, ssml: Optional[str] = None) -> bytes:
+        ...
+
+    def stream(self, text: str, ssml: Optional[str] = None) -> Iterable[bytes]:
+        ...
+
+    def stop(self):
+        ...
+
+
+SynthesizerFactory = Callable[[str, str], Synthesizer]
+
+
+class SynthesizerPool:
+    """
+    Pool of warm synthesizers keyed by (voice, format)
+
+    At most size_per_key synthesizers exist per key; callers beyond that
+    wait for one to be returned. Blocking SDK calls run on a thread pool,
+    and a synthesizer that fails or is abandoned mid-stream is discarded
+    instead of being reused.
+    """
+
+    def __init__(self, factory: SynthesizerFactory, size_per_key: int, max_workers: int):
+        self.factory = factory
+        self.size_per_key = size_per_key
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts")
+        self._idle: Dict[Tuple[str, str], List[Synthesizer]] = defaultdict(list)
+        self._slots: Dict[Tuple[str, str], asyncio.Semaphore] = {}
+        self._stats = defaultdict(int)
+
+    async def _acquire(self, key: Tuple[str, str]) -> Synthesizer:
+        slots = self._slots.setdefault(key, asyncio.Semaphore(self.size_per_key))
+        await slots.acquire()
+        try:
+            if self._idle[key]:
+                self._stats["reused"] += 1
+                return self._idle[key].pop()
+            self._stats["created"] += 1
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self.factory, *key)
+        except BaseException:
+            slots.release()
+            raise
+
+    def _release(self, key: Tuple[str, str], synthesizer: Synthesizer, healthy: bool):
+        if healthy:
+            self._idle[key].append(synthesizer)
+        else:
+            self._stats["discarded"] += 1
+        self._slots[key].release()
+
+    async def synthesize(
+        self,
+        text: str,
+        voice_name: str,
+        audio_format: str,
+        ssml: Optional[str] = None
+    ) -> bytes:
+        """Synthesize a whole clip without blocking the event loop"""
+        key = (voice_name, audio_format)
+        synthesizer = await self._acquire(key)
+        healthy = False
+        try:
+            audio = await asyncio.get_running_loop().run_in_executor(
+                self._executor, synthesizer.speak, text, ssml
+            )
+            healthy = True
+            return audio
+        finally:
+            self._release(key, synthesizer, healthy)
+
+    async def stream(
+        self,
+        text: str,
+        voice_name: str,
+        audio_format: str,
+        ssml: Optional[str] = None
+    ) -> AsyncIterator[bytes]:
+        """Yield audio chunks as the synthesizer produces them"""
+        key = (voice_name, audio_format)
+        synthesizer = await self._acquire(key)
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        stopped = threading.Event()
+        state = {"completed": False}
+
+        def pump():
+            try:
+                for chunk in synthesizer.stream(text, ssml):
+                    if stopped.is_set():
+                        synthesizer.stop()
+                        return
+                    loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+                state["completed"] = True
+                loop.call_soon_threadsafe(chunks.put_nowait, None)
+            except Exception as e:
+                loop.call_soon_threadsafe(chunks.put_nowait, e)
+
+        pumping = loop.run_in_executor(self._executor, pump)
+        # The synthesizer goes back to the pool only once its thread is done with it
+        pumping.add_done_callback(
+            lambda _: self._release(key, synthesizer, state["completed"] and not stopped.is_set())
+        )
+
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    return
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            if not state["completed"]:
+                stopped.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "idle": {f"{voice}/{fmt}": len(idle) for (voice, fmt), idle in self._idle.items()},
+            "size_per_key": self.size_per_key
+        }